@@ -0,0 +1,121 @@
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from prometheus_client import Counter
+
+from recipes.cache import get_recipes_version, get_tags_version
+
+RECIPE_LIST_KEY = "api:recipes:list:{recipes}:{tags}:{digest}"
+
+RECIPE_LIST_REQUESTS = Counter(
+    "foodgram_recipe_list_cache",
+    "Anonymous recipe list cache lookups by result.",
+    ("result",),
+)
+RECIPE_FRAGMENT_REQUESTS = Counter(
+    "foodgram_recipe_fragment_cache",
+    "Recipe fragment cache lookups by result.",
+    ("result",),
+)
+
+
+def normalize_query(query_params):
+    """Строка запроса, не зависящая от порядка параметров и значений."""
+    return urlencode(
+        sorted(
+            (key, value)
+            for key, values in query_params.lists()
+            for value in values
+        )
+    )
+
+
+def get_recipe_list_key(request):
+    """Ключ кэша страницы списка рецептов.
+
+    Содержит номера версий рецептов и тегов, поэтому изменение данных
+    сбрасывает все закэшированные страницы сразу, а старые записи
+    вытесняются по истечении RECIPE_LIST_CACHE_TIMEOUT.
+    """
+    digest = hashlib.sha256(
+        "\n".join(
+            (
+                request.get_host(),
+                request.path,
+                request.accepted_renderer.format,
+                normalize_query(request.query_params),
+            )
+        ).encode()
+    ).hexdigest()
+    return RECIPE_LIST_KEY.format(
+        recipes=get_recipes_version(), tags=get_tags_version(), digest=digest
+    )
+
+
+def get_recipe_list(key):
+    """Данные страницы из кэша или None с учетом попаданий и промахов."""
+    data = cache.get(key)
+    RECIPE_LIST_REQUESTS.labels("miss" if data is None else "hit").inc()
+    return data
+
+
+def set_recipe_list(key, data):
+    cache.set(key, data, timeout=settings.RECIPE_LIST_CACHE_TIMEOUT)
+
+
+class RecipeFragmentCache:
+    """LRU-кэш сериализованных рецептов в памяти процесса.
+
+    Хранит не зависящую от пользователя часть ответа с рецептом под
+    ключом из адреса сервиса, id рецепта и времени его изменения, так
+    что измененный рецепт просто не находится в кэше, а его старая
+    версия вытесняется как давно не использованная. Время изменения
+    рецепта меняется только вместе с содержимым фрагмента: избранное,
+    корзины и подписки пользователей его не затрагивают.
+    """
+
+    def __init__(self, maxsize=None):
+        self._lock = Lock()
+        self._maxsize = maxsize
+        self._fragments = OrderedDict()
+
+    @property
+    def maxsize(self):
+        if self._maxsize is None:
+            return settings.RECIPE_FRAGMENT_CACHE_SIZE
+        return self._maxsize
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+
+    def get_many(self, keys):
+        """Найденные в кэше фрагменты по ключам."""
+        found = {}
+        misses = 0
+        with self._lock:
+            for key in keys:
+                fragment = self._fragments.get(key)
+                if fragment is not None:
+                    self._fragments.move_to_end(key)
+                    found[key] = fragment
+                else:
+                    misses += 1
+        RECIPE_FRAGMENT_REQUESTS.labels("hit").inc(len(found))
+        RECIPE_FRAGMENT_REQUESTS.labels("miss").inc(misses)
+        return found
+
+    def set_many(self, fragments):
+        with self._lock:
+            self._fragments.update(fragments)
+            for key in fragments:
+                self._fragments.move_to_end(key)
+            while len(self._fragments) > self.maxsize:
+                self._fragments.popitem(last=False)
+
+
+recipe_fragments = RecipeFragmentCache()
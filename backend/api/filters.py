@@ -1,10 +1,31 @@
+from django.db.models import Exists, OuterRef
+from django_filters.fields import MultipleChoiceField
 from django_filters.rest_framework import FilterSet, filters
 from rest_framework.filters import SearchFilter
 
+from recipes.cache import get_tag_catalogue
 from recipes.models import Recipe
 from users.models import User
 
 
+def get_tag_choices():
+    return [(tag["slug"], tag["name"]) for tag in get_tag_catalogue().tags]
+
+
+class CachedTagSlugField(MultipleChoiceField):
+    """Поле слагов тегов, которые проверяются по кэшу каталога тегов."""
+
+    def valid_value(self, value):
+        return any(
+            tag["slug"] == value
+            for tag in get_tag_catalogue(require_slugs=[value]).tags
+        )
+
+
+class CachedTagFilter(filters.MultipleChoiceFilter):
+    field_class = CachedTagSlugField
+
+
 class IngredientSearchFilter(SearchFilter):
     """Кастомный фильтр поиска для ингредиентов."""
 
@@ -17,15 +38,42 @@ class RecipeFilter(FilterSet):
     author = filters.ModelChoiceFilter(
         queryset=User.objects.all(),
     )
-    tags = filters.AllValuesMultipleFilter(field_name="tags__slug")
+    tags = CachedTagFilter(choices=get_tag_choices, method="filter_tags")
     is_favorited = filters.BooleanFilter(method="filter_is_favorited")
     is_in_shopping_cart = filters.BooleanFilter(
         method="filter_is_in_shopping_cart"
     )
+    search = filters.CharFilter(method="filter_search")
 
     class Meta:
         model = Recipe
-        fields = ("author", "tags", "is_favorited", "is_in_shopping_cart")
+        fields = (
+            "author",
+            "tags",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "search",
+        )
+
+    def filter_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов.
+
+        Слаги проверяются и переводятся в id по кэшу каталога тегов,
+        а фильтр по промежуточной таблице через EXISTS не размножает
+        рецепты с несколькими подходящими тегами.
+        """
+        tag_ids = [
+            tag["id"]
+            for tag in get_tag_catalogue().tags
+            if tag["slug"] in value
+        ]
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe_id=OuterRef("pk"), tag_id__in=tag_ids
+                )
+            )
+        )
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -36,3 +84,6 @@ class RecipeFilter(FilterSet):
         if value and self.request.user.is_authenticated:
             return queryset.filter(shoppingcarts__user=self.request.user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        return queryset.search(value)
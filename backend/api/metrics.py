@@ -0,0 +1,129 @@
+import os
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from .cache import RECIPE_FRAGMENT_REQUESTS, RECIPE_LIST_REQUESTS
+
+MULTIPROCESS_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+UNMATCHED = "unmatched"
+
+REQUESTS = Counter(
+    "foodgram_http_requests",
+    "HTTP requests by view action, method and status code.",
+    ("handler", "method", "status"),
+)
+LATENCY = Histogram(
+    "foodgram_http_request_duration_seconds",
+    "HTTP request latency by view action.",
+    ("handler", "method"),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_QUERIES = Histogram(
+    "foodgram_db_queries_per_request",
+    "Number of SQL queries per request by view action.",
+    ("handler",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+DB_DURATION = Histogram(
+    "foodgram_db_duration_seconds",
+    "Total SQL time per request by view action.",
+    ("handler",),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+
+
+def get_handler(view_func, method):
+    """Имя обработчика для меток: класс представления и действие
+    вьюсета (RecipesViewSet.list) или метод HTTP для остальных классов.
+    """
+    view_class = getattr(view_func, "cls", None) or getattr(
+        view_func, "view_class", None
+    )
+    if view_class is None:
+        return f"{view_func.__module__}.{view_func.__name__}"
+    method = method.lower()
+    actions = getattr(view_func, "actions", None) or {}
+    action = actions.get(method)
+    if action is None and method == "head":
+        action = actions.get("get")
+    return f"{view_class.__name__}.{action or method}"
+
+
+def observe_request(handler, method, status, seconds, queries):
+    """Учесть запрос в метриках; queries - журнал SQL-запросов."""
+    REQUESTS.labels(handler, method, status).inc()
+    LATENCY.labels(handler, method).observe(seconds)
+    DB_QUERIES.labels(handler).observe(queries.count)
+    DB_DURATION.labels(handler).observe(queries.seconds)
+
+
+def hit_ratio(hits, misses):
+    total = hits + misses
+    return hits / total if total else 0
+
+
+class CacheCollector:
+    """Метрики источника и доли попаданий кэшей рецептов.
+
+    Доли считаются по уже собранным счетчикам источника, то есть в
+    многопроцессном режиме - по сумме всех процессов.
+    """
+
+    caches = {
+        "recipe_list": RECIPE_LIST_REQUESTS,
+        "recipe_fragments": RECIPE_FRAGMENT_REQUESTS,
+    }
+
+    def __init__(self, source):
+        self.source = source
+
+    def collect(self):
+        families = list(self.source.collect())
+        yield from families
+        names = {
+            counter.describe()[0].name: cache_name
+            for cache_name, counter in self.caches.items()
+        }
+        results = {
+            cache_name: {"hit": 0, "miss": 0} for cache_name in self.caches
+        }
+        for family in families:
+            if family.name in names:
+                for sample in family.samples:
+                    if sample.name.endswith("_total"):
+                        results[names[family.name]][
+                            sample.labels["result"]
+                        ] += sample.value
+        ratio = GaugeMetricFamily(
+            "foodgram_cache_hit_ratio",
+            "Share of cache lookups that were hits.",
+            labels=("cache",),
+        )
+        for cache_name, counts in results.items():
+            ratio.add_metric(
+                (cache_name,), hit_ratio(counts["hit"], counts["miss"])
+            )
+        yield ratio
+
+
+def render_metrics():
+    """Метрики в текстовом формате Prometheus.
+
+    Под gunicorn с несколькими процессами значения метрик хранятся в
+    отображаемых в память файлах каталога PROMETHEUS_MULTIPROC_DIR и
+    здесь складываются по всем процессам.
+    """
+    if os.environ.get(MULTIPROCESS_DIR_ENV):
+        source = CollectorRegistry()
+        MultiProcessCollector(source)
+    else:
+        source = REGISTRY
+    return generate_latest(CacheCollector(source))
@@ -0,0 +1,196 @@
+import json
+import logging
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import UNMATCHED, get_handler, observe_request
+
+logger = logging.getLogger(__name__)
+
+SQL_MAX_LENGTH = 500
+
+
+class QueryLog:
+    """Обертка выполнения SQL-запросов, которая считает их количество
+    и время. Работает без DEBUG, подключается на время запроса через
+    connection.execute_wrapper.
+
+    Текст запросов для top() собирается только при statements=True.
+    """
+
+    def __init__(self, statements=False):
+        self.count = 0
+        self.seconds = 0
+        self.statements = (
+            defaultdict(lambda: [0, 0]) if statements else None
+        )
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - started
+            self.count += 1
+            self.seconds += seconds
+            if self.statements is not None:
+                statement = self.statements[sql]
+                statement[0] += 1
+                statement[1] += seconds
+
+    def capture(self):
+        """Контекстный менеджер, подключающий журнал ко всем базам."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+    def top(self, limit):
+        """Чаще всего повторявшиеся запросы с их количеством и временем."""
+        if self.statements is None:
+            return []
+        statements = sorted(
+            self.statements.items(),
+            key=lambda item: (item[1][0], item[1][1]),
+            reverse=True,
+        )
+        return [
+            {
+                "sql": sql[:SQL_MAX_LENGTH],
+                "count": count,
+                "ms": round(seconds * 1000, 2),
+            }
+            for sql, (count, seconds) in statements[:limit]
+        ]
+
+
+class RequestTiming:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_finished = None
+        self.render_finished = None
+        self.queries = QueryLog(statements=True)
+
+    def metrics(self, finished):
+        """Длительности этапов запроса в миллисекундах.
+
+        view - от вызова представления до готового ответа, включая
+        сериализацию, render - отрисовка ответа DRF или шаблона.
+        """
+        view_started = self.view_started or self.started
+        view_finished = self.view_finished or finished
+        render = (
+            self.render_finished - view_finished
+            if self.render_finished
+            else 0
+        )
+        return {
+            "sql": self.queries.seconds * 1000,
+            "view": (view_finished - view_started) * 1000,
+            "render": render * 1000,
+            "total": (finished - self.started) * 1000,
+        }
+
+
+class RequestTimingMiddleware:
+    """Количество и время SQL-запросов, время представления и отрисовки
+    ответа в заголовке Server-Timing.
+
+    Включается настройкой REQUEST_TIMING. Запросы дольше
+    REQUEST_TIMING_SLOW_MS миллисекунд или с числом SQL-запросов больше
+    REQUEST_TIMING_SLOW_QUERIES записываются в журнал одной строкой
+    JSON с самыми частыми SQL-запросами. Запросы потоковых ответов,
+    выполняемые при их отдаче, не учитываются.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = request._timing = RequestTiming()
+        with timing.queries.capture():
+            response = self.get_response(request)
+        metrics = timing.metrics(time.perf_counter())
+        response["Server-Timing"] = ", ".join(
+            (
+                f'sql;dur={metrics["sql"]:.1f};'
+                f'desc="{timing.queries.count} queries"',
+                f'view;dur={metrics["view"]:.1f}',
+                f'render;dur={metrics["render"]:.1f}',
+                f'total;dur={metrics["total"]:.1f}',
+            )
+        )
+        if (
+            metrics["total"] > settings.REQUEST_TIMING_SLOW_MS
+            or timing.queries.count > settings.REQUEST_TIMING_SLOW_QUERIES
+        ):
+            self.log_slow_request(request, response, timing, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._timing.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        timing = request._timing
+        timing.view_finished = time.perf_counter()
+        response.add_post_render_callback(
+            lambda response: setattr(
+                timing, "render_finished", time.perf_counter()
+            )
+        )
+        return response
+
+    def log_slow_request(self, request, response, timing, metrics):
+        record = {
+            "event": "slow_request",
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "queries": timing.queries.count,
+            **{
+                f"{name}_ms": round(value, 2)
+                for name, value in metrics.items()
+            },
+            "top_sql": timing.queries.top(settings.REQUEST_TIMING_TOP_SQL),
+        }
+        logger.warning(
+            json.dumps(record, ensure_ascii=False), extra={"timing": record}
+        )
+
+
+class MetricsMiddleware:
+    """Метрики Prometheus по действиям представлений: количество
+    запросов по кодам ответа, время ответа, количество и время
+    SQL-запросов. Текст SQL-запросов не собирается.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        request._metrics_handler = UNMATCHED
+        queries = QueryLog()
+        with queries.capture():
+            response = self.get_response(request)
+        observe_request(
+            request._metrics_handler,
+            request.method,
+            response.status_code,
+            time.perf_counter() - started,
+            queries,
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_handler = get_handler(view_func, request.method)
@@ -1,9 +1,197 @@
+import json
+
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    Cursor,
+    CursorPagination,
+    PageNumberPagination,
+)
+
+
+class FoodgramCursorPagination(CursorPagination):
+    """Курсорная пагинация по всем полям сортировки.
+
+    Сортировка всегда заканчивается первичным ключом, а курсор хранит
+    значения всех ее полей для крайнего рецепта страницы. Следующая
+    страница выбирается условием вида
+    (pub_date < p) OR (pub_date = p AND id < i), поэтому рецепты с
+    одинаковой датой публикации не пропускаются и не повторяются, а
+    смещение в курсоре не нужно. Не выполняет OFFSET и COUNT, поэтому
+    стоимость запроса не зависит от глубины страницы.
+    """
+
+    page_size = settings.PAGE_SIZE
+    page_size_query_param = "limit"
+    max_page_size = settings.MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(
+            queryset.query.order_by or queryset.model._meta.ordering or ()
+        )
+        if not ordering:
+            return ("id",)
+        if not {"id", "-id", "pk", "-pk"} & set(ordering):
+            ordering.append("-id" if ordering[0].startswith("-") else "id")
+        return tuple(ordering)
+
+    def decode_cursor(self, request):
+        """Курсор с позицией - списком значений полей сортировки."""
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if (
+            cursor.offset
+            or not isinstance(position, list)
+            or len(position) != len(self.ordering)
+            or not all(isinstance(value, str) for value in position)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [
+                field.to_python(value)
+                for field, value in zip(self.ordering_fields, position)
+            ]
+        except (ValidationError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=cursor.reverse, position=position)
+
+    def get_ordering_fields(self, queryset):
+        """Поля модели или выражения аннотаций для полей сортировки,
+        которыми проверяются значения из курсора.
+        """
+        fields = []
+        for order in self.ordering:
+            name = order.lstrip("-")
+            if name == "pk":
+                name = "id"
+            if name in queryset.query.annotations:
+                fields.append(queryset.query.annotations[name].output_field)
+            else:
+                fields.append(queryset.model._meta.get_field(name))
+        return fields
+
+    def encode_cursor(self, cursor):
+        return super().encode_cursor(
+            cursor._replace(position=json.dumps(cursor.position))
+        )
+
+    def get_position(self, instance):
+        """Значения полей сортировки рецепта (объекта или строки
+        .values()) в виде строк.
+        """
+        values = []
+        for order in self.ordering:
+            name = order.lstrip("-")
+            if name == "pk":
+                name = "id"
+            if isinstance(instance, dict):
+                values.append(str(instance[name]))
+            else:
+                values.append(str(getattr(instance, name)))
+        return values
+
+    def get_position_filter(self, position, reverse):
+        """Условие для элементов, следующих за позицией в порядке
+        сортировки (предшествующих ей при reverse).
+        """
+        condition = Q()
+        equal = {}
+        for order, value in zip(self.ordering, position):
+            name = order.lstrip("-")
+            lookup = "lt" if order.startswith("-") != reverse else "gt"
+            condition |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.ordering_fields = self.get_ordering_fields(queryset)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor else None
+        if reverse:
+            queryset = queryset.order_by(
+                *(
+                    order[1:] if order.startswith("-") else f"-{order}"
+                    for order in self.ordering
+                )
+            )
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(
+                self.get_position_filter(position, reverse)
+            )
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        has_more = len(results) > len(self.page)
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        if self.has_next:
+            self.next_position = (
+                self.get_position(self.page[-1]) if self.page else position
+            )
+        if self.has_previous:
+            self.previous_position = (
+                self.get_position(self.page[0]) if self.page else position
+            )
+        if (self.has_next or self.has_previous) and self.template:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=self.next_position)
+        )
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=True, position=self.previous_position)
+        )
 
 
 class FoodgramPagination(PageNumberPagination):
-    """Кастоманя пагинцаия для сервиса."""
+    """Кастоманя пагинцаия для сервиса.
+
+    По умолчанию постраничная, при наличии параметра cursor
+    переключается на курсорную пагинацию.
+    """
 
     page_size = settings.PAGE_SIZE
     page_size_query_param = "limit"
+    max_page_size = settings.MAX_PAGE_SIZE
+    cursor_paginator_class = FoodgramCursorPagination
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_paginator_class.cursor_query_param in (
+            request.query_params
+        ):
+            self.cursor_paginator = self.cursor_paginator_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import MultiPartParser as DjangoParser
+from django.http.multipartparser import MultiPartParserError
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+class StreamingMultiPartParser(MultiPartParser):
+    """Парсер multipart/form-data, записывающий файлы сразу на диск.
+
+    Файлы читаются частями по FILE_UPLOAD_CHUNK_SIZE байт во временный
+    файл независимо от их размера, поэтому память на загрузку не зависит
+    от размера изображения. Ингредиенты передаются полями вида
+    ingredients[0]id и ingredients[0]amount, теги - повторяющимся
+    полем tags.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context["request"]
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        meta = request.META.copy()
+        meta["CONTENT_TYPE"] = media_type
+        handler = TemporaryFileUploadHandler(request._request)
+        handler.chunk_size = settings.FILE_UPLOAD_CHUNK_SIZE
+        try:
+            data, files = DjangoParser(
+                meta, stream, [handler], encoding
+            ).parse()
+        except MultiPartParserError as exc:
+            raise ParseError(f"Multipart form parse error - {exc}")
+        return DataAndFiles(data, files)
@@ -0,0 +1,139 @@
+import csv
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Базовый рендерер списка покупок.
+
+    Список отдается потоком: render_stream принимает итератор словарей
+    с ключами name, amount и measurement_unit и возвращает генератор
+    фрагментов документа. Метод render используется DRF только для
+    ответов с ошибками.
+    """
+
+    charset = "utf-8"
+    extension = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if isinstance(data, dict):
+            data = "\n".join(f"{key}: {value}" for key, value in data.items())
+        return str(data).encode(self.charset or "utf-8")
+
+    def render_stream(self, ingredients):
+        raise NotImplementedError
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    """Список покупок в виде текстового файла."""
+
+    media_type = "text/plain"
+    format = "txt"
+    extension = "txt"
+
+    def render_stream(self, ingredients):
+        yield "Список игредиентов и граммовки: \n\n"
+        for ingredient in ingredients:
+            yield (
+                f"{ingredient['name']} - "
+                f"{ingredient['amount']} "
+                f"{ingredient['measurement_unit']};\n"
+            )
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    """Список покупок в формате CSV."""
+
+    media_type = "text/csv"
+    format = "csv"
+    extension = "csv"
+
+    def render_stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(("name", "amount", "measurement_unit"))
+        for ingredient in ingredients:
+            yield writer.writerow(
+                (
+                    ingredient["name"],
+                    ingredient["amount"],
+                    ingredient["measurement_unit"],
+                )
+            )
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    """Список покупок в формате PDF.
+
+    reportlab хранит все страницы документа в памяти до вызова save(),
+    а таблица ссылок PDF записывается в конец файла, поэтому документ
+    целиком собирается в памяти при вызове render_stream и только
+    потом отдается частями. Для кириллицы нужен шрифт
+    SHOPPING_LIST_PDF_FONT: без него документ не строится.
+    """
+
+    media_type = "application/pdf"
+    format = "pdf"
+    extension = "pdf"
+    charset = None
+    font_name = "ShoppingListFont"
+    font_size = 12
+    margin = 50
+
+    def get_font(self):
+        font_path = settings.SHOPPING_LIST_PDF_FONT
+        if not os.path.exists(font_path):
+            raise ImproperlyConfigured(
+                f"Шрифт для PDF со списком покупок не найден: {font_path}."
+            )
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(self.font_name, font_path))
+        return self.font_name
+
+    def render_stream(self, ingredients):
+        """Собрать документ и вернуть итератор его частей.
+
+        Ошибки сборки возникают до начала ответа, а не посреди потока.
+        """
+        font = self.get_font()
+        document = BytesIO()
+        pdf = canvas.Canvas(document, pagesize=A4, pageCompression=1)
+        _, height = A4
+        pdf.setFont(font, self.font_size)
+        position = height - self.margin
+        pdf.drawString(
+            self.margin, position, "Список игредиентов и граммовки:"
+        )
+        for ingredient in ingredients:
+            position -= self.font_size * 1.5
+            if position < self.margin:
+                pdf.showPage()
+                pdf.setFont(font, self.font_size)
+                position = height - self.margin
+            pdf.drawString(
+                self.margin,
+                position,
+                f"{ingredient['name']} - {ingredient['amount']} "
+                f"{ingredient['measurement_unit']}",
+            )
+        pdf.save()
+        document.seek(0)
+        return iter(lambda: document.read(STREAM_CHUNK_SIZE), b"")
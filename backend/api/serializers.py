@@ -1,13 +1,20 @@
+from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import router, transaction
 from djoser.serializers import UserSerializer, ValidationError
 from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
 from rest_framework import serializers
 
+from recipes.cache import get_tag_catalogue
 from recipes.models import (
     Amount,
     Favorite,
     Ingredient,
     Recipe,
     ShoppingCart,
+    ShoppingListItem,
     Tag,
 )
 from users.models import Follow, User
@@ -30,6 +37,8 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         request = self.context.get("request")
         return (
             request
@@ -40,6 +49,97 @@ class CustomUserSerializer(UserSerializer):
         )
 
 
+class CachedTagField(serializers.PrimaryKeyRelatedField):
+    """Поле тега, id которого проверяются по кэшу каталога тегов."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        tag = get_tag_catalogue(require_ids=[pk]).tags_by_id.get(pk)
+        if tag is None:
+            self.fail("does_not_exist", pk_value=data)
+        return Tag.from_db(
+            router.db_for_read(Tag), list(tag), list(tag.values())
+        )
+
+
+class ImageHeaderField(forms.ImageField):
+    """Поле формы для изображения, которое читает только его заголовок.
+
+    В отличие от forms.ImageField не вызывает Image.verify(), который
+    читает весь файл: изображение целиком декодируется при создании
+    уменьшенных копий в фоне.
+    """
+
+    def to_python(self, data):
+        file = forms.FileField.to_python(self, data)
+        if file is None:
+            return None
+        if hasattr(data, "temporary_file_path"):
+            source = data.temporary_file_path()
+        else:
+            source = data
+        try:
+            with Image.open(source) as image:
+                file.image = image
+                file.content_type = Image.MIME.get(image.format)
+        except Exception as exc:
+            raise forms.ValidationError(
+                self.error_messages["invalid_image"], code="invalid_image"
+            ) from exc
+        file.seek(0)
+        return file
+
+
+class RecipeImageField(Base64ImageField):
+    """Поле фото рецепта: строка base64 или файл из multipart-запроса.
+
+    Формат и размеры проверяются по заголовку изображения.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("_DjangoImageField", ImageHeaderField)
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            image = serializers.ImageField.to_internal_value(self, data)
+        else:
+            image = super().to_internal_value(data)
+        if image is not None and max(image.image.size) > (
+            settings.RECIPE_IMAGE_MAX_SIDE
+        ):
+            raise serializers.ValidationError(
+                "Размер изображения не должен превышать "
+                f"{settings.RECIPE_IMAGE_MAX_SIDE} пикселей по стороне."
+            )
+        return image
+
+
+class ImageVariantField(serializers.ReadOnlyField):
+    """Ссылка на уменьшенную копию фото рецепта.
+
+    Пока копия не создана, возвращает ссылку на исходное фото.
+    """
+
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs["source"] = "*"
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return None
+        name = recipe.image_variants.get(self.variant)
+        url = recipe.image.storage.url(name) if name else recipe.image.url
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+
 class IngredientsSerializer(serializers.ModelSerializer):
     """Сериализатор для ингредиентов."""
 
@@ -56,16 +156,67 @@ class TagsSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "color", "slug")
 
 
+class IngredientIdField(serializers.PrimaryKeyRelatedField):
+    """Поле id ингредиента.
+
+    Внутри AmountRecipeListSerializer берет ингредиенты, загруженные
+    списком одним запросом, иначе ищет ингредиент в БД.
+    """
+
+    def to_internal_value(self, data):
+        ingredients = getattr(self.parent.parent, "ingredients_by_id", None)
+        if ingredients is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            return ingredients[int(data)]
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+
+
+class AmountRecipeListSerializer(serializers.ListSerializer):
+    """Список ингредиентов рецепта: все id проверяются одним запросом."""
+
+    @staticmethod
+    def get_ingredient_ids(data):
+        ids = set()
+        for item in data:
+            pk = item.get("id") if isinstance(item, dict) else None
+            if isinstance(pk, bool):
+                continue
+            try:
+                ids.add(int(pk))
+            except (TypeError, ValueError):
+                continue
+        return ids
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            ids = self.get_ingredient_ids(data)
+            self.ingredients_by_id = Ingredient.objects.in_bulk(ids)
+            unknown = sorted(ids - self.ingredients_by_id.keys())
+            if unknown:
+                raise serializers.ValidationError(
+                    "Ингредиенты с id "
+                    f"{', '.join(map(str, unknown))} не существуют."
+                )
+        return super().to_internal_value(data)
+
+
 class AmountRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для ингредиентов и их количества в рецепте."""
 
-    id = serializers.PrimaryKeyRelatedField(
+    id = IngredientIdField(
         source="ingredient", queryset=Ingredient.objects.all(), write_only=True
     )
 
     class Meta:
         model = Amount
         fields = ("id", "amount")
+        list_serializer_class = AmountRecipeListSerializer
 
 
 class AmountReadSerializer(serializers.ModelSerializer):
@@ -87,6 +238,10 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     """Сериализатор для вывода данных о рецепте."""
 
     image = Base64ImageField()
+    image_thumb = ImageVariantField("thumb_jpeg")
+    image_thumb_webp = ImageVariantField("thumb_webp")
+    image_detail = ImageVariantField("detail_jpeg")
+    image_detail_webp = ImageVariantField("detail_webp")
     author = CustomUserSerializer()
     tags = TagsSerializer(many=True)
     ingredients = AmountReadSerializer(source="amounts", many=True)
@@ -102,13 +257,20 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             "is_favorited",
             "is_in_shopping_cart",
             "image",
+            "image_thumb",
+            "image_thumb_webp",
+            "image_detail",
+            "image_detail_webp",
             "name",
             "text",
             "cooking_time",
             "author",
+            "favorites_count",
         )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
         request = self.context.get("request")
         return (
             request
@@ -117,6 +279,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
         request = self.context.get("request")
         return (
             request
@@ -127,13 +291,161 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
 
+class RecipeReadFastSerializer:
+    """Быстрый вариант RecipeReadSerializer для списков рецептов.
+
+    Строит тот же ответ без полей DRF из строк .values() рецептов
+    (get_rows) и кортежей авторов, тегов и ингредиентов, загруженных
+    одним запросом на каждую связь; теги берутся из кэша каталога.
+    Строки должны быть аннотированы флагами with_user_flags. Признак
+    подписки на автора считается для user, по умолчанию - для
+    пользователя запроса.
+    """
+
+    fields = (
+        "id",
+        "name",
+        "text",
+        "cooking_time",
+        "image",
+        "image_variants",
+        "favorites_count",
+        "author_id",
+        "pub_date",
+        "updated_at",
+    )
+    image_variants = (
+        ("image_thumb", "thumb_jpeg"),
+        ("image_thumb_webp", "thumb_webp"),
+        ("image_detail", "detail_jpeg"),
+        ("image_detail_webp", "detail_webp"),
+    )
+
+    def __init__(self, rows, context=None, user=None):
+        self.rows = rows
+        self.context = context or {}
+        self.user = user
+
+    @classmethod
+    def get_rows(cls, queryset):
+        """Строки рецептов с полями для ответа и аннотациями набора
+        (флагами пользователя и, например, релевантностью поиска, по
+        которым работает курсорная пагинация).
+        """
+        return queryset.values(*cls.fields, *queryset.query.annotations)
+
+    def get_authors(self, author_ids):
+        user = self.user
+        if user is None:
+            request = self.context.get("request")
+            user = request.user if request else None
+        subscribed = set()
+        if user is not None and user.is_authenticated:
+            subscribed = set(
+                Follow.objects.filter(
+                    user=user, following_id__in=author_ids
+                ).values_list("following_id", flat=True)
+            )
+        return {
+            id: {
+                "id": id,
+                "username": username,
+                "email": email,
+                "first_name": first_name,
+                "last_name": last_name,
+                "is_subscribed": id in subscribed,
+            }
+            for id, username, email, first_name, last_name in (
+                User.objects.filter(pk__in=author_ids).values_list(
+                    "id", "username", "email", "first_name", "last_name"
+                )
+            )
+        }
+
+    def get_tags(self, recipe_ids):
+        tag_ids = {}
+        for recipe_id, tag_id in (
+            Recipe.tags.through.objects.filter(recipe_id__in=recipe_ids)
+            .order_by("tag_id")
+            .values_list("recipe_id", "tag_id")
+        ):
+            tag_ids.setdefault(recipe_id, []).append(tag_id)
+        tags = get_tag_catalogue(
+            require_ids={tag_id for ids in tag_ids.values() for tag_id in ids}
+        ).tags_by_id
+        return {
+            recipe_id: [tags[tag_id] for tag_id in ids]
+            for recipe_id, ids in tag_ids.items()
+        }
+
+    def get_ingredients(self, recipe_ids):
+        ingredients = {}
+        for recipe_id, id, name, amount, measurement_unit in (
+            Amount.objects.filter(recipe_id__in=recipe_ids)
+            .order_by("id")
+            .values_list(
+                "recipe_id",
+                "ingredient_id",
+                "ingredient__name",
+                "amount",
+                "ingredient__measurement_unit",
+            )
+        ):
+            ingredients.setdefault(recipe_id, []).append(
+                {
+                    "id": id,
+                    "name": name,
+                    "amount": amount,
+                    "measurement_unit": measurement_unit,
+                }
+            )
+        return ingredients
+
+    @property
+    def data(self):
+        rows = list(self.rows)
+        recipe_ids = [row["id"] for row in rows]
+        authors = self.get_authors({row["author_id"] for row in rows})
+        tags = self.get_tags(recipe_ids)
+        ingredients = self.get_ingredients(recipe_ids)
+        request = self.context.get("request")
+        storage = Recipe._meta.get_field("image").storage
+
+        def get_url(name):
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request else url
+
+        data = []
+        for row in rows:
+            image = row["image"]
+            item = {
+                "id": row["id"],
+                "ingredients": ingredients.get(row["id"], []),
+                "tags": tags.get(row["id"], []),
+                "is_favorited": row["is_favorited"],
+                "is_in_shopping_cart": row["is_in_shopping_cart"],
+                "image": get_url(image) if image else None,
+            }
+            for field, variant in self.image_variants:
+                item[field] = (
+                    get_url(row["image_variants"].get(variant) or image)
+                    if image
+                    else None
+                )
+            item["name"] = row["name"]
+            item["text"] = row["text"]
+            item["cooking_time"] = row["cooking_time"]
+            item["author"] = authors[row["author_id"]]
+            item["favorites_count"] = row["favorites_count"]
+            data.append(item)
+        return data
+
+
 class RecipesCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания рецепта."""
 
-    image = Base64ImageField(required=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, required=True, queryset=Tag.objects.all()
-    )
+    image = RecipeImageField(required=True)
+    tags = CachedTagField(many=True, required=True, queryset=Tag.objects.all())
     ingredients = AmountRecipeSerializer(many=True, required=True)
 
     author = serializers.SlugRelatedField(
@@ -187,15 +499,47 @@ class RecipesCreateSerializer(serializers.ModelSerializer):
 
     @staticmethod
     def add_update_ingredients_and_tags(ingredients, tags, instance):
-        """Добавить или обновить рецепты и теги к рецепту."""
-        for ingredient in ingredients:
-            Amount.objects.update_or_create(
-                recipe=instance,
-                ingredient_id=ingredient["ingredient"].id,
-                amount=ingredient["amount"],
-            )
+        """Добавить или обновить рецепты и теги к рецепту.
+
+        Изменения вычисляются относительно текущих ингредиентов рецепта и
+        применяются пакетно, поэтому количество запросов не зависит от
+        числа ингредиентов. Возвращает id изменившихся ингредиентов.
+        """
+        amounts = {
+            ingredient["ingredient"].id: ingredient["amount"]
+            for ingredient in ingredients
+        }
+        existing = {
+            amount.ingredient_id: amount
+            for amount in Amount.objects.filter(recipe=instance)
+        }
+        removed = existing.keys() - amounts.keys()
+        changed = []
+        for ingredient_id, amount in amounts.items():
+            if ingredient_id in existing and (
+                existing[ingredient_id].amount != amount
+            ):
+                existing[ingredient_id].amount = amount
+                changed.append(existing[ingredient_id])
+        added = [
+            Amount(recipe=instance, ingredient_id=ingredient_id, amount=amount)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing
+        ]
+        if removed:
+            Amount.objects.filter(
+                recipe=instance, ingredient_id__in=removed
+            ).delete()
+        Amount.objects.bulk_update(changed, ["amount"])
+        Amount.objects.bulk_create(added)
         instance.tags.set(tags)
+        return (
+            removed
+            | {amount.ingredient_id for amount in changed}
+            | {amount.ingredient_id for amount in added}
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
         request = self.context.get("request")
         ingredient_data = validated_data.pop("ingredients")
@@ -207,15 +551,19 @@ class RecipesCreateSerializer(serializers.ModelSerializer):
         )
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tag_data = validated_data.pop("tags")
         ingredient_data = validated_data.pop("ingredients")
-        instance.ingredients.clear()
-        self.add_update_ingredients_and_tags(
+        ingredient_ids = self.add_update_ingredients_and_tags(
             ingredients=ingredient_data,
             tags=tag_data,
             instance=instance,
         )
+        if ingredient_ids:
+            ShoppingListItem.objects.refresh_recipe(
+                instance.id, ingredient_ids
+            )
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
@@ -226,12 +574,22 @@ class RecipesCreateSerializer(serializers.ModelSerializer):
 
 class RecipeShortSerializer(serializers.ModelSerializer):
     """Упрощенный сериализатор для рецептов.
-    Обрабатывает поля id, name, image, cooking_time.
+    Обрабатывает поля id, name, image, image_thumb, cooking_time.
     """
 
+    image_thumb = ImageVariantField("thumb_jpeg")
+    image_thumb_webp = ImageVariantField("thumb_webp")
+
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = (
+            "id",
+            "name",
+            "image",
+            "image_thumb",
+            "image_thumb_webp",
+            "cooking_time",
+        )
         read_only_fields = ("id", "name", "image", "cooking_time")
 
 
@@ -239,24 +597,30 @@ class FollowerReadSerializer(CustomUserSerializer):
     """Сериализатор для отображения подписок."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta(CustomUserSerializer.Meta):
         model = User
         fields = CustomUserSerializer.Meta.fields + (
             "recipes",
             "recipes_count",
+            "followers_count",
         )
 
-    def get_recipes_count(self, instance):
-        return instance.recipes.count()
+    @staticmethod
+    def get_recipes_limit(request):
+        """Получить ограничение количества рецептов из запроса."""
+        limit = request.GET.get("recipes_limit")
+        return int(limit) if limit and limit.isdigit() else None
 
     def get_recipes(self, instance):
-        request = self.context.get("request")
-        limit = request.GET.get("recipes_limit")
-        limit_value = int(limit) if limit and limit.isdigit() else None
+        recipes = getattr(instance, "limited_recipes", None)
+        if recipes is None:
+            limit = self.get_recipes_limit(self.context.get("request"))
+            recipes = instance.recipes.defer("search_vector").order_by(
+                "-pub_date", "-id"
+            )[:limit]
         return RecipeShortSerializer(
-            instance.recipes.order_by("-pub_date")[:limit_value],
+            recipes,
             many=True,
             context=self.context,
         ).data
@@ -297,7 +661,9 @@ class FollowSerializer(serializers.ModelSerializer):
 class ShoppingCartSerializer(serializers.ModelSerializer):
     """Сериализатор для продуктовой корзины."""
 
-    recipe = serializers.PrimaryKeyRelatedField(queryset=Recipe.objects.all())
+    recipe = serializers.PrimaryKeyRelatedField(
+        queryset=Recipe.objects.defer("search_vector")
+    )
     user = serializers.SlugRelatedField(
         slug_field="username",
         default=serializers.CurrentUserDefault(),
@@ -322,7 +688,9 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
 class FavoriteSerializer(serializers.ModelSerializer):
     """Сериализатор для добавления в избранное."""
 
-    recipe = serializers.PrimaryKeyRelatedField(queryset=Recipe.objects.all())
+    recipe = serializers.PrimaryKeyRelatedField(
+        queryset=Recipe.objects.defer("search_vector")
+    )
     user = serializers.SlugRelatedField(
         slug_field="username",
         default=serializers.CurrentUserDefault(),
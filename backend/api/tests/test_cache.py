@@ -0,0 +1,241 @@
+# flake8: noqa
+import json
+import time
+from http import HTTPStatus
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework.test import APITestCase
+
+from api.cache import recipe_fragments
+from api.serializers import RecipeReadSerializer
+from recipes.cache import get_tag_catalogue
+from recipes.models import (
+    Amount,
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from users.models import Follow
+
+User = get_user_model()
+
+
+class TestRecipeListCache(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username="Пользователь", email="user@test.com"
+        )
+        cls.tags = [
+            Tag.objects.create(name=name, slug=slug, color=color)
+            for name, slug, color in (
+                ("Завтрак", "breakfast", "#fff"),
+                ("Обед", "lunch", "#000"),
+            )
+        ]
+        cls.recipe = Recipe.objects.create(
+            name="Суп из семи круп",
+            text="Сомнительно... но, окэй",
+            cooking_time=120,
+            author=cls.user,
+        )
+        cls.recipe.tags.set(cls.tags)
+        cls.url = reverse("api:recipes-list")
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url=None):
+        return self.client.get(url or self.url)
+
+    def cache_count(self, result):
+        return (
+            REGISTRY.get_sample_value(
+                "foodgram_recipe_list_cache_total", {"result": result}
+            )
+            or 0
+        )
+
+    def test_anonymous_list_is_cached(self):
+        """Проверка, что повторный запрос анонима отдается из кэша."""
+        hits, misses = self.cache_count("hit"), self.cache_count("miss")
+        response = self.get()
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response["X-Cache"], "MISS")
+        with self.assertNumQueries(1):
+            cached = self.get()
+        self.assertEqual(cached["X-Cache"], "HIT")
+        self.assertEqual(cached.json(), response.json())
+        self.assertEqual(self.cache_count("hit"), hits + 1)
+        self.assertEqual(self.cache_count("miss"), misses + 1)
+
+    def test_query_string_is_normalized(self):
+        """Проверка, что порядок параметров не влияет на ключ кэша."""
+        self.get(self.url + "?tags=breakfast&limit=1&tags=lunch")
+        response = self.get(self.url + "?limit=1&tags=lunch&tags=breakfast")
+        self.assertEqual(response["X-Cache"], "HIT")
+        response = self.get(self.url + "?limit=2&tags=lunch&tags=breakfast")
+        self.assertEqual(response["X-Cache"], "MISS")
+
+    def test_authenticated_list_is_not_cached(self):
+        """Проверка, что ответы авторизованным пользователям не кэшируются."""
+        self.client.force_authenticate(self.user)
+        for _ in range(2):
+            self.assertNotIn("X-Cache", self.get())
+
+    def test_invalidation(self):
+        """Проверка, что изменения рецептов и тегов сбрасывают кэш."""
+        changes = (
+            ("recipe", lambda: self.recipe.save()),
+            ("recipe_tags", lambda: self.recipe.tags.remove(self.tags[0])),
+            ("tag", lambda: self.tags[1].save()),
+            ("author", self.rename_author),
+        )
+        for name, change in changes:
+            with self.subTest(change=name):
+                self.get()
+                self.assertEqual(self.get()["X-Cache"], "HIT")
+                change()
+                response = self.get()
+                self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.json()["results"][0]["tags"]), 1)
+
+    def rename_author(self):
+        self.user.first_name = "Новое имя"
+        self.user.save()
+
+    def test_not_invalidated_by_user_actions(self):
+        """Проверка, что избранное и данные пользователя, которых нет в
+        ответе, не сбрасывают кэш, а счетчик избранного обновляется
+        по истечении срока кэша.
+        """
+        changes = (
+            (
+                "favorite",
+                lambda: Favorite.objects.create(
+                    user=self.user, recipe=self.recipe
+                ),
+            ),
+            ("last_login", lambda: update_last_login(None, self.user)),
+        )
+        self.get()
+        for name, change in changes:
+            with self.subTest(change=name):
+                change()
+                self.assertEqual(self.get()["X-Cache"], "HIT")
+        expired = time.time() + settings.RECIPE_LIST_CACHE_TIMEOUT + 1
+        with mock.patch("time.time", return_value=expired):
+            response = self.get()
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["results"][0]["favorites_count"], 1)
+
+
+class TestRecipeFragmentCache(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username="Пользователь", email="user@test.com"
+        )
+        cls.other_user = User.objects.create(
+            username="Другой", email="other@test.com"
+        )
+        cls.author = User.objects.create(
+            username="Автор", email="author@test.com"
+        )
+        tag = Tag.objects.create(name="Обед", slug="lunch", color="#fff")
+        ingredient = Ingredient.objects.create(
+            name="Соль", measurement_unit="г"
+        )
+        cls.recipes = []
+        for i in range(4):
+            recipe = Recipe.objects.create(
+                name=f"Рецепт {i}",
+                text="Описание",
+                cooking_time=10,
+                author=cls.author if i % 2 else cls.user,
+            )
+            recipe.tags.add(tag)
+            Amount.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=i + 1
+            )
+            cls.recipes.append(recipe)
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[1])
+        Follow.objects.create(user=cls.user, following=cls.author)
+        cls.url = reverse("api:recipes-list")
+
+    def setUp(self):
+        cache.clear()
+        recipe_fragments.clear()
+        get_tag_catalogue()
+
+    def get(self, user):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response, len(context)
+
+    def expected(self, user, response):
+        serializer = RecipeReadSerializer(
+            Recipe.objects.with_user_flags(user)
+            .with_related(user)
+            .order_by("-pub_date"),
+            many=True,
+            context={"request": response.wsgi_request},
+        )
+        return json.loads(json.dumps(serializer.data))
+
+    def test_output_matches_serializer(self):
+        """Проверка, что ответ из кэша совпадает с сериализатором."""
+        for user in (self.user, self.other_user, self.user):
+            with self.subTest(user=user.username):
+                response, _ = self.get(user)
+                self.assertEqual(
+                    response.json()["results"], self.expected(user, response)
+                )
+
+    def test_warm_list_skips_prefetches(self):
+        """Проверка, что для рецептов из кэша не выполняется подгрузка
+        связанных данных.
+        """
+        _, cold = self.get(self.user)
+        _, warm = self.get(self.other_user)
+        self.assertEqual(cold - warm, 4)
+
+    def test_changed_recipe_is_reserialized(self):
+        """Проверка, что измененный рецепт не берется из кэша."""
+        self.get(self.user)
+        recipe = self.recipes[2]
+        recipe.name = "Новое название"
+        recipe.save()
+        response, _ = self.get(self.user)
+        names = [item["name"] for item in response.json()["results"]]
+        self.assertIn("Новое название", names)
+
+    def test_user_actions_keep_fragments(self):
+        """Проверка, что избранное, корзина и подписки не сбрасывают
+        кэш фрагментов, а счетчик избранного в ответе актуален.
+        """
+        self.get(self.user)
+        _, warm = self.get(self.other_user)
+        Favorite.objects.create(user=self.other_user, recipe=self.recipes[2])
+        ShoppingCart.objects.create(
+            user=self.other_user, recipe=self.recipes[2]
+        )
+        Follow.objects.create(user=self.other_user, following=self.author)
+        response, queries = self.get(self.other_user)
+        self.assertEqual(queries, warm)
+        self.assertEqual(
+            response.json()["results"], self.expected(self.other_user, response)
+        )
@@ -0,0 +1,178 @@
+# flake8: noqa
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from recipes.models import Amount, Ingredient, Recipe, ShoppingCart, Tag
+from users.models import Follow
+
+User = get_user_model()
+
+
+class TestConditionalRequests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username="Пользователь", email="user@test.com"
+        )
+        cls.author = User.objects.create(
+            username="Автор", email="author@test.com"
+        )
+        cls.tag = Tag.objects.create(name="Обед", slug="lunch", color="#fff")
+        cls.ingredient = Ingredient.objects.create(
+            name="Соль", measurement_unit="г"
+        )
+        cls.recipe = Recipe.objects.create(
+            name="Суп из семи круп",
+            text="Сомнительно... но, окэй",
+            cooking_time=120,
+            author=cls.author,
+        )
+        cls.other_recipe = Recipe.objects.create(
+            name="Плов",
+            text="Охапка дров и плов готов!",
+            cooking_time=20,
+            author=cls.user,
+        )
+        Amount.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=10
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+        self.urls = (
+            reverse("api:recipes-list"),
+            reverse("api:recipes-detail", kwargs={"pk": self.recipe.pk}),
+        )
+
+    def assertNotModified(self, url, **headers):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response["ETag"], **headers
+            )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+        return response
+
+    def rename_author(self):
+        self.author.first_name = "Новое имя"
+        self.author.save()
+
+    def test_not_modified(self):
+        """Проверка ответа 304 по ETag и по Last-Modified."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.assertNotModified(url)
+                self.assertIn("Last-Modified", response)
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+
+    def test_etag_depends_on_user_and_query(self):
+        """Проверка, что ETag отличается для пользователей и фильтров."""
+        url = self.urls[0]
+        etag = self.client.get(url)["ETag"]
+        self.assertNotEqual(self.client.get(url + "?limit=1")["ETag"], etag)
+        self.client.force_authenticate(self.author)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+            HTTPStatus.OK,
+        )
+
+    def test_modified(self):
+        """Проверка, что изменения рецепта и связанных данных
+        сбрасывают ETag списка и рецепта.
+        """
+        changes = (
+            ("amount", lambda: Amount.objects.get(recipe=self.recipe).save()),
+            ("tags", lambda: self.recipe.tags.add(self.tag)),
+            ("tag", lambda: Tag.objects.get().save()),
+            ("ingredient", lambda: Ingredient.objects.get().save()),
+            ("author", self.rename_author),
+            (
+                "follow",
+                lambda: Follow.objects.create(
+                    user=self.user, following=self.author
+                ),
+            ),
+            (
+                "favorite",
+                lambda: self.client.post(
+                    reverse(
+                        "api:recipes-favorite", kwargs={"pk": self.recipe.pk}
+                    )
+                ),
+            ),
+            (
+                "shopping_cart",
+                lambda: self.client.post(
+                    reverse(
+                        "api:recipes-shopping-cart",
+                        kwargs={"pk": self.recipe.pk},
+                    )
+                ),
+            ),
+        )
+        for name, change in changes:
+            etags = [self.client.get(url)["ETag"] for url in self.urls]
+            change()
+            for url, etag in zip(self.urls, etags):
+                with self.subTest(change=name, url=url):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_list_modified_on_delete(self):
+        """Проверка, что удаление рецепта сбрасывает ETag списка и без
+        общего кэша.
+        """
+        url = self.urls[0]
+        etag = self.client.get(url)["ETag"]
+        self.other_recipe.delete()
+        cache.clear()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.data["count"], 1)
+
+    def test_not_modified_by_other_users(self):
+        """Проверка, что корзина и подписки другого пользователя, а также
+        вход и смена пароля автора не сбрасывают ETag.
+        """
+        changes = (
+            (
+                "shopping_cart",
+                lambda: ShoppingCart.objects.create(
+                    user=self.author, recipe=self.recipe
+                ),
+            ),
+            (
+                "follow",
+                lambda: Follow.objects.create(
+                    user=self.author, following=self.user
+                ),
+            ),
+            ("last_login", lambda: update_last_login(None, self.author)),
+            ("password", self.change_author_password),
+        )
+        for name, change in changes:
+            etags = [self.client.get(url)["ETag"] for url in self.urls]
+            change()
+            for url, etag in zip(self.urls, etags):
+                with self.subTest(change=name, url=url):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(
+                        response.status_code, HTTPStatus.NOT_MODIFIED
+                    )
+
+    def change_author_password(self):
+        self.author.set_password("new-password")
+        self.author.save()
@@ -0,0 +1,81 @@
+# flake8: noqa
+from http import HTTPStatus
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from recipes.models import Favorite, Recipe
+from users.models import Follow
+
+User = get_user_model()
+
+
+class TestCounters(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username="Пользователь", email="user@test.com"
+        )
+        cls.author = User.objects.create(
+            username="Автор", email="author@test.com"
+        )
+        cls.recipe = Recipe.objects.create(
+            name="Суп из семи круп",
+            text="Сомнительно... но, окэй",
+            cooking_time=120,
+            author=cls.author,
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def test_favorites_count(self):
+        """Проверка счетчика добавлений в избранное."""
+        url = reverse("api:recipes-favorite", kwargs={"pk": self.recipe.pk})
+        for method, expected_status, expected_count in (
+            (self.client.post, HTTPStatus.CREATED, 1),
+            (self.client.post, HTTPStatus.BAD_REQUEST, 1),
+            (self.client.delete, HTTPStatus.NO_CONTENT, 0),
+            (self.client.delete, HTTPStatus.BAD_REQUEST, 0),
+        ):
+            with self.subTest(method=method.__name__):
+                response = method(url)
+                self.assertEqual(response.status_code, expected_status)
+                self.recipe.refresh_from_db()
+                self.assertEqual(self.recipe.favorites_count, expected_count)
+
+    def test_recipes_and_followers_count(self):
+        """Проверка счетчиков рецептов и подписчиков автора."""
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 1)
+        url = reverse("api:users-follow", kwargs={"id": self.author.pk})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(response.data["recipes_count"], 1)
+        self.assertEqual(response.data["followers_count"], 1)
+        self.recipe.delete()
+        self.client.delete(url)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 0)
+        self.assertEqual(self.author.followers_count, 0)
+
+    def test_recount_counters_command(self):
+        """Проверка исправления расхождений счетчиков командой."""
+        Favorite.objects.bulk_create(
+            [Favorite(user=self.user, recipe=self.recipe)]
+        )
+        Follow.objects.bulk_create(
+            [Follow(user=self.user, following=self.author)]
+        )
+        User.objects.filter(pk=self.author.pk).update(recipes_count=5)
+        call_command("recount_counters", stdout=StringIO())
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        self.assertEqual(self.author.recipes_count, 1)
+        self.assertEqual(self.author.followers_count, 1)
@@ -0,0 +1,148 @@
+# flake8: noqa
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from api.serializers import RecipeReadFastSerializer, RecipeReadSerializer
+from recipes.models import (
+    Amount,
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from users.models import Follow
+
+User = get_user_model()
+
+SEEDS = range(25)
+ALPHABET = "abcxyzабвгдеёжэюя ЁЖ\"'\\/<>&\n\t✓😀0123456789"
+VARIANTS = ("thumb_jpeg", "thumb_webp", "detail_jpeg", "detail_webp")
+
+
+def random_text(rng, min_length=1, max_length=30):
+    return "".join(
+        rng.choice(ALPHABET)
+        for _ in range(rng.randint(min_length, max_length))
+    )
+
+
+class TestRecipeReadFastSerializer(APITestCase):
+    """Проверка на случайных данных, что быстрый сериализатор дает
+    побайтно тот же JSON, что и RecipeReadSerializer.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def generate(self, rng, seed):
+        users = [
+            User.objects.create(
+                username=f"user{seed}_{i}",
+                email=f"user{seed}_{i}@test.com",
+                first_name=random_text(rng),
+                last_name=random_text(rng, 0),
+            )
+            for i in range(rng.randint(1, 4))
+        ]
+        tags = [
+            Tag.objects.create(
+                name=f"{random_text(rng)} {seed}_{i}",
+                slug=f"tag{seed}_{i}",
+                color=f"#{seed:03d}{i:03d}",
+            )
+            for i in range(rng.randint(0, 4))
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f"{random_text(rng)} {seed}_{i}",
+                measurement_unit=random_text(rng, 1, 5),
+            )
+            for i in range(rng.randint(1, 8))
+        ]
+        recipes = []
+        for i in range(rng.randint(1, 12)):
+            image = (
+                rng.choice(("", f"recipes/images/{seed}_{i}.png"))
+                if rng.random() < 0.8
+                else f"recipes/images/{random_text(rng, 1, 5)}.jpg"
+            )
+            recipe = Recipe.objects.create(
+                name=random_text(rng),
+                text=random_text(rng, 1, 200),
+                cooking_time=rng.randint(1, 32000),
+                author=rng.choice(users),
+                image=image,
+                image_variants={
+                    variant: f"recipes/images/variants/{seed}_{i}_{variant}"
+                    for variant in VARIANTS
+                    if image and rng.random() < 0.5
+                },
+                favorites_count=rng.randint(0, 1000),
+            )
+            recipe.tags.set(rng.sample(tags, rng.randint(0, len(tags))))
+            Amount.objects.bulk_create(
+                Amount(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    amount=rng.randint(1, 32000),
+                )
+                for ingredient in rng.sample(
+                    ingredients, rng.randint(0, len(ingredients))
+                )
+            )
+            recipes.append(recipe)
+        viewer = users[0]
+        for model, field, objects in (
+            (Favorite, "recipe", recipes),
+            (ShoppingCart, "recipe", recipes),
+            (Follow, "following", users[1:]),
+        ):
+            for obj in rng.sample(objects, rng.randint(0, len(objects))):
+                model.objects.create(**{"user": viewer, field: obj})
+        return viewer, recipes
+
+    def render(self, user, recipes, fast):
+        request = Request(APIRequestFactory().get("/api/recipes/"))
+        request.user = user
+        queryset = (
+            Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes])
+            .order_by("-pub_date", "-id")
+            .with_user_flags(user)
+        )
+        context = {"request": request}
+        if fast:
+            data = RecipeReadFastSerializer(
+                RecipeReadFastSerializer.get_rows(queryset), context=context
+            ).data
+        else:
+            data = RecipeReadSerializer(
+                queryset.with_related(user), many=True, context=context
+            ).data
+        return JSONRenderer().render(data)
+
+    def test_output_is_identical(self):
+        for seed in SEEDS:
+            rng = random.Random(seed)
+            viewer, recipes = self.generate(rng, seed)
+            for user in (viewer, AnonymousUser()):
+                with self.subTest(seed=seed, user=str(user)):
+                    self.assertEqual(
+                        self.render(user, recipes, fast=True),
+                        self.render(user, recipes, fast=False),
+                    )
+
+    def test_query_count(self):
+        """Проверка, что количество запросов не зависит от числа рецептов:
+        рецепты, авторы, подписки, теги и ингредиенты.
+        """
+        viewer, recipes = self.generate(random.Random(0), 0)
+        self.render(viewer, recipes, fast=True)
+        with self.assertNumQueries(5):
+            self.render(viewer, recipes, fast=True)
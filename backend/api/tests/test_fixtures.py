@@ -0,0 +1,111 @@
+# flake8: noqa
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from recipes.models import (
+    Amount,
+    Favorite,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+)
+from users.models import Follow
+
+User = get_user_model()
+
+OPTIONS = {
+    "users": 50,
+    "recipes": 200,
+    "favorites_per_user": 10,
+    "carts_per_user": 2,
+    "follows_per_user": 5,
+    "batch_size": 100,
+}
+
+
+class TestGenerateFixtures(TestCase):
+    def generate(self, **options):
+        stdout = StringIO()
+        call_command("generate_fixtures", stdout=stdout, **OPTIONS, **options)
+        return stdout.getvalue()
+
+    def snapshot(self):
+        """Сгенерированные данные относительно первых id пользователей и
+        рецептов, чтобы сравнивать запуски после существующих данных.
+        """
+        users = User.objects.order_by("pk")
+        recipes = Recipe.objects.order_by("pk")
+        user_start = users.last().pk - OPTIONS["users"] + 1
+        recipe_start = recipes.last().pk - OPTIONS["recipes"] + 1
+        users = users.filter(pk__gte=user_start)
+        recipes = recipes.filter(pk__gte=recipe_start)
+        return {
+            "authors": [
+                recipe.author_id - user_start for recipe in recipes
+            ],
+            "amounts": sorted(
+                (recipe_id - recipe_start, ingredient_id, amount)
+                for recipe_id, ingredient_id, amount in Amount.objects.filter(
+                    recipe__in=recipes
+                ).values_list("recipe_id", "ingredient_id", "amount")
+            ),
+            "favorites": sorted(
+                (user_id - user_start, recipe_id - recipe_start)
+                for user_id, recipe_id in Favorite.objects.filter(
+                    user__in=users
+                ).values_list("user_id", "recipe_id")
+            ),
+            "follows": sorted(
+                (user_id - user_start, following_id - user_start)
+                for user_id, following_id in Follow.objects.filter(
+                    user__in=users
+                ).values_list("user_id", "following_id")
+            ),
+        }
+
+    def test_generated_data(self):
+        """Проверка количества строк, счетчиков и списков покупок."""
+        output = self.generate()
+        self.assertIn("строк/с", output)
+        self.assertEqual(User.objects.count(), OPTIONS["users"])
+        self.assertEqual(Recipe.objects.count(), OPTIONS["recipes"])
+        self.assertFalse(Recipe.objects.filter(amounts=None).exists())
+        self.assertFalse(Recipe.objects.filter(tags=None).exists())
+        for model in (Favorite, ShoppingCart, Follow):
+            with self.subTest(model=model.__name__):
+                self.assertTrue(model.objects.exists())
+        stdout = StringIO()
+        call_command("recount_counters", stdout=stdout)
+        self.assertEqual(stdout.getvalue().count("исправлено 0."), 3)
+        self.assertEqual(
+            ShoppingListItem.objects.count(),
+            ShoppingListItem.objects.totals().count(),
+        )
+
+    def test_popularity_is_skewed(self):
+        """Проверка, что популярность рецептов и авторов неравномерна."""
+        self.generate()
+        for queryset, counter in (
+            (Recipe.objects.all(), "favorites_count"),
+            (User.objects.all(), "recipes_count"),
+            (User.objects.all(), "followers_count"),
+        ):
+            with self.subTest(counter=counter):
+                counts = sorted(
+                    queryset.values_list(counter, flat=True), reverse=True
+                )
+                self.assertGreater(counts[0], 5 * counts[len(counts) // 2])
+
+    def test_seed_is_deterministic(self):
+        """Проверка, что одинаковый seed дает одинаковые данные, а другой
+        seed - другие.
+        """
+        self.generate(seed=1)
+        first = self.snapshot()
+        self.generate(seed=1)
+        self.assertEqual(self.snapshot(), first)
+        self.generate(seed=2)
+        self.assertNotEqual(self.snapshot(), first)
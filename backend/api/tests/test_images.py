@@ -0,0 +1,267 @@
+# flake8: noqa
+import base64
+import json
+import os
+import shutil
+import tempfile
+import tracemalloc
+from http import HTTPStatus
+from io import BytesIO, StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import (
+    APIRequestFactory,
+    APITestCase,
+    force_authenticate,
+)
+
+from api.views import RecipesViewSet
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image(size, image_format="PNG"):
+    buffer = BytesIO()
+    Image.new("RGB", size, color="red").save(buffer, image_format)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f"data:image/{image_format.lower()};base64,{encoded}"
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    RECIPE_IMAGE_ASYNC=False,
+    RECIPE_IMAGE_VARIANTS={"thumb": 40, "detail": 100},
+)
+class TestRecipeImages(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username="Автор", email="author@test.com"
+        )
+        cls.tag = Tag.objects.create(
+            name="Обед", slug="lunch", color="#32CD32"
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name="горох", measurement_unit="г"
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def create_recipe(self, image):
+        self.client.force_authenticate(self.author)
+        data = {
+            "ingredients": [{"id": self.ingredient.id, "amount": 10}],
+            "tags": [self.tag.id],
+            "image": image,
+            "name": "Плов",
+            "text": "Охапка дров и плов готов!",
+            "cooking_time": 20,
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse("api:recipes-list"),
+                data=json.dumps(data),
+                content_type="application/json",
+            )
+
+    def test_image_variants(self):
+        """Проверка создания уменьшенных копий фото рецепта."""
+        response = self.create_recipe(make_image((300, 200)))
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        recipe = Recipe.objects.get()
+        expected_sizes = {
+            "thumb_jpeg": ((40, 27), "JPEG"),
+            "thumb_webp": ((40, 27), "WEBP"),
+            "detail_jpeg": ((100, 67), "JPEG"),
+            "detail_webp": ((100, 67), "WEBP"),
+        }
+        for variant, (size, image_format) in expected_sizes.items():
+            with self.subTest(variant=variant):
+                with recipe.image.storage.open(
+                    recipe.image_variants[variant]
+                ) as file, Image.open(file) as image:
+                    self.assertEqual(image.size, size)
+                    self.assertEqual(image.format, image_format)
+        response = self.client.get(
+            reverse("api:recipes-detail", kwargs={"pk": recipe.pk})
+        )
+        self.assertTrue(response.data["image_thumb"].endswith("_thumb.jpg"))
+        self.assertTrue(
+            response.data["image_detail_webp"].endswith("_detail.webp")
+        )
+
+    def test_lost_job_is_picked_up_by_sweep(self):
+        """Проверка, что отметка ожидания копий хранится в БД и задачу,
+        не выполненную процессом, выполняет generate_image_variants
+        --pending.
+        """
+        self.client.force_authenticate(self.author)
+        with self.captureOnCommitCallbacks(execute=False):
+            response = self.client.post(
+                reverse("api:recipes-list"),
+                data=json.dumps(
+                    {
+                        "ingredients": [
+                            {"id": self.ingredient.id, "amount": 10}
+                        ],
+                        "tags": [self.tag.id],
+                        "image": make_image((300, 200)),
+                        "name": "Плов",
+                        "text": "Охапка дров и плов готов!",
+                        "cooking_time": 20,
+                    }
+                ),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        recipe = Recipe.objects.get()
+        self.assertIsNotNone(recipe.image_variants_pending_since)
+        self.assertEqual(recipe.image_variants, {})
+        call_command(
+            "generate_image_variants", "--pending", stdout=StringIO()
+        )
+        recipe.refresh_from_db()
+        self.assertIsNotNone(recipe.image_variants_pending_since)
+        call_command(
+            "generate_image_variants",
+            "--pending",
+            "--grace",
+            "0",
+            stdout=StringIO(),
+        )
+        recipe.refresh_from_db()
+        self.assertIsNone(recipe.image_variants_pending_since)
+        self.assertEqual(recipe.image_variants["source"], recipe.image.name)
+        self.assertIn("thumb_jpeg", recipe.image_variants)
+
+    def test_broken_image_is_decoded_in_background(self):
+        """Проверка, что запрос проверяет только заголовок фото, а фото,
+        которое не удается декодировать, остается без копий.
+        """
+        buffer = BytesIO()
+        Image.frombytes("RGB", (200, 200), os.urandom(200 * 200 * 3)).save(
+            buffer, "PNG"
+        )
+        truncated = buffer.getvalue()[: buffer.tell() // 2]
+        with self.assertLogs("recipes.images", "ERROR"):
+            response = self.create_recipe(
+                "data:image/png;base64,"
+                + base64.b64encode(truncated).decode()
+            )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        recipe = Recipe.objects.get()
+        self.assertEqual(recipe.image_variants, {"source": recipe.image.name})
+        self.assertIsNone(recipe.image_variants_pending_since)
+        response = self.client.get(
+            reverse("api:recipes-detail", kwargs={"pk": recipe.pk})
+        )
+        self.assertEqual(response.data["image_thumb"], response.data["image"])
+
+    def test_variants_are_deleted_with_recipe(self):
+        """Проверка удаления файлов копий фото вместе с рецептом."""
+        self.create_recipe(make_image((300, 200)))
+        recipe = Recipe.objects.get()
+        storage = recipe.image.storage
+        names = [
+            name
+            for key, name in recipe.image_variants.items()
+            if key != "source"
+        ]
+        self.assertTrue(all(storage.exists(name) for name in names))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(
+                reverse("api:recipes-detail", kwargs={"pk": recipe.pk})
+            )
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        self.assertFalse(any(storage.exists(name) for name in names))
+
+    @override_settings(RECIPE_IMAGE_MAX_SIDE=500)
+    def test_image_max_side(self):
+        """Проверка отклонения слишком больших изображений."""
+        response = self.create_recipe(make_image((501, 10)))
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn("image", response.data)
+        self.assertFalse(Recipe.objects.exists())
+
+    def multipart_data(self, image_file):
+        return {
+            "ingredients[0]id": self.ingredient.id,
+            "ingredients[0]amount": 10,
+            "tags": [self.tag.id],
+            "image": image_file,
+            "name": "Плов",
+            "text": "Охапка дров и плов готов!",
+            "cooking_time": 20,
+        }
+
+    def test_multipart_upload(self):
+        """Проверка создания и изменения рецепта multipart-запросом."""
+        self.client.force_authenticate(self.author)
+        image_file = BytesIO(
+            base64.b64decode(make_image((30, 20)).split(",")[1])
+        )
+        image_file.name = "photo.png"
+        response = self.client.post(
+            reverse("api:recipes-list"),
+            data=self.multipart_data(image_file),
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        recipe = Recipe.objects.get()
+        self.assertEqual(recipe.image.width, 30)
+        self.assertEqual(
+            list(recipe.amounts.values_list("ingredient_id", "amount")),
+            [(self.ingredient.id, 10)],
+        )
+        image_file.seek(0)
+        data = self.multipart_data(image_file)
+        data["name"] = "Жареный суп"
+        response = self.client.put(
+            reverse("api:recipes-detail", kwargs={"pk": recipe.pk}),
+            data=data,
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.data["name"], "Жареный суп")
+
+    def test_multipart_upload_memory(self):
+        """Проверка, что память на загрузку фото не зависит от размера
+        файла: файл записывается на диск частями.
+        """
+        buffer = BytesIO()
+        Image.frombytes("RGB", (1500, 1500), os.urandom(1500 * 1500 * 3)).save(
+            buffer, "PNG", compress_level=0
+        )
+        size = buffer.tell()
+        buffer.seek(0)
+        buffer.name = "photo.png"
+        body = encode_multipart(BOUNDARY, self.multipart_data(buffer))
+        request = APIRequestFactory().generic(
+            "POST",
+            reverse("api:recipes-list"),
+            body,
+            content_type=MULTIPART_CONTENT,
+        )
+        force_authenticate(request, user=self.author)
+        view = RecipesViewSet.as_view({"post": "create"})
+        tracemalloc.start()
+        try:
+            response = view(request)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            request.close()
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(Recipe.objects.get().image.size, size)
+        self.assertLess(peak, size / 4)
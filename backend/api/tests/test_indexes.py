@@ -0,0 +1,169 @@
+# flake8: noqa
+import os
+import random
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from api.views import CustomUserViewSet, RecipesViewSet
+from recipes.models import (
+    Amount,
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+)
+from users.models import Follow
+
+User = get_user_model()
+
+USERS_COUNT = 200
+RECIPES_COUNT = int(os.getenv("EXPLAIN_RECIPES_COUNT", 5000))
+INGREDIENTS_COUNT = 300
+
+
+class TestQueryPlans(APITestCase):
+    """Проверка по плану запроса (EXPLAIN), что основные запросы
+    используют индексы на большом наборе данных.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(0)
+        User.objects.bulk_create(
+            User(username=f"user{i}", email=f"user{i}@test.com")
+            for i in range(USERS_COUNT)
+        )
+        users = list(User.objects.all())
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"ингредиент {i}", measurement_unit="г")
+            for i in range(INGREDIENTS_COUNT)
+        )
+        ingredients = list(Ingredient.objects.all())
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    name=f"Рецепт {i}",
+                    text="Описание",
+                    cooking_time=10,
+                    author=rng.choice(users),
+                )
+                for i in range(RECIPES_COUNT)
+            ),
+            batch_size=1000,
+        )
+        recipes = list(Recipe.objects.all())
+        Amount.objects.bulk_create(
+            (
+                Amount(recipe=recipe, ingredient=ingredient, amount=10)
+                for recipe in recipes
+                for ingredient in rng.sample(ingredients, 3)
+            ),
+            batch_size=1000,
+        )
+        for model, per_user in ((Favorite, 20), (ShoppingCart, 5)):
+            model.objects.bulk_create(
+                (
+                    model(user=user, recipe=recipe)
+                    for user in users
+                    for recipe in rng.sample(recipes, per_user)
+                ),
+                batch_size=1000,
+            )
+        Follow.objects.bulk_create(
+            (
+                Follow(user=user, following=following)
+                for user in users
+                for following in rng.sample(users, 10)
+                if following != user
+            ),
+            batch_size=1000,
+        )
+        ShoppingListItem.objects.refresh()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        cls.user = users[0]
+
+    def get_request(self, path, params=None):
+        request = Request(APIRequestFactory().get(path, params))
+        request.user = self.user
+        return request
+
+    def get_indexes(self, model, columns):
+        """Имена индексов таблицы модели, начинающихся с колонок columns.
+
+        Уникальные ограничения в SQLite становятся автоматическими
+        индексами со своими именами, поэтому индексы ищутся по колонкам.
+        """
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            indexes = {
+                name: constraint["columns"]
+                for name, constraint in (
+                    connection.introspection.get_constraints(cursor, table)
+                ).items()
+                if constraint["index"] or constraint["unique"]
+            }
+            if connection.vendor == "sqlite":
+                cursor.execute(f"PRAGMA index_list({table})")
+                for name in [row[1] for row in cursor.fetchall()]:
+                    cursor.execute(f"PRAGMA index_info({name})")
+                    indexes[name] = [row[2] for row in cursor.fetchall()]
+        return {
+            name
+            for name, index_columns in indexes.items()
+            if index_columns[: len(columns)] == list(columns)
+        }
+
+    def assertUsesIndex(self, plan, model, *columns):
+        indexes = self.get_indexes(model, columns)
+        self.assertTrue(
+            any(index in plan for index in indexes),
+            f"Нет индекса {model.__name__}{columns} в плане:\n{plan}",
+        )
+
+    def assertNotSorted(self, plan):
+        self.assertNotRegex(plan, "TEMP B-TREE FOR ORDER BY|Sort Key")
+
+    def test_recipe_list(self):
+        """Страница рецептов читается по индексу даты публикации без
+        сортировки, флаги избранного и корзины - по уникальным индексам.
+        """
+        view = RecipesViewSet(
+            action="list",
+            request=self.get_request("/api/recipes/"),
+            kwargs={},
+            format_kwarg=None,
+        )
+        plan = view.filter_queryset(view.get_queryset())[:6].explain()
+        self.assertUsesIndex(plan, Recipe, "pub_date", "id")
+        self.assertUsesIndex(plan, Favorite, "user_id", "recipe_id")
+        self.assertUsesIndex(plan, ShoppingCart, "user_id", "recipe_id")
+        self.assertNotSorted(plan)
+
+    def test_shopping_list(self):
+        """Список покупок читается по индексу пользователя, а его
+        пересчет находит корзину пользователя по уникальному индексу.
+        """
+        self.assertUsesIndex(
+            RecipesViewSet.get_shopping_list_queryset(self.user).explain(),
+            ShoppingListItem,
+            "user_id",
+        )
+        plan = ShoppingListItem.objects.totals(
+            user_ids=[self.user.id]
+        ).explain()
+        self.assertUsesIndex(plan, ShoppingCart, "user_id", "recipe_id")
+        self.assertUsesIndex(plan, Amount, "recipe_id")
+
+    def test_subscriptions(self):
+        """Подписки пользователя читаются по индексу в порядке id."""
+        queryset = CustomUserViewSet.get_subscriptions_queryset(
+            self.get_request("/api/users/subscriptions/")
+        )
+        plan = queryset[:6].explain()
+        self.assertUsesIndex(plan, Follow, "user_id")
+        self.assertNotSorted(plan)
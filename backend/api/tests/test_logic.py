@@ -1,13 +1,19 @@
 # flake8: noqa
 import json
+import shutil
+import tempfile
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase
 
+from api.renderers import ShoppingListPDFRenderer
 from recipes.models import (
+    Amount,
     Favorite,
     Ingredient,
     Recipe,
@@ -26,7 +32,10 @@ from .api_data import (
 
 User = get_user_model()
 
+MEDIA_ROOT = tempfile.mkdtemp()
 
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
 class TestLogic(APITestCase):
     @classmethod
     def setUpTestData(cls):
@@ -64,9 +73,7 @@ class TestLogic(APITestCase):
     @classmethod
     def tearDownClass(cls):
         """Метод для удаления файлов, которые создаются при тестах."""
-        for recipe in Recipe.objects.all():
-            if recipe.image and hasattr(recipe.image, "path"):
-                recipe.image.delete(save=False)
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
         super().tearDownClass()
 
     def test_post_recipe_availability_for_anonymous(self):
@@ -284,6 +291,85 @@ class TestLogic(APITestCase):
                 )
                 self.client.logout()
 
+    def test_download_shopping_cart(self):
+        """Проверка суммирования ингредиентов в списке покупок: учитываются
+        только рецепты из корзины пользователя.
+        """
+        other_recipe = Recipe.objects.create(
+            name="Гороховая каша",
+            text="Просто горох",
+            cooking_time=60,
+            author=self.author,
+        )
+        Amount.objects.bulk_create(
+            [
+                Amount(
+                    recipe=self.recipe, ingredient=self.ingredient_1, amount=5
+                ),
+                Amount(
+                    recipe=self.recipe, ingredient=self.ingredient_2, amount=7
+                ),
+                Amount(
+                    recipe=other_recipe,
+                    ingredient=self.ingredient_1,
+                    amount=100,
+                ),
+            ]
+        )
+        cart_recipe = Recipe.objects.create(
+            name="Горох с мясом",
+            text="Горох и мясо",
+            cooking_time=30,
+            author=self.author,
+        )
+        Amount.objects.create(
+            recipe=cart_recipe, ingredient=self.ingredient_1, amount=10
+        )
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.user, recipe=cart_recipe)
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Token " + self.user_token.key
+        )
+        url = reverse("api:recipes-download-shopping-cart")
+        expected_content = {
+            "txt": ("горох - 15 г;", "вроде бы мясо - 7 г;"),
+            "csv": ("горох,15,г", "вроде бы мясо,7,г"),
+        }
+        for file_format, expected_lines in expected_content.items():
+            with self.subTest(format=file_format):
+                response = self.client.get(url, {"format": file_format})
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                content = b"".join(response.streaming_content).decode()
+                for line in expected_lines:
+                    self.assertIn(line, content)
+                self.assertNotIn("вроде бы не мясо", content)
+        response = self.client.get(url, {"format": "pdf"})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(
+            b"".join(response.streaming_content).startswith(b"%PDF")
+        )
+
+    def test_shopping_list_pdf_is_built_before_streaming(self):
+        """Проверка, что PDF собирается целиком до начала ответа и не
+        строится без шрифта с кириллицей.
+        """
+        ingredients = iter(
+            [{"name": "горох", "amount": 15, "measurement_unit": "г"}]
+        )
+        chunks = ShoppingListPDFRenderer().render_stream(ingredients)
+        self.assertIsNone(next(ingredients, None))
+        self.assertTrue(b"".join(chunks).startswith(b"%PDF"))
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Token " + self.user_token.key
+        )
+        url = reverse("api:recipes-download-shopping-cart")
+        with override_settings(SHOPPING_LIST_PDF_FONT="/missing/font.ttf"):
+            with self.assertRaises(ImproperlyConfigured):
+                ShoppingListPDFRenderer().render_stream(iter([]))
+            with self.assertRaises(ImproperlyConfigured):
+                self.client.get(url, {"format": "pdf"})
+
     def test_user_set_password(self):
         """Проверка смены пароля."""
         name = "api:users-set-password"
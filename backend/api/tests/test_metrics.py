@@ -0,0 +1,174 @@
+# flake8: noqa
+import os
+import subprocess
+import sys
+import tempfile
+from http import HTTPStatus
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+from rest_framework.test import APITestCase
+
+from api.metrics import MULTIPROCESS_DIR_ENV
+from recipes.models import Recipe
+
+User = get_user_model()
+
+CHILD_SCRIPT = """
+import django
+
+django.setup()
+
+from api.metrics import observe_request
+from api.middleware import QueryLog
+
+observe_request("RecipesViewSet.list", "GET", 200, 0.01, QueryLog())
+"""
+
+
+class TestMetrics(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username="Пользователь", email="user@test.com"
+        )
+        Recipe.objects.create(
+            name="Суп", text="Описание", cooking_time=10, author=cls.user
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get_metrics(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        return {
+            (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+            for family in text_string_to_metric_families(
+                response.content.decode()
+            )
+            for sample in family.samples
+        }
+
+    def requests_count(self, handler, method="GET", status="200"):
+        return (
+            REGISTRY.get_sample_value(
+                "foodgram_http_requests_total",
+                {"handler": handler, "method": method, "status": status},
+            )
+            or 0
+        )
+
+    def test_requests_by_viewset_action(self):
+        """Проверка счетчиков запросов по действиям вьюсетов и кодам."""
+        requests = (
+            ("RecipesViewSet.list", "GET", "200", reverse("api:recipes-list")),
+            (
+                "CustomUserViewSet.subscriptions_list",
+                "GET",
+                "401",
+                reverse("api:users-subscriptions-list"),
+            ),
+            ("unmatched", "GET", "404", "/missing/"),
+        )
+        for handler, method, status, url in requests:
+            with self.subTest(handler=handler):
+                before = self.requests_count(handler, method, status)
+                self.client.generic(method, url)
+                self.assertEqual(
+                    self.requests_count(handler, method, status), before + 1
+                )
+        metrics = self.get_metrics()
+        labels = (("handler", "RecipesViewSet.list"), ("method", "GET"))
+        self.assertGreaterEqual(
+            metrics[("foodgram_http_request_duration_seconds_count", labels)],
+            1,
+        )
+        self.assertGreaterEqual(
+            metrics[
+                (
+                    "foodgram_db_queries_per_request_count",
+                    (("handler", "RecipesViewSet.list"),),
+                )
+            ],
+            1,
+        )
+
+    def cache_count(self, result):
+        return (
+            REGISTRY.get_sample_value(
+                "foodgram_recipe_list_cache_total", {"result": result}
+            )
+            or 0
+        )
+
+    def test_cache_hit_ratio(self):
+        """Проверка счетчиков и доли попаданий в кэш списка рецептов."""
+        hits, misses = self.cache_count("hit"), self.cache_count("miss")
+        for _ in range(4):
+            self.client.get(reverse("api:recipes-list"))
+        self.assertEqual(self.cache_count("hit"), hits + 3)
+        self.assertEqual(self.cache_count("miss"), misses + 1)
+        metrics = self.get_metrics()
+        self.assertEqual(
+            metrics[
+                ("foodgram_recipe_list_cache_total", (("result", "hit"),))
+            ],
+            hits + 3,
+        )
+        self.assertEqual(
+            metrics[
+                ("foodgram_cache_hit_ratio", (("cache", "recipe_list"),))
+            ],
+            (hits + 3) / (hits + misses + 4),
+        )
+        self.assertIn(
+            ("foodgram_cache_hit_ratio", (("cache", "recipe_fragments"),)),
+            metrics,
+        )
+
+    def test_scrape_host(self):
+        """Проверка, что метрики собираются по адресу backend:9500 только
+        с хостом backend в ALLOWED_HOSTS.
+        """
+        for allowed_hosts, status in (
+            (["127.0.0.1"], HTTPStatus.BAD_REQUEST),
+            (["127.0.0.1", "backend"], HTTPStatus.OK),
+        ):
+            with self.subTest(allowed_hosts=allowed_hosts):
+                with override_settings(ALLOWED_HOSTS=allowed_hosts):
+                    response = self.client.get(
+                        reverse("metrics"), HTTP_HOST="backend:9500"
+                    )
+                self.assertEqual(response.status_code, status)
+
+    def test_multiprocess_aggregation(self):
+        """Проверка сложения метрик нескольких процессов через файлы."""
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                MULTIPROCESS_DIR_ENV: directory,
+                "DJANGO_SETTINGS_MODULE": "foodgram.settings",
+            }
+            for _ in range(2):
+                subprocess.run(
+                    [sys.executable, "-c", CHILD_SCRIPT],
+                    cwd=settings.BASE_DIR,
+                    env=env,
+                    check=True,
+                )
+            with mock.patch.dict(os.environ, {MULTIPROCESS_DIR_ENV: directory}):
+                metrics = self.get_metrics()
+        labels = (
+            ("handler", "RecipesViewSet.list"),
+            ("method", "GET"),
+            ("status", "200"),
+        )
+        self.assertEqual(metrics[("foodgram_http_requests_total", labels)], 2)
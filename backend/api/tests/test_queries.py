@@ -0,0 +1,606 @@
+# flake8: noqa
+import base64
+import json
+import time
+from http import HTTPStatus
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from api.serializers import RecipesCreateSerializer
+from recipes.models import (
+    Amount,
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from recipes.search import ingredient_index
+from users.models import Follow
+from .api_data import image
+
+User = get_user_model()
+
+RECIPES_COUNT = 100
+
+
+class TestQueries(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username="Пользователь", email="user@test.com"
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        cls.tags = [
+            Tag.objects.create(
+                name="Завтрак", slug="breakfast", color="#E26C2D"
+            ),
+            Tag.objects.create(name="Обед", slug="lunch", color="#32CD32"),
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f"ингредиент {i}", measurement_unit="г"
+            )
+            for i in range(3)
+        ]
+        authors = [
+            User.objects.create(
+                username=f"Автор {i}", email=f"author{i}@test.com"
+            )
+            for i in range(10)
+        ]
+        Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    name=f"Рецепт {i}",
+                    text="Описание",
+                    cooking_time=10,
+                    author=authors[i % len(authors)],
+                )
+                for i in range(RECIPES_COUNT)
+            ]
+        )
+        recipes = list(Recipe.objects.all())
+        Recipe.tags.through.objects.bulk_create(
+            [
+                Recipe.tags.through(recipe=recipe, tag=tag)
+                for recipe in recipes
+                for tag in cls.tags
+            ]
+        )
+        Amount.objects.bulk_create(
+            [
+                Amount(recipe=recipe, ingredient=ingredient, amount=10)
+                for recipe in recipes
+                for ingredient in cls.ingredients
+            ]
+        )
+        Favorite.objects.bulk_create(
+            [Favorite(user=cls.user, recipe=recipe) for recipe in recipes[::2]]
+        )
+        ShoppingCart.objects.bulk_create(
+            [
+                ShoppingCart(user=cls.user, recipe=recipe)
+                for recipe in recipes[::3]
+            ]
+        )
+        Follow.objects.bulk_create(
+            [Follow(user=cls.user, following=author) for author in authors[:5]]
+        )
+
+    def get_recipes_queries(self, limit):
+        url = reverse("api:recipes-list")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {"limit": limit})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.data["results"]), limit)
+        return len(context)
+
+    def test_recipe_list_queries_do_not_depend_on_limit(self):
+        """Проверка, что количество запросов к БД для списка рецептов
+        не зависит от размера страницы.
+        """
+        users = (
+            (self.user, self.token),
+            (None, None),
+        )
+        for user, token in users:
+            if token:
+                self.client.credentials(
+                    HTTP_AUTHORIZATION="Token " + token.key
+                )
+            else:
+                self.client.credentials()
+            with self.subTest(user=user):
+                self.assertEqual(
+                    self.get_recipes_queries(6),
+                    self.get_recipes_queries(RECIPES_COUNT),
+                )
+
+    def test_recipe_list_flags(self):
+        """Проверка флагов избранного, корзины и подписки в списке."""
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+        url = reverse("api:recipes-list")
+        response = self.client.get(url, {"limit": RECIPES_COUNT})
+        for item in response.data["results"]:
+            recipe = Recipe.objects.get(pk=item["id"])
+            with self.subTest(recipe=recipe.pk):
+                self.assertEqual(
+                    item["is_favorited"],
+                    Favorite.objects.filter(
+                        user=self.user, recipe=recipe
+                    ).exists(),
+                )
+                self.assertEqual(
+                    item["is_in_shopping_cart"],
+                    ShoppingCart.objects.filter(
+                        user=self.user, recipe=recipe
+                    ).exists(),
+                )
+                self.assertEqual(
+                    item["author"]["is_subscribed"],
+                    Follow.objects.filter(
+                        user=self.user, following=recipe.author
+                    ).exists(),
+                )
+                self.assertEqual(len(item["tags"]), len(self.tags))
+                self.assertEqual(
+                    len(item["ingredients"]), len(self.ingredients)
+                )
+
+    def test_recipe_list_cursor_pagination(self):
+        """Проверка курсорной пагинации списка рецептов."""
+        url = reverse("api:recipes-list")
+        response = self.client.get(url, {"cursor": "", "limit": 30})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotIn("count", response.data)
+        ids = []
+        while True:
+            ids += [item["id"] for item in response.data["results"]]
+            if not response.data["next"]:
+                break
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(response.data["next"])
+            self.assertFalse(
+                any("COUNT(" in query["sql"] for query in context)
+            )
+        expected_ids = list(
+            Recipe.objects.order_by("-pub_date", "-id").values_list(
+                "id", flat=True
+            )
+        )
+        self.assertEqual(ids, expected_ids)
+
+    def test_recipe_list_cursor_pagination_with_equal_dates(self):
+        """Проверка, что курсор учитывает id при совпадении дат
+        публикации: рецепты не пропускаются и не повторяются в обе
+        стороны.
+        """
+        recipes = list(Recipe.objects.order_by("id"))
+        pub_dates = [recipes[0].pub_date, recipes[1].pub_date]
+        for index, recipe in enumerate(recipes):
+            recipe.pub_date = pub_dates[index % 3 == 0]
+        Recipe.objects.bulk_update(recipes, ["pub_date"])
+        expected_ids = list(
+            Recipe.objects.order_by("-pub_date", "-id").values_list(
+                "id", flat=True
+            )
+        )
+        url = reverse("api:recipes-list")
+        for token in (None, self.token.key):
+            with self.subTest(authenticated=bool(token)):
+                cache.clear()
+                if token:
+                    self.client.credentials(
+                        HTTP_AUTHORIZATION="Token " + token
+                    )
+                response = self.client.get(url, {"cursor": "", "limit": 7})
+                pages = []
+                while True:
+                    pages.append(
+                        [item["id"] for item in response.data["results"]]
+                    )
+                    if not response.data["next"]:
+                        break
+                    response = self.client.get(response.data["next"])
+                ids = [id for page in pages for id in page]
+                self.assertEqual(ids, expected_ids)
+                previous_pages = []
+                while response.data["previous"]:
+                    response = self.client.get(response.data["previous"])
+                    previous_pages.append(
+                        [item["id"] for item in response.data["results"]]
+                    )
+                self.assertEqual(previous_pages, pages[-2::-1])
+        response = self.client.get(url, {"cursor": "invalid"})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_recipe_list_cursor_with_malformed_values(self):
+        """Проверка, что курсор со значениями, не подходящими к полям
+        сортировки, дает 404, а не ошибку сервера.
+        """
+        url = reverse("api:recipes-list")
+        cases = (
+            ({}, ["abc", "1"]),
+            ({}, [str(timezone.now()), "abc"]),
+            ({"search": "Рецепт"}, ["abc", str(timezone.now()), "1"]),
+        )
+        for params, position in cases:
+            with self.subTest(params=params, position=position):
+                cursor = base64.b64encode(
+                    urlencode({"p": json.dumps(position)}).encode()
+                ).decode()
+                response = self.client.get(url, {**params, "cursor": cursor})
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_search_vector_is_not_loaded(self):
+        """Проверка, что при чтении рецептов не загружается колонка
+        полнотекстового индекса.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+        recipe = Recipe.objects.exclude(favorites__user=self.user).first()
+        requests = (
+            ("get", reverse("api:recipes-list")),
+            ("get", reverse("api:recipes-detail", kwargs={"pk": recipe.pk})),
+            ("get", reverse("api:users-subscriptions-list")),
+            ("post", reverse("api:recipes-favorite", kwargs={"pk": recipe.pk})),
+        )
+        for method, url in requests:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as context:
+                    response = getattr(self.client, method)(url)
+                self.assertLess(response.status_code, 300)
+                for query in context.captured_queries:
+                    self.assertNotIn("search_vector", query["sql"])
+
+    def test_recipe_list_tags_filter(self):
+        """Проверка фильтра по тегам: рецепты с несколькими тегами
+        не повторяются, количество запросов не зависит от числа тегов.
+        """
+        cache.clear()
+        url = reverse("api:recipes-list")
+        queries = []
+        for tags in (["breakfast"], ["breakfast", "lunch"]):
+            with self.subTest(tags=tags):
+                self.client.get(url, {"tags": tags, "limit": 1})
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(
+                        url, {"tags": tags, "limit": RECIPES_COUNT}
+                    )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                ids = [item["id"] for item in response.data["results"]]
+                self.assertEqual(response.data["count"], RECIPES_COUNT)
+                self.assertEqual(len(set(ids)), RECIPES_COUNT)
+                queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+        response = self.client.get(url, {"tags": ["breakfast", "dinner"]})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_recipe_list_tags_filter_with_stale_catalogue(self):
+        """Проверка, что тег, которого еще нет в кэше каталога, не
+        отклоняется фильтром.
+        """
+        url = reverse("api:recipes-list")
+        self.client.get(url, {"tags": ["breakfast"]})
+        Tag.objects.bulk_create(
+            [Tag(name="Ужин", slug="dinner", color="#8775D2")]
+        )
+        recipe = Recipe.objects.first()
+        recipe.tags.add(Tag.objects.get(slug="dinner"))
+        response = self.client.get(url, {"tags": ["dinner"]})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]], [recipe.id]
+        )
+
+    def test_subscriptions_cursor_pagination(self):
+        """Проверка курсорной пагинации списка подписок."""
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+        url = reverse("api:users-subscriptions-list")
+        response = self.client.get(url, {"cursor": "", "limit": 2})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        ids = []
+        while True:
+            ids += [item["id"] for item in response.data["results"]]
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+        expected_ids = list(
+            Follow.objects.filter(user=self.user)
+            .order_by("id")
+            .values_list("following_id", flat=True)
+        )
+        self.assertEqual(ids, expected_ids)
+
+    def test_page_size_is_limited(self):
+        """Проверка ограничения размера страницы."""
+        url = reverse("api:recipes-list")
+        for params in ({"limit": 1000}, {"limit": 1000, "cursor": ""}):
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(
+                    len(response.data["results"]),
+                    min(RECIPES_COUNT, settings.MAX_PAGE_SIZE),
+                )
+
+    def get_subscriptions_queries(self, params):
+        url = reverse("api:users-subscriptions-list")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response, len(context)
+
+    def test_subscriptions_queries_do_not_depend_on_limits(self):
+        """Проверка, что количество запросов к БД для списка подписок
+        не зависит от размера страницы и значения recipes_limit.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+        _, expected_queries = self.get_subscriptions_queries(
+            {"limit": 1, "recipes_limit": 1}
+        )
+        for params in (
+            {"limit": 5, "recipes_limit": 3},
+            {"limit": 5},
+            {"limit": 5, "recipes_limit": 0},
+        ):
+            with self.subTest(params=params):
+                _, queries = self.get_subscriptions_queries(params)
+                self.assertLessEqual(queries, expected_queries)
+
+    def test_subscriptions_recipes_limit(self):
+        """Проверка выдачи последних рецептов авторов в подписках."""
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+        for recipes_limit in (0, 3, None):
+            params = {"limit": 5}
+            if recipes_limit is not None:
+                params["recipes_limit"] = recipes_limit
+            response, _ = self.get_subscriptions_queries(params)
+            for item in response.data["results"]:
+                with self.subTest(author=item["id"], limit=recipes_limit):
+                    expected_ids = list(
+                        Recipe.objects.filter(author_id=item["id"])
+                        .order_by("-pub_date", "-id")
+                        .values_list("id", flat=True)[:recipes_limit]
+                    )
+                    self.assertEqual(
+                        [recipe["id"] for recipe in item["recipes"]],
+                        expected_ids,
+                    )
+                    self.assertTrue(item["is_subscribed"])
+
+
+class TestIngredientSearch(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name in ("Ёжевика", "ежевичный джем", "Ежики", "яблоко", "Е"):
+            Ingredient.objects.create(name=name, measurement_unit="г")
+
+    def setUp(self):
+        ingredient_index.invalidate()
+
+    def search(self, name):
+        url = reverse("api:ingredients-list")
+        response = self.client.get(url, {"name": name})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return sorted(item["name"] for item in response.data)
+
+    def test_search_without_database(self):
+        """Проверка поиска ингредиентов по индексу без запросов к БД."""
+        self.search("е")
+        with self.assertNumQueries(0):
+            self.search("еж")
+
+    def test_search_by_prefix(self):
+        """Проверка поиска по началу названия без учета регистра и ё/е."""
+        for prefix, expected in (
+            ("еж", ["ежевичный джем", "Ежики", "Ёжевика"]),
+            ("ЁЖЕВ", ["ежевичный джем", "Ёжевика"]),
+            ("Яб", ["яблоко"]),
+            ("жев", []),
+        ):
+            with self.subTest(prefix=prefix):
+                self.assertEqual(self.search(prefix), sorted(expected))
+
+    def test_index_invalidation(self):
+        """Проверка обновления индекса при изменении ингредиентов."""
+        self.assertEqual(self.search("груш"), [])
+        ingredient = Ingredient.objects.create(
+            name="груша", measurement_unit="г"
+        )
+        self.assertEqual(self.search("груш"), ["груша"])
+        ingredient.delete()
+        self.assertEqual(self.search("груш"), [])
+
+
+class TestTagCatalogue(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(
+            name="Обед", slug="lunch", color="#32CD32"
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_tags_from_cache(self):
+        """Проверка выдачи тегов из кэша без запросов к БД."""
+        url = reverse("api:tags-list")
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(
+            response.data,
+            [
+                {
+                    "id": self.tag.id,
+                    "name": "Обед",
+                    "color": "#32CD32",
+                    "slug": "lunch",
+                }
+            ],
+        )
+
+    def test_tags_etag(self):
+        """Проверка ответа 304 и смены ETag при изменении тегов."""
+        url = reverse("api:tags-list")
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Tag.objects.create(name="Ужин", slug="dinner", color="#8775D2")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.data), 2)
+
+    def test_catalogue_expires(self):
+        """Проверка, что каталог перечитывается из БД по истечении
+        TAG_CATALOGUE_TIMEOUT, даже если сброс версии до процесса
+        не дошел.
+        """
+        url = reverse("api:tags-list")
+        self.client.get(url)
+        Tag.objects.filter(pk=self.tag.pk).update(name="Поздний обед")
+        self.assertEqual(self.client.get(url).data[0]["name"], "Обед")
+        expired = time.time() + settings.TAG_CATALOGUE_TIMEOUT + 1
+        with mock.patch("time.time", return_value=expired):
+            response = self.client.get(url)
+        self.assertEqual(response.data[0]["name"], "Поздний обед")
+
+    def test_tag_field_resolves_from_cache(self):
+        """Проверка id тегов рецепта по кэшу и по БД для тегов,
+        которых нет в кэше.
+        """
+        field = RecipesCreateSerializer().fields["tags"]
+        field.run_validation([self.tag.id])
+        with self.assertNumQueries(0):
+            tags = field.run_validation([self.tag.id, str(self.tag.id)])
+        self.assertEqual([tag.pk for tag in tags], [self.tag.id] * 2)
+        with self.assertRaises(ValidationError):
+            field.run_validation([self.tag.id + 100])
+        Tag.objects.bulk_create(
+            [Tag(name="Ужин", slug="dinner", color="#8775D2")]
+        )
+        tag = Tag.objects.get(slug="dinner")
+        self.assertEqual(
+            [tag.pk for tag in field.run_validation([tag.id])], [tag.id]
+        )
+
+
+class TestRecipeWrites(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username="Автор", email="author@test.com"
+        )
+        cls.tags = [
+            Tag.objects.create(name=f"Тег {i}", slug=f"tag{i}", color=color)
+            for i, color in enumerate(("#E26C2D", "#32CD32", "#8775D2"))
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f"ингредиент {i}", measurement_unit="г"
+            )
+            for i in range(60)
+        ]
+        cls.recipe = Recipe.objects.create(
+            name="Рецепт",
+            text="Описание",
+            cooking_time=10,
+            author=cls.author,
+        )
+
+    def write_ingredients(self, ingredients, amount):
+        data = [
+            {"ingredient": ingredient, "amount": amount}
+            for ingredient in ingredients
+        ]
+        with CaptureQueriesContext(connection) as context:
+            RecipesCreateSerializer.add_update_ingredients_and_tags(
+                ingredients=data, tags=self.tags[:2], instance=self.recipe
+            )
+        self.assertEqual(
+            dict(self.recipe.amounts.values_list("ingredient_id", "amount")),
+            {ingredient.id: amount for ingredient in ingredients},
+        )
+        return len(context)
+
+    def test_ingredient_writes_do_not_depend_on_count(self):
+        """Проверка, что количество запросов при записи ингредиентов
+        рецепта не зависит от их числа.
+        """
+        queries = []
+        for count in (5, 30):
+            self.recipe.amounts.all().delete()
+            self.recipe.tags.clear()
+            create = self.write_ingredients(self.ingredients[:count], 10)
+            update = self.write_ingredients(
+                self.ingredients[count // 2 : count + count // 2], 20
+            )
+            queries.append((create, update))
+        self.assertEqual(queries[0], queries[1])
+
+    def test_unchanged_ingredients_are_not_rewritten(self):
+        """Проверка, что неизменные ингредиенты не перезаписываются."""
+        self.write_ingredients(self.ingredients[:5], 10)
+        ids = set(self.recipe.amounts.values_list("id", flat=True))
+        changed = RecipesCreateSerializer.add_update_ingredients_and_tags(
+            ingredients=[
+                {"ingredient": ingredient, "amount": 10}
+                for ingredient in self.ingredients[1:6]
+            ],
+            tags=self.tags[:2],
+            instance=self.recipe,
+        )
+        self.assertEqual(
+            changed, {self.ingredients[0].id, self.ingredients[5].id}
+        )
+        self.assertEqual(
+            len(ids & set(self.recipe.amounts.values_list("id", flat=True))),
+            4,
+        )
+
+    def test_ingredients_validation_single_query(self):
+        """Проверка, что id ингредиентов рецепта проверяются одним
+        запросом к БД, а о всех неизвестных id сообщается сразу.
+        """
+        data = {
+            "ingredients": [
+                {"id": ingredient.id, "amount": 10}
+                for ingredient in self.ingredients[:50]
+            ],
+            "tags": [self.tags[0].id],
+            "image": image,
+            "name": "Рецепт",
+            "text": "Описание",
+            "cooking_time": 10,
+        }
+        request = APIRequestFactory().post(reverse("api:recipes-list"))
+        request.user = self.author
+        context = {"request": request}
+        RecipesCreateSerializer(data=data, context=context).is_valid()
+        with CaptureQueriesContext(connection) as queries:
+            serializer = RecipesCreateSerializer(data=data, context=context)
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(
+            sum('"recipes_ingredient"' in query["sql"] for query in queries),
+            1,
+        )
+        self.assertEqual(len(queries), 1)
+        data["ingredients"] += [
+            {"id": 1000, "amount": 10},
+            {"id": 1001, "amount": 10},
+        ]
+        serializer = RecipesCreateSerializer(data=data, context=context)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("1000, 1001", str(serializer.errors["ingredients"]))
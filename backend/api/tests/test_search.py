@@ -0,0 +1,78 @@
+# flake8: noqa
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class TestRecipeSearch(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username="Автор", email="author@test.com"
+        )
+        cls.recipes = {
+            key: Recipe.objects.create(
+                name=name, text=text, cooking_time=10, author=cls.author
+            )
+            for key, name, text in (
+                ("plov", "Плов узбекский", "Рис, морковь и баранина."),
+                ("rice", "Рис с овощами", "Гарнир, который можно к плову."),
+                ("soup", "Суп из семи круп", "Сомнительно... но, окэй"),
+                ("pilaf", "Плов с курицей", "Курица вместо баранины."),
+            )
+        }
+        cls.url = reverse("api:recipes-list")
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query, **params):
+        response = self.client.get(self.url, {"search": query, **params})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return [recipe["id"] for recipe in response.data["results"]]
+
+    def test_search_is_ranked(self):
+        """Проверка, что совпадения в названии выше совпадений в тексте."""
+        ids = self.search("плов")
+        self.assertEqual(
+            set(ids[:2]),
+            {self.recipes["plov"].id, self.recipes["pilaf"].id},
+        )
+        self.assertEqual(ids[2:], [self.recipes["rice"].id])
+
+    def test_search_matches_all_words(self):
+        """Проверка поиска по нескольким словам без учета регистра."""
+        self.assertEqual(
+            self.search("ПЛОВ курица"), [self.recipes["pilaf"].id]
+        )
+        self.assertEqual(self.search("?!"), [])
+
+    def test_search_index_follows_writes(self):
+        """Проверка, что индекс поиска обновляется при записи рецептов."""
+        soup = self.recipes["soup"]
+        self.assertEqual(self.search("борщ"), [])
+        soup.name = "Борщ"
+        soup.save()
+        self.assertEqual(self.search("борщ"), [soup.id])
+        self.assertEqual(self.search("суп"), [])
+        soup.delete()
+        self.assertEqual(self.search("борщ"), [])
+
+    def test_search_cursor_pagination(self):
+        """Проверка курсорной пагинации по результатам поиска."""
+        expected = self.search("плов")
+        ids = []
+        url, params = self.url, {"search": "плов", "cursor": "", "limit": 1}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            ids.extend(recipe["id"] for recipe in response.data["results"])
+            url, params = response.data["next"], None
+        self.assertEqual(ids, expected)
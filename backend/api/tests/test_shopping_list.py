@@ -0,0 +1,245 @@
+# flake8: noqa
+import json
+import random
+import shutil
+import tempfile
+from http import HTTPStatus
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from recipes.models import (
+    Amount,
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+)
+
+from .api_data import image
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+OPERATIONS_COUNT = 150
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class TestShoppingList(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create(
+                username=f"Пользователь {i}", email=f"user{i}@test.com"
+            )
+            for i in range(4)
+        ]
+        cls.tag = Tag.objects.create(
+            name="Обед", slug="lunch", color="#32CD32"
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f"ингредиент {i}", measurement_unit="г"
+            )
+            for i in range(8)
+        ]
+        cls.recipes = [
+            Recipe.objects.create(
+                name=f"Рецепт {i}",
+                text="Описание",
+                cooking_time=10,
+                author=cls.users[i % len(cls.users)],
+            )
+            for i in range(10)
+        ]
+        rand = random.Random(0)
+        for recipe in cls.recipes:
+            Amount.objects.bulk_create(
+                Amount(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    amount=rand.randint(1, 500),
+                )
+                for ingredient in rand.sample(cls.ingredients, 3)
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        """Метод для удаления файлов, которые создаются при тестах."""
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def assertShoppingListsConsistent(self):
+        expected = {
+            (row["recipe__shoppingcarts__user"], row["ingredient"]): row[
+                "total"
+            ]
+            for row in Amount.objects.filter(
+                recipe__shoppingcarts__isnull=False
+            )
+            .values("recipe__shoppingcarts__user", "ingredient")
+            .annotate(total=Sum("amount"))
+        }
+        actual = {
+            (item.user_id, item.ingredient_id): item.total_amount
+            for item in ShoppingListItem.objects.all()
+        }
+        self.assertEqual(actual, expected)
+
+    def update_recipe(self, rand, recipe):
+        self.client.force_authenticate(recipe.author)
+        data = {
+            "ingredients": [
+                {"id": ingredient.id, "amount": rand.randint(1, 500)}
+                for ingredient in rand.sample(
+                    self.ingredients, rand.randint(1, 5)
+                )
+            ],
+            "tags": [self.tag.id],
+            "image": image,
+            "name": recipe.name,
+            "text": recipe.text,
+            "cooking_time": recipe.cooking_time,
+        }
+        url = reverse("api:recipes-detail", kwargs={"pk": recipe.pk})
+        response = self.client.put(
+            url, data=json.dumps(data), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_random_workload(self):
+        """Проверка совпадения списков покупок с расчетом с нуля после
+        случайной последовательности добавлений и удалений из корзины
+        и изменений рецептов.
+        """
+        rand = random.Random(42)
+        for _ in range(OPERATIONS_COUNT):
+            user = rand.choice(self.users)
+            recipe = rand.choice(self.recipes)
+            operation = rand.random()
+            if operation < 0.15:
+                self.update_recipe(rand, recipe)
+                continue
+            self.client.force_authenticate(user)
+            url = reverse(
+                "api:recipes-shopping-cart", kwargs={"pk": recipe.pk}
+            )
+            if operation < 0.6:
+                self.client.post(url)
+            else:
+                self.client.delete(url)
+        self.assertShoppingListsConsistent()
+        self.recipes[0].delete()
+        self.assertShoppingListsConsistent()
+
+    def test_existing_rows_are_incremented(self):
+        """Проверка, что строка, вставленная параллельно, не ломает
+        добавление рецепта, а увеличивается.
+        """
+        user, recipe = self.users[0], self.recipes[0]
+        amount = recipe.amounts.first()
+        ShoppingListItem.objects.create(
+            user=user, ingredient_id=amount.ingredient_id, total_amount=5
+        )
+        ShoppingListItem.objects.add_recipe([user.id], recipe.id)
+        self.assertEqual(
+            ShoppingListItem.objects.get(
+                user=user, ingredient_id=amount.ingredient_id
+            ).total_amount,
+            amount.amount + 5,
+        )
+
+    def test_drift_is_logged(self):
+        """Проверка, что расхождение списка покупок с корзиной пишется
+        в журнал, а количество не уходит ниже нуля.
+        """
+        user, recipe = self.users[0], self.recipes[0]
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+        ShoppingListItem.objects.filter(
+            user=user, ingredient_id=recipe.amounts.first().ingredient_id
+        ).delete()
+        with self.assertLogs("recipes.models", "WARNING"):
+            ShoppingCart.objects.filter(user=user, recipe=recipe).delete()
+        self.assertFalse(ShoppingListItem.objects.filter(user=user).exists())
+
+    def delete_popular_recipe(self, users_count):
+        author = self.users[0]
+        recipe = Recipe.objects.create(
+            name="Популярный рецепт",
+            text="Описание",
+            cooking_time=10,
+            author=author,
+        )
+        Amount.objects.bulk_create(
+            Amount(recipe=recipe, ingredient=ingredient, amount=10)
+            for ingredient in self.ingredients[:3]
+        )
+        users = [
+            User.objects.create(
+                username=f"Поклонник {users_count} {i}",
+                email=f"fan{users_count}_{i}@test.com",
+            )
+            for i in range(users_count)
+        ]
+        for user in users:
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+            Favorite.objects.create(user=user, recipe=recipe)
+        self.client.force_authenticate(author)
+        url = reverse("api:recipes-detail", kwargs={"pk": recipe.pk})
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        self.assertFalse(
+            User.objects.filter(
+                pk__in=[user.pk for user in users],
+                interactions_changed_at__isnull=True,
+            ).exists()
+        )
+        return len(context)
+
+    def test_recipe_delete_queries_do_not_depend_on_carts(self):
+        """Проверка, что количество запросов при удалении рецепта не
+        зависит от количества корзин и избранного с ним.
+        """
+        self.assertEqual(
+            self.delete_popular_recipe(2), self.delete_popular_recipe(20)
+        )
+        self.assertShoppingListsConsistent()
+
+    def test_rebuild_shopping_lists_command(self):
+        """Проверка пересборки списков покупок командой."""
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=user, recipe=recipe)
+            for user in self.users
+            for recipe in self.recipes[:5]
+        )
+        ShoppingListItem.objects.create(
+            user=self.users[0], ingredient=self.ingredients[0], total_amount=1
+        )
+        call_command("rebuild_shopping_lists", stdout=StringIO())
+        self.assertShoppingListsConsistent()
+
+    def test_download_reads_shopping_list(self):
+        """Проверка выгрузки списка покупок одним запросом к БД."""
+        user = self.users[0]
+        for recipe in self.recipes[:5]:
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+        self.client.force_authenticate(user)
+        url = reverse("api:recipes-download-shopping-cart")
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+            content = b"".join(response.streaming_content).decode()
+        for item in ShoppingListItem.objects.filter(user=user):
+            self.assertIn(
+                f"{item.ingredient.name} - {item.total_amount} г;", content
+            )
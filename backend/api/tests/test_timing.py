@@ -0,0 +1,104 @@
+# flake8: noqa
+import json
+import re
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from api.middleware import QueryLog, RequestTimingMiddleware, logger
+from recipes.models import Recipe
+
+User = get_user_model()
+
+SERVER_TIMING = re.compile(
+    r'sql;dur=[\d.]+;desc="(\d+) queries", view;dur=[\d.]+, '
+    r"render;dur=[\d.]+, total;dur=[\d.]+"
+)
+
+
+@override_settings(
+    REQUEST_TIMING=True,
+    REQUEST_TIMING_SLOW_MS=10000,
+    REQUEST_TIMING_SLOW_QUERIES=100,
+)
+class TestRequestTiming(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username="Пользователь", email="user@test.com"
+        )
+        Recipe.objects.create(
+            name="Суп", text="Описание", cooking_time=10, author=cls.user
+        )
+        cls.url = reverse("api:recipes-list")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        """Проверка заголовка Server-Timing с количеством SQL-запросов."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        match = SERVER_TIMING.fullmatch(response["Server-Timing"])
+        self.assertIsNotNone(match, response["Server-Timing"])
+        self.assertEqual(int(match[1]), len(context))
+
+    @override_settings(REQUEST_TIMING=False)
+    def test_disabled_by_default(self):
+        """Проверка, что без настройки заголовок не добавляется."""
+        self.assertNotIn("Server-Timing", self.client.get(self.url))
+
+    def test_fast_request_is_not_logged(self):
+        """Проверка, что быстрые запросы не попадают в журнал."""
+        with mock.patch.object(logger, "warning") as warning:
+            self.client.get(self.url)
+        warning.assert_not_called()
+
+    @override_settings(REQUEST_TIMING_SLOW_QUERIES=2)
+    def test_slow_request_log(self):
+        """Проверка записи медленного запроса с самыми частыми SQL."""
+
+        def view(request):
+            for _ in range(3):
+                list(Recipe.objects.filter(name="Суп"))
+            User.objects.count()
+            return HttpResponse()
+
+        request = RequestFactory().get("/slow/?page=2")
+        with self.assertLogs("api.middleware", "WARNING") as logs:
+            response = RequestTimingMiddleware(view)(request)
+        self.assertIn("Server-Timing", response)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record, logs.records[0].timing)
+        self.assertEqual(record["event"], "slow_request")
+        self.assertEqual(record["path"], "/slow/?page=2")
+        self.assertEqual(record["status"], HTTPStatus.OK)
+        self.assertEqual(record["queries"], 4)
+        self.assertEqual(
+            [statement["count"] for statement in record["top_sql"]], [3, 1]
+        )
+        self.assertIn("recipes_recipe", record["top_sql"][0]["sql"])
+        for name in ("sql_ms", "view_ms", "render_ms", "total_ms"):
+            self.assertGreaterEqual(record[name], 0)
+
+
+class TestQueryLog(APITestCase):
+    def test_statements_are_opt_in(self):
+        """Проверка, что текст SQL-запросов собирается только по флагу."""
+        for statements in (False, True):
+            with self.subTest(statements=statements):
+                queries = QueryLog(statements=statements)
+                with queries.capture():
+                    list(Recipe.objects.all())
+                self.assertEqual(queries.count, 1)
+                self.assertEqual(bool(queries.top(1)), statements)
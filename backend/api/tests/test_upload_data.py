@@ -0,0 +1,176 @@
+# flake8: noqa
+import io
+import json
+import os
+import tempfile
+import tracemalloc
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from recipes.importer import iter_json_array
+from recipes.models import Amount, Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+INGREDIENTS = [
+    {"name": "соль", "measurement_unit": "г"},
+    {"name": "пекарский порошок", "measurement_unit": "г"},
+    {"name": "пекарский порошок", "measurement_unit": "ч. л."},
+]
+
+
+class TestUploadData(TestCase):
+    def upload(self, *args, **options):
+        stdout = StringIO()
+        call_command("upload_data", *args, stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def upload_ingredients(self, rows, format="ndjson"):
+        if format == "ndjson":
+            data = "".join(
+                json.dumps(row, ensure_ascii=False) + "\n" for row in rows
+            )
+        else:
+            data = json.dumps(rows, ensure_ascii=False)
+        return self.upload(
+            "ingredients", "-", format=format, stdin=StringIO(data)
+        )
+
+    def ingredients(self):
+        return set(
+            Ingredient.objects.values_list("name", "measurement_unit")
+        )
+
+    def test_bundled_data(self):
+        """Проверка загрузки файлов проекта и идемпотентности повторной
+        загрузки.
+        """
+        output = self.upload()
+        self.assertIn("tags: добавлено 3, обновлено 0, пропущено 0.", output)
+        count = Ingredient.objects.count()
+        self.assertGreater(count, 2000)
+        output = self.upload()
+        self.assertIn(f"ingredients: добавлено 0, обновлено 0, пропущено {count}.", output)
+        self.assertEqual(Ingredient.objects.count(), count)
+
+    def test_formats(self):
+        """Проверка, что CSV, JSON и NDJSON дают одинаковый результат."""
+        self.upload("ingredients", "data/ingredients.csv")
+        expected = self.ingredients()
+        Ingredient.objects.all().delete()
+        self.upload("ingredients", "data/ingredients.json")
+        self.assertEqual(self.ingredients(), expected)
+        Ingredient.objects.all().delete()
+        with open("data/ingredients.json", encoding="utf-8") as file:
+            rows = json.load(file)
+        self.upload_ingredients(rows, format="ndjson")
+        self.assertEqual(self.ingredients(), expected)
+
+    def test_measurement_unit_update(self):
+        """Проверка обновления единицы измерения и отметки рецептов с
+        ингредиентом измененными.
+        """
+        self.upload_ingredients(INGREDIENTS)
+        author = User.objects.create(username="Автор", email="a@test.com")
+        recipe = Recipe.objects.create(
+            name="Хлеб", text="Описание", cooking_time=60, author=author
+        )
+        Amount.objects.create(
+            recipe=recipe,
+            ingredient=Ingredient.objects.get(name="соль"),
+            amount=5,
+        )
+        updated_at = Recipe.objects.get().updated_at
+        output = self.upload_ingredients(
+            [
+                {"name": "соль", "measurement_unit": "кг"},
+                {"name": "пекарский порошок", "measurement_unit": "кг"},
+                {"name": "сахар", "measurement_unit": "г"},
+                {"name": "сахар", "measurement_unit": "г"},
+                {"name": "", "measurement_unit": "г"},
+                {"name": "мука"},
+            ]
+        )
+        self.assertIn("добавлено 2, обновлено 1, пропущено 3.", output)
+        self.assertEqual(
+            self.ingredients(),
+            {
+                ("соль", "кг"),
+                ("пекарский порошок", "г"),
+                ("пекарский порошок", "ч. л."),
+                ("пекарский порошок", "кг"),
+                ("сахар", "г"),
+            },
+        )
+        self.assertGreater(Recipe.objects.get().updated_at, updated_at)
+
+    def test_tags_update(self):
+        """Проверка обновления тега по слагу и пропуска строк, которые
+        нарушили бы уникальность названия или цвета.
+        """
+        self.upload("tags", "data/tags.csv")
+        data = (
+            "Первый завтрак,#DAA520,breakfast\n"
+            "Ужин,#000000,lunch\n"
+            "Полдник,#FFFFFF,snack\n"
+        )
+        output = self.upload("tags", "-", format="csv", stdin=StringIO(data))
+        self.assertIn("добавлено 1, обновлено 1, пропущено 1.", output)
+        self.assertEqual(
+            set(Tag.objects.values_list("slug", "name", "color")),
+            {
+                ("breakfast", "Первый завтрак", "#DAA520"),
+                ("lunch", "Обед", "#32CD32"),
+                ("dinner", "Ужин", "#7B68EE"),
+                ("snack", "Полдник", "#FFFFFF"),
+            },
+        )
+
+    def test_errors(self):
+        """Проверка ошибок формата и пути."""
+        for args, options in (
+            (("ingredients", "-"), {"stdin": StringIO("")}),
+            (("ingredients",), {}),
+            (("ingredients", "missing.csv"), {}),
+            (
+                ("ingredients", "-"),
+                {"format": "json", "stdin": StringIO('[{"name": ')},
+            ),
+        ):
+            with self.subTest(args=args, options=options):
+                with self.assertRaises(CommandError):
+                    self.upload(*args, **options)
+
+    def test_json_array_is_streamed(self):
+        """Проверка разбора JSON-массива, читаемого маленькими частями."""
+        rows = INGREDIENTS * 10
+        data = json.dumps(rows, ensure_ascii=False, indent=2)
+        self.assertEqual(
+            list(iter_json_array(io.StringIO(data), chunk_size=7)), rows
+        )
+        self.assertEqual(list(iter_json_array(io.StringIO(" [ ] "))), [])
+
+    def test_memory_is_bounded(self):
+        """Проверка, что память при загрузке не растет с размером файла."""
+        peaks = []
+        for count in (10000, 50000):
+            with tempfile.NamedTemporaryFile(
+                "w", suffix=".ndjson", encoding="utf-8", delete=False
+            ) as file:
+                for i in range(count):
+                    file.write(
+                        f'{{"name": "ингредиент {count} {i}", '
+                        f'"measurement_unit": "г"}}\n'
+                    )
+            try:
+                tracemalloc.start()
+                self.upload("ingredients", file.name, batch_size=1000)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            finally:
+                os.remove(file.name)
+        self.assertEqual(Ingredient.objects.count(), 60000)
+        self.assertLess(peaks[1], peaks[0] * 2)
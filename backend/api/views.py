@@ -1,23 +1,68 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+import hashlib
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.db.models import (
+    BooleanField,
+    DateTimeField,
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Value,
+)
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_etags, quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
+from prometheus_client import CONTENT_TYPE_LATEST
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, JSONParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.cache import get_recipes_last_modified, get_tag_catalogue
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+)
+from recipes.search import ingredient_index
 from users.models import Follow, User
+from .cache import (
+    get_recipe_list,
+    get_recipe_list_key,
+    recipe_fragments,
+    set_recipe_list,
+)
 from .filters import IngredientSearchFilter, RecipeFilter
+from .metrics import render_metrics
 from .pagination import FoodgramPagination
+from .parsers import StreamingMultiPartParser
 from .permissions import IsAuthorOrAdminOrReadOnly
+from .renderers import (
+    ShoppingListCSVRenderer,
+    ShoppingListPDFRenderer,
+    ShoppingListTextRenderer,
+)
 from .serializers import (
     FavoriteSerializer,
+    FollowerReadSerializer,
     FollowSerializer,
     IngredientsSerializer,
+    RecipeReadFastSerializer,
     RecipesCreateSerializer,
     ShoppingCartSerializer,
     TagsSerializer,
@@ -32,6 +77,17 @@ class CustomUserViewSet(DjoserUserViewSet):
 
     pagination_class = FoodgramPagination
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_subscribed=Exists(
+                    Follow.objects.filter(user=user, following=OuterRef("pk"))
+                )
+            )
+        return queryset
+
     def get_permissions(self):
         if self.action == "me":
             return [
@@ -54,6 +110,7 @@ class CustomUserViewSet(DjoserUserViewSet):
         serializer = FollowSerializer(data=request.data, context=context)
         serializer.is_valid(raise_exception=True)
         serializer.save(user=request.user, following=following)
+        following.refresh_from_db(fields=("followers_count",))
         return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
     @follow.mapping.delete
@@ -67,6 +124,37 @@ class CustomUserViewSet(DjoserUserViewSet):
             return Response(status=status.HTTP_400_BAD_REQUEST)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @staticmethod
+    def get_subscriptions_queryset(request):
+        """Подписки пользователя с подгруженными авторами и их последними
+        рецептами: количество запросов не зависит от размера страницы
+        и значения recipes_limit.
+        """
+        limit = FollowerReadSerializer.get_recipes_limit(request)
+        recipes = Recipe.objects.defer("search_vector").order_by(
+            "-pub_date", "-id"
+        )
+        if limit == 0:
+            recipes = recipes.none()
+        elif limit is not None:
+            recipes = recipes.filter(
+                pk__in=Subquery(
+                    Recipe.objects.filter(author=OuterRef("author"))
+                    .order_by("-pub_date", "-id")
+                    .values("pk")[:limit]
+                )
+            )
+        authors = User.objects.annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        ).prefetch_related(
+            Prefetch("recipes", queryset=recipes, to_attr="limited_recipes")
+        )
+        return (
+            Follow.objects.filter(user=request.user)
+            .prefetch_related(Prefetch("following", queryset=authors))
+            .order_by("id")
+        )
+
     @action(
         detail=False,
         methods=["GET"],
@@ -76,7 +164,7 @@ class CustomUserViewSet(DjoserUserViewSet):
     )
     def subscriptions_list(self, request, pk=None):
         """Получить список всех подписок."""
-        queryset = Follow.objects.filter(user=request.user).order_by("id")
+        queryset = self.get_subscriptions_queryset(request)
         page = self.paginate_queryset(queryset)
         serializer = FollowSerializer(
             page, many=True, context={"request": request}
@@ -119,6 +207,29 @@ class TagsViewSet(ReadOnlyModelViewSet):
     permission_classes = (AllowAny,)
     http_method_names = ("get",)
 
+    def list(self, request, *args, **kwargs):
+        """Список тегов из кэша с поддержкой условных запросов."""
+        catalogue = get_tag_catalogue()
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match and (
+            if_none_match.strip() == "*"
+            or catalogue.etag in parse_etags(if_none_match)
+        ):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(catalogue.tags)
+        response["ETag"] = catalogue.etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_field]
+        tag = get_tag_catalogue().tags_by_id.get(
+            int(pk) if pk.isdigit() else None
+        )
+        if tag is None:
+            raise Http404
+        return Response(tag)
+
 
 class IngredientsViewSet(ReadOnlyModelViewSet):
     """Набор представлений для ингредиентов."""
@@ -130,18 +241,215 @@ class IngredientsViewSet(ReadOnlyModelViewSet):
     search_fields = ("^name",)
     http_method_names = ("get",)
 
+    def list(self, request, *args, **kwargs):
+        """Поиск по началу названия выполняется по индексу в памяти."""
+        name = request.query_params.get(IngredientSearchFilter.search_param)
+        if name:
+            return Response(ingredient_index.search(name))
+        return super().list(request, *args, **kwargs)
+
 
 class RecipesViewSet(viewsets.ModelViewSet):
     """Набор представления для рецептов, добавления рецептов в
     избранное и добавление в корзину.
     """
 
-    queryset = Recipe.objects.all().order_by("-pub_date")
+    queryset = Recipe.objects.all().order_by("-pub_date", "-id")
     serializer_class = RecipesCreateSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     permission_classes = (IsAuthorOrAdminOrReadOnly,)
     pagination_class = FoodgramPagination
+    parser_classes = (JSONParser, FormParser, StreamingMultiPartParser)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ("list", "retrieve"):
+            user = self.request.user
+            queryset = queryset.defer("search_vector").with_user_flags(user)
+            if self.action == "retrieve":
+                queryset = queryset.with_related(user)
+        return queryset
+
+    def serialize_recipes(self, recipes):
+        """Сериализовать рецепты с помощью кэша фрагментов.
+
+        Общая для всех пользователей часть ответа берется из кэша,
+        а для отсутствующих в нем рецептов сериализуется с подгрузкой
+        связанных данных. Поверх нее подставляются флаги избранного,
+        корзины и подписки на автора текущего пользователя и счетчик
+        избранного, который меняется без отметки рецепта измененным.
+        """
+        base_url = self.request.build_absolute_uri("/")
+        fragments = recipe_fragments.get_many(
+            (base_url, recipe.id, recipe.updated_at) for recipe in recipes
+        )
+        missing = [
+            recipe.id
+            for recipe in recipes
+            if (base_url, recipe.id, recipe.updated_at) not in fragments
+        ]
+        fetched = {}
+        if missing:
+            anonymous = AnonymousUser()
+            rows = list(
+                RecipeReadFastSerializer.get_rows(
+                    Recipe.objects.filter(pk__in=missing).with_user_flags(
+                        anonymous
+                    )
+                )
+            )
+            serializer = RecipeReadFastSerializer(
+                rows, context=self.get_serializer_context(), user=anonymous
+            )
+            new_fragments = {
+                (base_url, row["id"], row["updated_at"]): fragment
+                for row, fragment in zip(rows, serializer.data)
+            }
+            recipe_fragments.set_many(new_fragments)
+            fetched = {key[1]: value for key, value in new_fragments.items()}
+        subscribed = set(
+            Follow.objects.filter(
+                user=self.request.user,
+                following_id__in={recipe.author_id for recipe in recipes},
+            ).values_list("following_id", flat=True)
+        )
+        data = []
+        for recipe in recipes:
+            fragment = fragments.get(
+                (base_url, recipe.id, recipe.updated_at)
+            ) or fetched.get(recipe.id)
+            if fragment is None:
+                continue
+            item = dict(fragment)
+            item["is_favorited"] = recipe.is_favorited
+            item["is_in_shopping_cart"] = recipe.is_in_shopping_cart
+            item["favorites_count"] = recipe.favorites_count
+            item["author"] = dict(
+                item["author"],
+                is_subscribed=recipe.author_id in subscribed,
+            )
+            data.append(item)
+        return data
+
+    def rows_list(self, request, *args, **kwargs):
+        """Список рецептов, сериализованный из строк .values()."""
+        rows = RecipeReadFastSerializer.get_rows(
+            self.filter_queryset(self.get_queryset())
+        )
+        page = self.paginate_queryset(rows)
+        serializer = RecipeReadFastSerializer(
+            rows if page is None else page,
+            context=self.get_serializer_context(),
+        )
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
+    def fragment_list(self, request, *args, **kwargs):
+        """Список рецептов для авторизованных пользователей из кэша
+        сериализованных рецептов.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(self.serialize_recipes(list(queryset)))
+        return self.get_paginated_response(self.serialize_recipes(page))
+
+    def get_validators(self):
+        """Значения, от которых зависит ответ, одним запросом к БД.
+
+        Кроме времени изменения рецепта или списка рецептов учитывается
+        время изменения избранного, корзины и подписок пользователя.
+        Счетчик избранного рецепта меняется без отметки рецепта
+        измененным, поэтому в списке он может отставать не дольше
+        RECIPE_LIST_CACHE_TIMEOUT секунд, как и в кэше списка.
+        """
+        interactions = Value(None, output_field=DateTimeField())
+        if self.request.user.is_authenticated:
+            interactions = Subquery(
+                User.objects.filter(pk=self.request.user.pk).values(
+                    "interactions_changed_at"
+                )
+            )
+        if self.action == "list":
+            period = settings.RECIPE_LIST_CACHE_TIMEOUT
+            counted_at = datetime.fromtimestamp(
+                time.time() // period * period, tz=timezone.utc
+            )
+            return (*get_recipes_last_modified(interactions), counted_at)
+        pk = self.kwargs[self.lookup_field]
+        if not pk.isdigit():
+            return None
+        return (
+            Recipe.objects.filter(pk=pk)
+            .values_list("updated_at", interactions, "favorites_count")
+            .first()
+        )
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        """Ответить 304 до сериализации, если данные у клиента актуальны.
+
+        ETag учитывает пользователя, адрес с параметрами запроса и формат
+        ответа, потому что от них зависят флаги и содержимое выдачи.
+        """
+        validators = self.get_validators()
+        if validators is None:
+            return handler(request, *args, **kwargs)
+        last_modified = max(
+            value for value in validators if isinstance(value, datetime)
+        )
+        etag = quote_etag(
+            hashlib.sha256(
+                ":".join(
+                    (
+                        str(request.user.pk),
+                        request.get_full_path(),
+                        request.accepted_renderer.format,
+                        *map(str, validators),
+                    )
+                ).encode()
+            ).hexdigest()
+        )
+        timestamp = int(last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (
+            status.HTTP_200_OK,
+            status.HTTP_304_NOT_MODIFIED,
+        ):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(timestamp)
+            patch_vary_headers(response, ("Authorization",))
+        return response
+
+    def cached_list(self, request, *args, **kwargs):
+        """Список рецептов для анонимных пользователей из общего кэша."""
+        key = get_recipe_list_key(request)
+        data = get_recipe_list(key)
+        if data is not None:
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+        response = self.rows_list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            set_recipe_list(key, response.data)
+        response["X-Cache"] = "MISS"
+        return response
+
+    def list(self, request, *args, **kwargs):
+        handler = self.fragment_list
+        if not request.user.is_authenticated:
+            handler = self.cached_list
+        return self.conditional_response(handler, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
 
     @action(
         detail=True,
@@ -176,6 +484,7 @@ class RecipesViewSet(viewsets.ModelViewSet):
         url_path="shopping_cart",
         url_name="shopping-cart",
     )
+    @transaction.atomic
     def cart(self, request, pk=None):
         """Добавить рецепт в корзину."""
         request.data["recipe"] = self.kwargs["pk"]
@@ -187,6 +496,7 @@ class RecipesViewSet(viewsets.ModelViewSet):
         return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
     @cart.mapping.delete
+    @transaction.atomic
     def delete_cart(self, request, pk=None):
         """Удалить рецепт из корзины."""
         recipe = get_object_or_404(Recipe, id=self.kwargs["pk"])
@@ -197,24 +507,48 @@ class RecipesViewSet(viewsets.ModelViewSet):
             return Response(status=status.HTTP_400_BAD_REQUEST)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-    @action(detail=False, methods=["GET"], url_path="download_shopping_cart")
-    def send_shopping_list(self, request, pk=None):
-        """Скачать список ингредиентов и граммовки."""
-        recipe_list = (
-            ShoppingCart.objects.filter(user=request.user)
+    @staticmethod
+    def get_shopping_list_queryset(user):
+        """Строки списка покупок пользователя в порядке названий."""
+        return (
+            ShoppingListItem.objects.filter(user=user)
             .values(
-                "recipe__ingredients__name",
-                "recipe__ingredients__measurement_unit",
-            )
-            .annotate(amount=Sum("recipe__ingredients__amounts__amount"))
-        )
-        list_text = "Список игредиентов и граммовки: \n\n"
-        for ingredient in recipe_list:
-            list_text += (
-                f"{ingredient['recipe__ingredients__name']} - "
-                f"{ingredient['amount']} "
-                f"{ingredient['recipe__ingredients__measurement_unit']};\n"
+                name=F("ingredient__name"),
+                measurement_unit=F("ingredient__measurement_unit"),
+                amount=F("total_amount"),
             )
-        response = HttpResponse(list_text, content_type="text/plain")
-        response["Content-Disposition"] = "attachment"
+            .order_by("name")
+        )
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="download_shopping_cart",
+        url_name="download-shopping-cart",
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListPDFRenderer,
+        ),
+    )
+    def send_shopping_list(self, request, pk=None):
+        """Скачать список ингредиентов и граммовки."""
+        ingredients = self.get_shopping_list_queryset(request.user)
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f"; charset={renderer.charset}"
+        response = StreamingHttpResponse(
+            renderer.render_stream(ingredients.iterator()),
+            content_type=content_type,
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="shopping_list.{renderer.extension}"'
+        )
         return response
+
+
+def metrics(request):
+    """Метрики приложения в формате Prometheus."""
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
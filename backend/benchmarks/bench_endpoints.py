@@ -0,0 +1,416 @@
+# flake8: noqa
+"""Бенчмарк всех эндпоинтов роутера api/urls.py.
+
+Запуск:
+    python manage.py test benchmarks.bench_endpoints --pattern="bench_*.py"
+
+Объем данных задается переменными окружения BENCHMARK_USERS,
+BENCHMARK_RECIPES и BENCHMARK_INGREDIENTS, число повторов каждого
+запроса - BENCHMARK_REPEATS. Результат (p50/p95/p99 времени ответа,
+количество и время SQL-запросов по каждому эндпоинту) выводится
+в формате JSON или записывается в файл BENCHMARK_OUTPUT.
+
+Пароли хешируются MD5, чтобы время эндпоинтов смены пароля и удаления
+пользователя не определялось стойким хешированием. Сброс пароля
+запрашивается для неизвестного адреса: письма со ссылкой в проекте
+не настроены.
+"""
+import base64
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from http import HTTPStatus
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from api.urls import router_v1
+from recipes.models import (
+    Amount,
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+)
+from users.models import Follow
+
+User = get_user_model()
+
+USERS_COUNT = int(os.getenv("BENCHMARK_USERS", 1000))
+RECIPES_COUNT = int(os.getenv("BENCHMARK_RECIPES", 10_000))
+INGREDIENTS_COUNT = int(os.getenv("BENCHMARK_INGREDIENTS", 2000))
+REPEATS = int(os.getenv("BENCHMARK_REPEATS", 20))
+OUTPUT = os.getenv("BENCHMARK_OUTPUT")
+INGREDIENTS_PER_RECIPE = 5
+USER_RELATIONS = 30
+BATCH_SIZE = 5000
+PASSWORDS = ("benchmark-password-1", "benchmark-password-2")
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image():
+    buffer = BytesIO()
+    Image.new("RGB", (600, 400), "orange").save(buffer, "PNG")
+    return "data:image/png;base64," + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+class QueryTimer:
+    """Обертка выполнения SQL, считающая запросы и их суммарное время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def percentile(quantiles, value):
+    return round(quantiles[value - 1] * 1000, 3)
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class EndpointsBenchmark(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.random = random.Random(42)
+        User.objects.bulk_create(
+            (
+                User(username=f"user{i}", email=f"user{i}@test.com")
+                for i in range(USERS_COUNT)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        cls.user = User.objects.get(username="user0")
+        cls.user.set_password(PASSWORDS[0])
+        cls.user.save()
+        user_ids = list(User.objects.values_list("id", flat=True))
+        cls.tags = [
+            Tag.objects.create(name=name, slug=slug, color=color)
+            for name, slug, color in (
+                ("Завтрак", "breakfast", "#E26C2D"),
+                ("Обед", "lunch", "#32CD32"),
+                ("Ужин", "dinner", "#8775D2"),
+            )
+        ]
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(name=f"ингредиент {i}", measurement_unit="г")
+                for i in range(INGREDIENTS_COUNT)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        cls.ingredient_ids = list(
+            Ingredient.objects.values_list("id", flat=True)
+        )
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    name=f"Рецепт {i}",
+                    text="Описание",
+                    cooking_time=10,
+                    image="recipes/images/benchmark.png",
+                    author_id=cls.random.choice(user_ids),
+                )
+                for i in range(RECIPES_COUNT)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        cls.recipe_ids = list(Recipe.objects.values_list("id", flat=True))
+        Amount.objects.bulk_create(
+            (
+                Amount(recipe_id=recipe_id, ingredient_id=ingredient_id, amount=1)
+                for recipe_id in cls.recipe_ids
+                for ingredient_id in cls.random.sample(
+                    cls.ingredient_ids, INGREDIENTS_PER_RECIPE
+                )
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(
+                    recipe_id=recipe_id, tag=cls.random.choice(cls.tags)
+                )
+                for recipe_id in cls.recipe_ids
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create(
+                model(user=cls.user, recipe_id=recipe_id)
+                for recipe_id in cls.random.sample(
+                    cls.recipe_ids, USER_RELATIONS
+                )
+            )
+        cls.followed_ids = cls.random.sample(
+            [user_id for user_id in user_ids if user_id != cls.user.id],
+            USER_RELATIONS,
+        )
+        Follow.objects.bulk_create(
+            Follow(user=cls.user, following_id=following_id)
+            for following_id in cls.followed_ids
+        )
+        ShoppingListItem.objects.refresh()
+        cls.own_recipe = Recipe.objects.create(
+            name="Свой рецепт",
+            text="Описание",
+            cooking_time=10,
+            image="recipes/images/benchmark.png",
+            author=cls.user,
+        )
+        cls.image = make_image()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.samples = defaultdict(list)
+        self.password = PASSWORDS[0]
+
+    def request(
+        self,
+        method,
+        url_name,
+        kwargs=None,
+        data=None,
+        status=HTTPStatus.OK,
+        user=None,
+        query="",
+    ):
+        """Выполнить запрос и записать время ответа и SQL-запросы."""
+        self.client.force_authenticate(user or self.user)
+        url = reverse(f"api:{url_name}", kwargs=kwargs) + query
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            start = time.perf_counter()
+            response = getattr(self.client, method)(url, data, format="json")
+            if response.streaming:
+                b"".join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        self.assertEqual(
+            response.status_code, status, f"{method} {url}: {response}"
+        )
+        self.samples[(method.upper(), url_name)].append(
+            (elapsed, timer.count, timer.duration)
+        )
+        return response
+
+    def recipe_data(self, name):
+        return {
+            "ingredients": [
+                {"id": ingredient_id, "amount": 10}
+                for ingredient_id in self.random.sample(
+                    self.ingredient_ids, INGREDIENTS_PER_RECIPE
+                )
+            ],
+            "tags": [tag.id for tag in self.tags[:2]],
+            "image": self.image,
+            "name": name,
+            "text": "Описание",
+            "cooking_time": 15,
+        }
+
+    def run_iteration(self, i):
+        """Один проход по всем эндпоинтам."""
+        recipe_id = self.random.choice(self.recipe_ids)
+        self.request("get", "api-root")
+        self.request("get", "tags-list")
+        self.request("get", "tags-detail", {"pk": self.tags[0].id})
+        self.request("get", "ingredients-list", query="?name=ингредиент 1")
+        self.request(
+            "get",
+            "ingredients-detail",
+            {"pk": self.random.choice(self.ingredient_ids)},
+        )
+        self.request("get", "recipes-list", query="?tags=lunch&tags=dinner")
+        self.request("get", "recipes-detail", {"pk": recipe_id})
+        self.request(
+            "post",
+            "recipes-list",
+            data=self.recipe_data(f"Новый рецепт {i}"),
+            status=HTTPStatus.CREATED,
+        )
+        pk = {"pk": self.own_recipe.id}
+        self.request(
+            "put", "recipes-detail", pk, self.recipe_data(f"Рецепт {i}")
+        )
+        self.request(
+            "patch", "recipes-detail", pk, self.recipe_data(f"Рецепт {i}")
+        )
+        victim = Recipe.objects.create(
+            name="Удаляемый рецепт",
+            text="Описание",
+            cooking_time=10,
+            author=self.user,
+        )
+        self.request(
+            "delete",
+            "recipes-detail",
+            {"pk": victim.id},
+            status=HTTPStatus.NO_CONTENT,
+        )
+        target = {
+            "pk": self.random.choice(
+                list(
+                    set(self.recipe_ids)
+                    - set(
+                        Favorite.objects.filter(user=self.user).values_list(
+                            "recipe_id", flat=True
+                        )
+                    )
+                    - set(
+                        ShoppingCart.objects.filter(
+                            user=self.user
+                        ).values_list("recipe_id", flat=True)
+                    )
+                )
+            )
+        }
+        for url_name in ("recipes-favorite", "recipes-shopping-cart"):
+            self.request("post", url_name, target, status=HTTPStatus.CREATED)
+            self.request(
+                "delete", url_name, target, status=HTTPStatus.NO_CONTENT
+            )
+        self.request("get", "recipes-download-shopping-cart")
+        self.request("get", "users-list")
+        self.request(
+            "post",
+            "users-list",
+            data={
+                "email": f"new{i}@test.com",
+                "username": f"new{i}",
+                "first_name": "Имя",
+                "last_name": "Фамилия",
+                "password": PASSWORDS[0],
+            },
+            status=HTTPStatus.CREATED,
+        )
+        self.request("get", "users-me")
+        self.request("get", "users-subscriptions-list", query="?recipes_limit=3")
+        author_id = self.random.choice(self.followed_ids)
+        self.request("get", "users-detail", {"id": author_id})
+        user_data = {
+            "email": "user0@test.com",
+            "username": "user0",
+            "first_name": f"Имя {i}",
+            "last_name": "Фамилия",
+        }
+        me = {"id": self.user.id}
+        self.request("put", "users-detail", me, user_data)
+        self.request("patch", "users-detail", me, {"first_name": "Имя"})
+        victim = User.objects.create(
+            username=f"victim{i}", email=f"victim{i}@test.com"
+        )
+        victim.set_password(PASSWORDS[0])
+        victim.save()
+        self.request(
+            "delete",
+            "users-detail",
+            {"id": victim.id},
+            {"current_password": PASSWORDS[0]},
+            status=HTTPStatus.NO_CONTENT,
+            user=victim,
+        )
+        Follow.objects.filter(user=self.user, following_id=author_id).delete()
+        self.request(
+            "post", "users-follow", {"id": author_id}, status=HTTPStatus.CREATED
+        )
+        self.request(
+            "delete",
+            "users-follow",
+            {"id": author_id},
+            status=HTTPStatus.NO_CONTENT,
+        )
+        Follow.objects.create(user=self.user, following_id=author_id)
+        new_password = PASSWORDS[(i + 1) % 2]
+        self.request(
+            "post",
+            "users-set-password",
+            data={
+                "current_password": self.password,
+                "new_password": new_password,
+            },
+            status=HTTPStatus.NO_CONTENT,
+        )
+        self.password = new_password
+        self.request(
+            "post",
+            "users-reset-password",
+            data={"email": "unknown@test.com"},
+            status=HTTPStatus.NO_CONTENT,
+        )
+
+    def router_endpoints(self):
+        """Пары (метод, имя URL) всех эндпоинтов роутера, кроме HEAD,
+        который обрабатывается так же, как GET.
+        """
+        endpoints = set()
+        for url in router_v1.urls:
+            actions = getattr(url.callback, "actions", None) or {"get": None}
+            for method in actions:
+                if method != "head":
+                    endpoints.add((method.upper(), url.name))
+        return endpoints
+
+    def report(self):
+        report = {
+            "volumes": {
+                "users": USERS_COUNT,
+                "recipes": RECIPES_COUNT,
+                "ingredients": INGREDIENTS_COUNT,
+            },
+            "repeats": REPEATS,
+            "endpoints": {},
+        }
+        for (method, url_name), samples in sorted(self.samples.items()):
+            timings, queries, sql_times = zip(*samples)
+            quantiles = statistics.quantiles(
+                timings, n=100, method="inclusive"
+            )
+            report["endpoints"][f"{method} {url_name}"] = {
+                "p50_ms": percentile(quantiles, 50),
+                "p95_ms": percentile(quantiles, 95),
+                "p99_ms": percentile(quantiles, 99),
+                "queries": statistics.median(queries),
+                "sql_ms": round(statistics.median(sql_times) * 1000, 3),
+            }
+        return report
+
+    def test_endpoints(self):
+        """Время ответа и SQL-запросы всех эндпоинтов API."""
+        for i in range(REPEATS):
+            self.run_iteration(i)
+        self.assertEqual(set(self.samples), self.router_endpoints())
+        report = json.dumps(self.report(), ensure_ascii=False, indent=2)
+        if OUTPUT:
+            with open(OUTPUT, "w", encoding="utf-8") as output:
+                output.write(report)
+        else:
+            print(report)
@@ -0,0 +1,67 @@
+# flake8: noqa
+"""Бенчмарк поиска ингредиентов по началу названия: индекс в памяти
+против запроса к БД.
+
+Запуск:
+    python manage.py test benchmarks --pattern="bench_*.py"
+"""
+import csv
+import statistics
+import time
+
+from django.conf import settings
+from django.test import TestCase
+
+from recipes.models import Ingredient
+from recipes.search import ingredient_index
+
+REPEATS = 200
+PREFIXES = ("а", "мо", "кар", "сыр", "ёж", "тв", "я")
+
+
+class IngredientSearchBenchmark(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with open(
+            settings.BASE_DIR / "data" / "ingredients.csv", encoding="utf-8"
+        ) as ingredients_file:
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(
+                        name=name.strip(),
+                        measurement_unit=measurement_unit.strip(),
+                    )
+                    for name, measurement_unit in csv.reader(
+                        ingredients_file
+                    )
+                ),
+                ignore_conflicts=True,
+            )
+
+    def setUp(self):
+        ingredient_index.invalidate()
+
+    def measure(self, search):
+        timings = []
+        for _ in range(REPEATS):
+            for prefix in PREFIXES:
+                start = time.perf_counter()
+                search(prefix)
+                timings.append(time.perf_counter() - start)
+        return statistics.median(timings) * 1_000_000
+
+    def test_ingredient_search(self):
+        """Медианное время поиска по индексу и по БД."""
+        ingredient_index.search("")
+        database = self.measure(
+            lambda prefix: list(
+                Ingredient.objects.filter(name__istartswith=prefix).values(
+                    "id", "name", "measurement_unit"
+                )
+            )
+        )
+        index = self.measure(ingredient_index.search)
+        print(
+            f"\ningredients={Ingredient.objects.count()} "
+            f"database={database:.1f}us index={index:.1f}us"
+        )
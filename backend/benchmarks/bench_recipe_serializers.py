@@ -0,0 +1,140 @@
+# flake8: noqa
+"""Бенчмарк сериализации списка рецептов: RecipeReadSerializer с
+подгрузкой связанных объектов против RecipeReadFastSerializer на строках
+.values().
+
+Запуск:
+    python manage.py test benchmarks.bench_recipe_serializers --pattern="bench_*.py"
+
+Выводит количество рецептов в секунду для обоих вариантов: с загрузкой
+рецептов из БД и по уже загруженным рецептам (*_loaded). Быстрый
+сериализатор и во втором случае сам запрашивает авторов, теги и
+ингредиенты.
+"""
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import RecipeReadFastSerializer, RecipeReadSerializer
+from recipes.cache import get_tag_catalogue
+from recipes.models import Amount, Favorite, Ingredient, Recipe, Tag
+from users.models import Follow
+
+User = get_user_model()
+
+RECIPES_COUNT = 1000
+USERS_COUNT = 100
+INGREDIENTS_COUNT = 500
+INGREDIENTS_PER_RECIPE = 8
+TAGS_PER_RECIPE = 2
+REPEATS = 5
+
+
+class RecipeSerializersBenchmark(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(0)
+        User.objects.bulk_create(
+            User(username=f"user{i}", email=f"user{i}@test.com")
+            for i in range(USERS_COUNT)
+        )
+        users = list(User.objects.all())
+        Tag.objects.bulk_create(
+            Tag(name=f"Тег {i}", slug=f"tag{i}", color=f"#{i:06d}")
+            for i in range(5)
+        )
+        tags = list(Tag.objects.all())
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"ингредиент {i}", measurement_unit="г")
+            for i in range(INGREDIENTS_COUNT)
+        )
+        ingredients = list(Ingredient.objects.all())
+        Recipe.objects.bulk_create(
+            Recipe(
+                name=f"Рецепт {i}",
+                text="Описание рецепта. " * 20,
+                cooking_time=rng.randint(1, 180),
+                author=rng.choice(users),
+                image=f"recipes/images/{i}.png",
+                image_variants={"thumb_jpeg": f"variants/{i}.jpg"},
+            )
+            for i in range(RECIPES_COUNT)
+        )
+        recipes = list(Recipe.objects.all())
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes
+            for tag in rng.sample(tags, TAGS_PER_RECIPE)
+        )
+        Amount.objects.bulk_create(
+            Amount(recipe=recipe, ingredient=ingredient, amount=100)
+            for recipe in recipes
+            for ingredient in rng.sample(ingredients, INGREDIENTS_PER_RECIPE)
+        )
+        cls.user = users[0]
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe=recipe)
+            for recipe in rng.sample(recipes, 100)
+        )
+        Follow.objects.bulk_create(
+            Follow(user=cls.user, following=author) for author in users[1:20]
+        )
+
+    def setUp(self):
+        cache.clear()
+        get_tag_catalogue()
+        self.request = Request(APIRequestFactory().get("/api/recipes/"))
+        self.request.user = self.user
+        self.context = {"request": self.request}
+
+    def get_queryset(self):
+        return (
+            Recipe.objects.order_by("-pub_date", "-id")
+            .with_user_flags(self.user)
+        )
+
+    def serializer(self, loaded=None):
+        recipes = loaded or list(
+            self.get_queryset().with_related(self.user)
+        )
+        return RecipeReadSerializer(
+            recipes, many=True, context=self.context
+        ).data
+
+    def fast(self, loaded=None):
+        rows = loaded or list(
+            RecipeReadFastSerializer.get_rows(self.get_queryset())
+        )
+        return RecipeReadFastSerializer(rows, context=self.context).data
+
+    def measure(self, serialize, *args):
+        timings = []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            serialize(*args)
+            timings.append(time.perf_counter() - start)
+        return RECIPES_COUNT / statistics.median(timings)
+
+    def test_recipe_serializers(self):
+        """Рецептов в секунду для обоих вариантов сериализации."""
+        self.assertEqual(len(self.fast()), RECIPES_COUNT)
+        recipes = list(self.get_queryset().with_related(self.user))
+        rows = list(RecipeReadFastSerializer.get_rows(self.get_queryset()))
+        results = {
+            "serializer": self.measure(self.serializer),
+            "fast": self.measure(self.fast),
+            "serializer_loaded": self.measure(self.serializer, recipes),
+            "fast_loaded": self.measure(self.fast, rows),
+        }
+        print(
+            f"\nrecipes={RECIPES_COUNT} "
+            + " ".join(
+                f"{name}={value:.0f}/s" for name, value in results.items()
+            )
+        )
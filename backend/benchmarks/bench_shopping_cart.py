@@ -0,0 +1,125 @@
+# flake8: noqa
+"""Бенчмарк выгрузки списка покупок.
+
+Запуск:
+    python manage.py test benchmarks --pattern="bench_*.py"
+
+Размер каталога задается переменной окружения BENCHMARK_CATALOG_SIZE.
+"""
+import os
+import random
+import statistics
+import time
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient, APITestCase
+
+from recipes.models import (
+    Amount,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+)
+
+User = get_user_model()
+
+CATALOG_SIZE = int(os.getenv("BENCHMARK_CATALOG_SIZE", 100_000))
+INGREDIENTS_COUNT = 200
+INGREDIENTS_PER_RECIPE = 5
+CART_SIZES = (50, 100, 200)
+REPEATS = 5
+BATCH_SIZE = 5000
+
+
+class ShoppingCartBenchmark(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.random = random.Random(42)
+        cls.author = User.objects.create(
+            username="author", email="author@test.com"
+        )
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=f"ингредиент {i}", measurement_unit="г")
+                for i in range(INGREDIENTS_COUNT)
+            ]
+        )
+        cls.ingredient_ids = list(
+            Ingredient.objects.values_list("id", flat=True)
+        )
+        cls.users = [
+            User.objects.create(
+                username=f"user{size}", email=f"user{size}@test.com"
+            )
+            for size in CART_SIZES
+        ]
+
+    @classmethod
+    def seed_recipes(cls, count):
+        """Добавить в каталог count рецептов с ингредиентами."""
+        last_id = Recipe.objects.order_by("-id").values_list(
+            "id", flat=True
+        ).first() or 0
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    name=f"Рецепт {i}",
+                    text="Описание",
+                    cooking_time=10,
+                    author=cls.author,
+                )
+                for i in range(count)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        recipe_ids = Recipe.objects.filter(id__gt=last_id).values_list(
+            "id", flat=True
+        )
+        Amount.objects.bulk_create(
+            (
+                Amount(recipe_id=recipe_id, ingredient_id=ingredient_id, amount=1)
+                for recipe_id in recipe_ids.iterator()
+                for ingredient_id in cls.random.sample(
+                    cls.ingredient_ids, INGREDIENTS_PER_RECIPE
+                )
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+    def fill_carts(self):
+        ShoppingCart.objects.all().delete()
+        recipe_ids = list(Recipe.objects.values_list("id", flat=True))
+        for user, size in zip(self.users, CART_SIZES):
+            ShoppingCart.objects.bulk_create(
+                ShoppingCart(user=user, recipe_id=recipe_id)
+                for recipe_id in self.random.sample(recipe_ids, size)
+            )
+        ShoppingListItem.objects.refresh()
+
+    def measure(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        url = reverse("api:recipes-download-shopping-cart")
+        timings = []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - start)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+        return statistics.median(timings)
+
+    def test_download_shopping_cart(self):
+        """Время выгрузки в зависимости от размера корзины и каталога."""
+        seeded = 0
+        for catalog_size in (CATALOG_SIZE // 10, CATALOG_SIZE):
+            self.seed_recipes(catalog_size - seeded)
+            seeded = catalog_size
+            self.fill_carts()
+            for user, size in zip(self.users, CART_SIZES):
+                print(
+                    f"\ncatalog={catalog_size} cart={size} "
+                    f"median={self.measure(user) * 1000:.2f}ms"
+                )
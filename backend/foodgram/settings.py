@@ -37,6 +37,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.middleware.MetricsMiddleware",
+    "api.middleware.RequestTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -89,6 +91,22 @@ else:
         }
     }
 
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -152,3 +170,30 @@ DJOSER = {
 }
 
 PAGE_SIZE = 6
+MAX_PAGE_SIZE = 100
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    "SHOPPING_LIST_PDF_FONT",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+)
+
+INGREDIENT_INDEX_TTL = int(os.getenv("INGREDIENT_INDEX_TTL", 300))
+
+RECIPE_IMAGE_ASYNC = os.getenv("RECIPE_IMAGE_ASYNC", "True") == "True"
+RECIPE_IMAGE_WORKERS = int(os.getenv("RECIPE_IMAGE_WORKERS", 2))
+RECIPE_IMAGE_MAX_SIDE = 8000
+RECIPE_IMAGE_VARIANTS = {"thumb": 480, "detail": 1200}
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_PENDING_GRACE = int(os.getenv("RECIPE_IMAGE_PENDING_GRACE", 300))
+
+FILE_UPLOAD_CHUNK_SIZE = 64 * 1024
+
+TAG_CATALOGUE_TIMEOUT = int(os.getenv("TAG_CATALOGUE_TIMEOUT", 60))
+
+RECIPE_LIST_CACHE_TIMEOUT = int(os.getenv("RECIPE_LIST_CACHE_TIMEOUT", 300))
+RECIPE_FRAGMENT_CACHE_SIZE = int(os.getenv("RECIPE_FRAGMENT_CACHE_SIZE", 1000))
+
+REQUEST_TIMING = os.getenv("REQUEST_TIMING", "False") == "True"
+REQUEST_TIMING_SLOW_MS = int(os.getenv("REQUEST_TIMING_SLOW_MS", 500))
+REQUEST_TIMING_SLOW_QUERIES = int(os.getenv("REQUEST_TIMING_SLOW_QUERIES", 30))
+REQUEST_TIMING_TOP_SQL = 5
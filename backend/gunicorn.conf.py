@@ -0,0 +1,21 @@
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+bind = "0.0.0.0:9500"
+workers = int(os.getenv("GUNICORN_WORKERS", 3))
+
+
+def on_starting(server):
+    """Удалить файлы метрик процессов прошлого запуска."""
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+
+def child_exit(server, worker):
+    """Перестать учитывать метрики-гейджи завершившегося процесса."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
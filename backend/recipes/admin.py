@@ -1,6 +1,14 @@
 from django.contrib import admin
 
-from .models import Amount, Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from .models import (
+    Amount,
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+)
 
 
 class AmountInline(admin.TabularInline):
@@ -45,7 +53,21 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = [AmountInline, TagInline]
 
     def favorite_count(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
+
+    def save_related(self, request, form, formsets, change):
+        ingredient_ids = set(
+            Amount.objects.filter(recipe=form.instance).values_list(
+                "ingredient_id", flat=True
+            )
+        )
+        super().save_related(request, form, formsets, change)
+        ingredient_ids.update(
+            form.instance.amounts.values_list("ingredient_id", flat=True)
+        )
+        ShoppingListItem.objects.refresh_recipe(
+            form.instance.id, ingredient_ids
+        )
 
     favorite_count.short_description = "Добавлений в избранное: "
 
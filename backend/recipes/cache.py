@@ -0,0 +1,145 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Recipe, RecipeDeletion, Tag
+
+TAGS_VERSION_KEY = "recipes:tags:version"
+TAGS_KEY = "recipes:tags:{version}"
+RECIPES_VERSION_KEY = "recipes:recipes:version"
+RECIPE_DELETION_ID = 1
+
+
+class TagCatalogue:
+    """Снимок всех тегов с версией содержимого для заголовка ETag."""
+
+    def __init__(self, tags):
+        self.tags = tags
+        self.tags_by_id = {tag["id"]: tag for tag in tags}
+        self.etag = '"{}"'.format(
+            hashlib.sha256(
+                json.dumps(tags, ensure_ascii=False, sort_keys=True).encode()
+            ).hexdigest()
+        )
+
+
+def get_version(key):
+    """Номер версии данных, хранящийся в кэше под ключом key.
+
+    Начальное значение берется из текущего времени, чтобы после
+    вытеснения ключа из кэша не вернуться к старой версии данных.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Увеличить номер версии данных, сбросив все кэши этой версии."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def get_tags_version():
+    """Номер версии тегов."""
+    return get_version(TAGS_VERSION_KEY)
+
+
+def get_tag_catalogue(require_ids=(), require_slugs=()):
+    """Вернуть каталог тегов из кэша, при необходимости загрузив его из БД.
+
+    Каталог хранится под ключом с номером версии, поэтому загрузка,
+    совпавшая по времени с изменением тегов, не перезапишет новые данные.
+    Сброс версии виден только процессам с общим кэшем, поэтому каталог
+    живет TAG_CATALOGUE_TIMEOUT секунд: с кэшем в памяти процесса
+    остальные процессы увидят изменение тегов не позже этого срока.
+
+    Теги с id из require_ids и слагами из require_slugs, которых нет в
+    каталоге, ищутся в БД: если они там есть, например созданы в другом
+    процессе, каталог сбрасывается и загружается заново.
+    """
+    catalogue = cache.get(TAGS_KEY.format(version=get_tags_version()))
+    if catalogue is not None:
+        missing_ids = set(require_ids) - catalogue.tags_by_id.keys()
+        missing_slugs = set(require_slugs) - {
+            tag["slug"] for tag in catalogue.tags
+        }
+        if (missing_ids or missing_slugs) and Tag.objects.filter(
+            Q(pk__in=missing_ids) | Q(slug__in=missing_slugs)
+        ).exists():
+            invalidate_tags()
+            catalogue = None
+    if catalogue is None:
+        catalogue = TagCatalogue(
+            list(
+                Tag.objects.order_by("id").values(
+                    "id", "name", "color", "slug"
+                )
+            )
+        )
+        cache.set(
+            TAGS_KEY.format(version=get_tags_version()),
+            catalogue,
+            timeout=settings.TAG_CATALOGUE_TIMEOUT,
+        )
+    return catalogue
+
+
+def invalidate_tags():
+    """Сбросить каталог тегов, увеличив номер версии."""
+    bump_version(TAGS_VERSION_KEY)
+
+
+def get_recipes_version():
+    """Номер версии общедоступных данных рецептов."""
+    return get_version(RECIPES_VERSION_KEY)
+
+
+def invalidate_recipes():
+    """Сбросить кэши общедоступных данных рецептов."""
+    bump_version(RECIPES_VERSION_KEY)
+
+
+def mark_recipes_deleted():
+    """Запомнить в БД время удаления рецепта."""
+    deleted_at = timezone.now()
+    if not RecipeDeletion.objects.filter(pk=RECIPE_DELETION_ID).update(
+        deleted_at=deleted_at
+    ):
+        RecipeDeletion.objects.get_or_create(
+            pk=RECIPE_DELETION_ID, defaults={"deleted_at": deleted_at}
+        )
+
+
+def get_recipes_last_modified(*expressions):
+    """Время последнего изменения любого рецепта, в том числе удаления,
+    и значения выражений expressions, полученные тем же запросом к БД.
+
+    Рецепт может выпасть из отфильтрованного списка, поэтому для
+    списков берется максимум по всем рецептам.
+    """
+    updated_at = Subquery(
+        Recipe.objects.order_by("-updated_at").values("updated_at")[:1]
+    )
+    row = (
+        RecipeDeletion.objects.filter(pk=RECIPE_DELETION_ID)
+        .values_list(
+            Greatest("deleted_at", Coalesce(updated_at, "deleted_at")),
+            *expressions,
+        )
+        .first()
+    )
+    if row is None:
+        mark_recipes_deleted()
+        return get_recipes_last_modified(*expressions)
+    return row
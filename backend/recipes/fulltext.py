@@ -0,0 +1,145 @@
+import re
+
+SEARCH_CONFIG = "russian"
+SEARCH_RANK_SCALE = 1000000
+SQLITE_TABLE = "recipes_recipe_fts"
+RECIPE_TABLE = "recipes_recipe"
+
+POSTGRES_SCHEMA = (
+    f"""
+    CREATE OR REPLACE FUNCTION recipes_recipe_search_vector_update()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(
+                to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.name, '')), 'A'
+            )
+            || setweight(
+                to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.text, '')), 'B'
+            );
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger
+    ON {RECIPE_TABLE}
+    """,
+    f"""
+    CREATE TRIGGER recipes_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, text, search_vector ON {RECIPE_TABLE}
+    FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector_update()
+    """,
+    f"""
+    CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_gin
+    ON {RECIPE_TABLE} USING gin (search_vector)
+    """,
+)
+POSTGRES_DROP = (
+    "DROP INDEX IF EXISTS recipes_recipe_search_vector_gin",
+    f"""
+    DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger
+    ON {RECIPE_TABLE}
+    """,
+    "DROP FUNCTION IF EXISTS recipes_recipe_search_vector_update()",
+)
+POSTGRES_REBUILD = f"UPDATE {RECIPE_TABLE} SET search_vector = NULL"
+
+SQLITE_SCHEMA = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5(
+        name, text, content='{RECIPE_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_TABLE}_insert
+    AFTER INSERT ON {RECIPE_TABLE} BEGIN
+        INSERT INTO {SQLITE_TABLE}(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_TABLE}_delete
+    AFTER DELETE ON {RECIPE_TABLE} BEGIN
+        INSERT INTO {SQLITE_TABLE}({SQLITE_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_TABLE}_update
+    AFTER UPDATE OF name, text ON {RECIPE_TABLE} BEGIN
+        INSERT INTO {SQLITE_TABLE}({SQLITE_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO {SQLITE_TABLE}(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+)
+SQLITE_DROP = (
+    f"DROP TRIGGER IF EXISTS {SQLITE_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {SQLITE_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {SQLITE_TABLE}_update",
+    f"DROP TABLE IF EXISTS {SQLITE_TABLE}",
+)
+SQLITE_REBUILD = (
+    f"INSERT INTO {SQLITE_TABLE}({SQLITE_TABLE}) VALUES ('rebuild')"
+)
+
+
+def execute(connection, statements):
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def install(connection):
+    """Создать индекс полнотекстового поиска рецептов и триггеры,
+    которые обновляют его при любой записи в таблицу рецептов, в том
+    числе при массовой вставке.
+
+    В PostgreSQL это колонка tsvector с GIN-индексом, в SQLite -
+    виртуальная таблица FTS5. Повторный вызов безопасен: SQLite
+    пересоздает таблицу при изменении ее схемы и теряет триггеры,
+    поэтому после миграций они создаются заново.
+    """
+    if connection.vendor == "postgresql":
+        execute(connection, POSTGRES_SCHEMA)
+    elif connection.vendor == "sqlite":
+        execute(connection, SQLITE_SCHEMA)
+
+
+def uninstall(connection):
+    if connection.vendor == "postgresql":
+        execute(connection, POSTGRES_DROP)
+    elif connection.vendor == "sqlite":
+        execute(connection, SQLITE_DROP)
+
+
+def rebuild(connection):
+    """Заново проиндексировать все рецепты."""
+    if connection.vendor == "postgresql":
+        execute(connection, (POSTGRES_REBUILD,))
+    elif connection.vendor == "sqlite":
+        execute(connection, (SQLITE_REBUILD,))
+
+
+def repair(connection):
+    """Восстановить триггеры SQLite, потерянные при пересоздании таблицы
+    рецептов, и переиндексировать рецепты, измененные без них.
+    """
+    if (
+        connection.vendor == "sqlite"
+        and RECIPE_TABLE in connection.introspection.table_names()
+    ):
+        install(connection)
+        rebuild(connection)
+
+
+def sqlite_match(query):
+    """Запрос FTS5 из слов строки поиска с поиском по началу слова.
+
+    В SQLite нет морфологии русского языка, поэтому каждое слово
+    ищется как префикс.
+    """
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", query))
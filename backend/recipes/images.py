@@ -0,0 +1,161 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache import invalidate_recipes
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = "recipes/images/variants/"
+VARIANT_FORMATS = {"jpeg": "jpg", "webp": "webp"}
+DECODE_ERRORS = (
+    Image.DecompressionBombError,
+    OSError,
+    SyntaxError,
+    ValueError,
+)
+
+_executor = None
+_executor_lock = Lock()
+
+
+def get_executor():
+    """Пул потоков для обработки изображений, создается при первом вызове."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+                thread_name_prefix="recipe-images",
+            )
+    return _executor
+
+
+def variant_name(source, variant, image_format):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return (
+        f"{VARIANTS_DIR}{stem}_{variant}.{VARIANT_FORMATS[image_format]}"
+    )
+
+
+def delete_variants(storage, variants):
+    """Удалить файлы уменьшенных копий изображения."""
+    for key, name in variants.items():
+        if key != "source" and name:
+            storage.delete(name)
+
+
+def render_variants(image, source, storage):
+    """Сохранить уменьшенные копии изображения во всех форматах."""
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    variants = {"source": source}
+    for variant, max_side in settings.RECIPE_IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((max_side, max_side))
+        for image_format in VARIANT_FORMATS:
+            buffer = BytesIO()
+            resized.save(
+                buffer,
+                image_format,
+                quality=settings.RECIPE_IMAGE_QUALITY,
+                optimize=True,
+            )
+            variants[f"{variant}_{image_format}"] = storage.save(
+                variant_name(source, variant, image_format),
+                ContentFile(buffer.getvalue()),
+            )
+    return variants
+
+
+def generate_variants(recipe_id):
+    """Создать уменьшенные копии изображения рецепта.
+
+    Копии записываются и отметка ожидания снимается, только если
+    изображение рецепта не поменялось за время обработки, иначе
+    созданные файлы удаляются. Изображение, которое не удается
+    декодировать, отмечается обработанным без копий: вместо них
+    отдается исходное фото. При других ошибках, например хранилища,
+    отметка остается, и задачу повторит generate_image_variants
+    --pending.
+    """
+    try:
+        recipe = (
+            Recipe.objects.filter(pk=recipe_id)
+            .only("image", "image_variants")
+            .first()
+        )
+        if recipe is None or not recipe.image:
+            return
+        source = recipe.image.name
+        storage = recipe.image.storage
+        with recipe.image.open("rb") as file:
+            try:
+                image = Image.open(file)
+                image.load()
+            except DECODE_ERRORS:
+                logger.exception(
+                    "Не удалось декодировать изображение рецепта %s.",
+                    recipe_id,
+                )
+                image = None
+        if image is None:
+            variants = {"source": source}
+        else:
+            with image:
+                variants = render_variants(image, source, storage)
+        updated = Recipe.objects.filter(pk=recipe_id, image=source).update(
+            image_variants=variants,
+            image_variants_pending_since=None,
+            updated_at=timezone.now(),
+        )
+        if updated:
+            invalidate_recipes()
+            delete_variants(storage, recipe.image_variants)
+        else:
+            delete_variants(storage, variants)
+    except Exception:
+        logger.exception(
+            "Не удалось обработать изображение рецепта %s.", recipe_id
+        )
+
+
+def generate_variants_in_background(recipe_id):
+    """Задача пула потоков: обработать изображение и закрыть соединение
+    с БД, открытое потоком.
+    """
+    try:
+        generate_variants(recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_variants(recipe):
+    """Запланировать обработку изображения после фиксации транзакции."""
+
+    def submit():
+        if settings.RECIPE_IMAGE_ASYNC:
+            get_executor().submit(generate_variants_in_background, recipe.pk)
+        else:
+            generate_variants(recipe.pk)
+
+    transaction.on_commit(submit)
+
+
+def delete_recipe_variants(recipe):
+    """Удалить файлы уменьшенных копий фото удаленного рецепта после
+    фиксации транзакции.
+    """
+    if not recipe.image_variants:
+        return
+    storage = Recipe._meta.get_field("image").storage
+    variants = dict(recipe.image_variants)
+    transaction.on_commit(lambda: delete_variants(storage, variants))
@@ -0,0 +1,298 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .cache import invalidate_recipes, invalidate_tags
+from .models import Ingredient, Recipe, Tag
+from .search import ingredient_index
+
+CHUNK_SIZE = 64 * 1024
+BATCH_SIZE = 10000
+FORMATS = ("csv", "json", "ndjson")
+EXTENSIONS = {".csv": "csv", ".json": "json", ".ndjson": "ndjson"}
+
+
+class Catalogue:
+    """Справочник, который можно загрузить из файла.
+
+    columns - порядок колонок в CSV, key - поля, по которым строка файла
+    сопоставляется с записью в базе, остальные колонки обновляются.
+    recipe_field - связь рецепта со справочником, через которую
+    отмечаются измененными рецепты с обновленными записями.
+    """
+
+    def __init__(self, model, columns, key, recipe_field, invalidate):
+        self.model = model
+        self.columns = columns
+        self.key = key
+        self.values = tuple(name for name in columns if name not in key)
+        self.recipe_field = recipe_field
+        self.invalidate = invalidate
+
+    def clean(self, row):
+        """Строка файла без лишних пробелов или None, если она некорректна."""
+        if isinstance(row, (list, tuple)):
+            if len(row) != len(self.columns):
+                return None
+            row = dict(zip(self.columns, row))
+        if not isinstance(row, dict):
+            return None
+        cleaned = []
+        for name in self.columns:
+            value = row.get(name)
+            if not isinstance(value, str):
+                return None
+            value = value.strip()
+            if not value or len(value) > self.model._meta.get_field(
+                name
+            ).max_length:
+                return None
+            cleaned.append(value)
+        return tuple(cleaned)
+
+
+CATALOGUES = {
+    "ingredients": Catalogue(
+        Ingredient,
+        ("name", "measurement_unit"),
+        ("name",),
+        "ingredients",
+        ingredient_index.invalidate,
+    ),
+    "tags": Catalogue(
+        Tag, ("name", "color", "slug"), ("slug",), "tags", invalidate_tags
+    ),
+}
+
+
+def iter_json_array(file, chunk_size=CHUNK_SIZE):
+    """Элементы JSON-массива из файла, читаемого частями.
+
+    В памяти держится только недочитанный остаток, поэтому размер файла
+    не ограничен.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof, started = "", 0, False, False
+    while True:
+        while position < len(buffer) and (
+            buffer[position].isspace()
+            or buffer[position] == ","
+            or (buffer[position] == "[" and not started)
+        ):
+            started = started or buffer[position] == "["
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        if position < len(buffer) and not started:
+            raise ValueError("Ожидался JSON-массив.")
+        if position < len(buffer):
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield item
+                continue
+        if eof:
+            if started:
+                raise ValueError("Незавершенный JSON-массив.")
+            return
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer, position = buffer[position:] + chunk, 0
+
+
+def iter_ndjson(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_rows(file, format):
+    """Строки файла в формате csv, json или ndjson."""
+    if format == "csv":
+        return csv.reader(file)
+    if format == "json":
+        return iter_json_array(file)
+    if format == "ndjson":
+        return iter_ndjson(file)
+    raise ValueError(f"Неизвестный формат: {format}.")
+
+
+class Importer:
+    """Загрузка справочника с обновлением существующих записей.
+
+    Строки потоком, пакетами по batch_size, пишутся во временную
+    таблицу (в PostgreSQL - командой COPY), после чего записи
+    справочника обновляются и добавляются несколькими запросами
+    INSERT ... SELECT и UPDATE. В памяти держится только один пакет.
+
+    Запись обновляется, если ее ключ встречается в файле с единственным
+    набором значений и в базе есть ровно одна запись с таким ключом:
+    ингредиент может законно иметь несколько единиц измерения, и тогда
+    непонятно, какую из них заменять. Такие строки добавляются как
+    новые записи.
+    """
+
+    def __init__(self, catalogue, batch_size=BATCH_SIZE):
+        self.catalogue = catalogue
+        self.batch_size = batch_size
+        self.quote = connection.ops.quote_name
+        table = catalogue.model._meta.db_table
+        self.table = self.quote(table)
+        self.staging = self.quote(f"{table}_import")
+        self.distinct = self.quote(f"{table}_import_distinct")
+        self.distinct_index = self.quote(f"{table}_import_distinct_key")
+        self.read = 0
+
+    def column(self, name):
+        return self.quote(self.catalogue.model._meta.get_field(name).column)
+
+    def match(self, left, right, names):
+        return " AND ".join(
+            f"{left}.{self.column(name)} = {right}.{self.column(name)}"
+            for name in names
+        )
+
+    def columns(self, prefix=None):
+        return ", ".join(
+            f"{prefix}.{self.column(name)}" if prefix else self.column(name)
+            for name in self.catalogue.columns
+        )
+
+    def changed(self):
+        """Условие на записи справочника, которые нужно обновить."""
+        same_key = self.match("incoming", self.table, self.catalogue.key)
+        same_values = self.match(
+            "incoming", self.table, self.catalogue.values
+        )
+        conditions = [
+            f"(SELECT COUNT(*) FROM {self.distinct} incoming "
+            f"WHERE {same_key}) = 1",
+            f"(SELECT COUNT(*) FROM {self.table} other "
+            f"WHERE {self.match('other', self.table, self.catalogue.key)}) "
+            f"= 1",
+            f"NOT EXISTS (SELECT 1 FROM {self.distinct} incoming "
+            f"WHERE {same_key} AND {same_values})",
+        ]
+        unique = [
+            name
+            for name in self.catalogue.values
+            if self.catalogue.model._meta.get_field(name).unique
+        ]
+        if unique:
+            taken = " OR ".join(
+                f"other.{self.column(name)} = incoming.{self.column(name)}"
+                for name in unique
+            )
+            conditions.append(
+                f"NOT EXISTS (SELECT 1 FROM {self.distinct} incoming "
+                f"JOIN {self.table} other ON {taken} "
+                f"WHERE {same_key} AND other.id <> {self.table}.id)"
+            )
+        return " AND ".join(conditions)
+
+    def iter_cleaned(self, rows):
+        for row in rows:
+            self.read += 1
+            cleaned = self.catalogue.clean(row)
+            if cleaned is not None:
+                yield cleaned
+
+    def load_staging(self, cursor, rows):
+        rows = self.iter_cleaned(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            if connection.vendor == "postgresql":
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f"COPY {self.staging} ({self.columns()}) "
+                    f"FROM STDIN WITH (FORMAT csv)",
+                    buffer,
+                )
+            else:
+                placeholders = ", ".join(["%s"] * len(self.catalogue.columns))
+                cursor.executemany(
+                    f"INSERT INTO {self.staging} ({self.columns()}) "
+                    f"VALUES ({placeholders})",
+                    batch,
+                )
+
+    def create_staging(self, cursor):
+        definition = ", ".join(
+            f"{self.column(name)} "
+            f"{self.catalogue.model._meta.get_field(name).db_type(connection)}"
+            for name in self.catalogue.columns
+        )
+        cursor.execute(f"CREATE TEMPORARY TABLE {self.staging} ({definition})")
+
+    def drop_staging(self, cursor):
+        for table in (self.staging, self.distinct):
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+    def run(self, rows):
+        """Загрузить строки и вернуть количество добавленных, обновленных
+        и пропущенных (дубликаты, некорректные и совпадающие с базой).
+        """
+        catalogue = self.catalogue
+        key_columns = ", ".join(self.column(name) for name in catalogue.key)
+        with transaction.atomic(), connection.cursor() as cursor:
+            self.drop_staging(cursor)
+            self.create_staging(cursor)
+            self.load_staging(cursor, rows)
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {self.distinct} AS "
+                f"SELECT DISTINCT {self.columns()} FROM {self.staging}"
+            )
+            cursor.execute(
+                f"CREATE INDEX {self.distinct_index} "
+                f"ON {self.distinct} ({key_columns})"
+            )
+            changed = self.changed()
+            Recipe.objects.filter(
+                **{
+                    f"{catalogue.recipe_field}__in": RawSQL(
+                        f"SELECT id FROM {self.table} WHERE {changed}", ()
+                    )
+                }
+            ).touch()
+            assignments = ", ".join(
+                f"{self.column(name)} = (SELECT incoming.{self.column(name)} "
+                f"FROM {self.distinct} incoming "
+                f"WHERE {self.match('incoming', self.table, catalogue.key)})"
+                for name in catalogue.values
+            )
+            cursor.execute(
+                f"UPDATE {self.table} SET {assignments} WHERE {changed}"
+            )
+            updated = cursor.rowcount
+            exists = self.match("existing", "incoming", catalogue.columns)
+            cursor.execute(
+                f"INSERT INTO {self.table} ({self.columns()}) "
+                f"SELECT {self.columns('incoming')} "
+                f"FROM {self.distinct} incoming "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {self.table} existing "
+                f"WHERE {exists}) "
+                f"ORDER BY {self.columns('incoming')} "
+                f"ON CONFLICT DO NOTHING"
+            )
+            inserted = cursor.rowcount
+            self.drop_staging(cursor)
+        if inserted or updated:
+            catalogue.invalidate()
+        if updated:
+            invalidate_recipes()
+        return {
+            "inserted": inserted,
+            "updated": updated,
+            "skipped": self.read - inserted - updated,
+        }
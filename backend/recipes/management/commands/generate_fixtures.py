@@ -0,0 +1,366 @@
+import csv
+import io
+import random
+import time
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, call_command
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from foodgram.const import (
+    COOKING_TIME_MIN,
+    INGREDIENTS_AMOUNT_MAX,
+    INGREDIENTS_AMOUNT_MIN,
+)
+from recipes.cache import invalidate_recipes
+from recipes.models import (
+    Amount,
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+)
+from users.models import Follow, User
+
+COOKING_TIME_MAX = 180
+TAGS = (
+    ("Завтрак", "#E26C2D", "breakfast"),
+    ("Обед", "#49B64E", "lunch"),
+    ("Ужин", "#8775D2", "dinner"),
+)
+
+
+class ZipfSampler:
+    """Выбор элементов последовательности с вероятностью, обратно
+    пропорциональной рангу элемента в степени exponent.
+
+    Первые элементы выбираются чаще всего, остальные образуют длинный
+    хвост, как популярность рецептов и авторов на реальном сайте.
+    """
+
+    def __init__(self, items, exponent, rng):
+        self.items = items
+        self.rng = rng
+        self.cum_weights = list(
+            accumulate(
+                1 / rank**exponent for rank in range(1, len(items) + 1)
+            )
+        )
+
+    def sample(self, k=1):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights, k=k)
+
+    def sample_distinct(self, k, exclude=None):
+        """Выбрать не более k различных элементов, кроме exclude."""
+        k = min(k, len(self.items) // 2)
+        chosen = set()
+        while len(chosen) < k:
+            chosen.update(self.sample(k - len(chosen)))
+            chosen.discard(exclude)
+        return chosen
+
+
+class Loader:
+    """Пакетная запись объектов в базу данных с замером скорости.
+
+    В PostgreSQL пакеты загружаются командой COPY, в остальных базах -
+    через bulk_create.
+    """
+
+    def __init__(self, batch_size, stdout):
+        self.batch_size = batch_size
+        self.stdout = stdout
+        self.copy = connection.vendor == "postgresql"
+        self.rows = 0
+        self.seconds = 0
+
+    def load(self, model, objs):
+        started = time.perf_counter()
+        rows = 0
+        objs = iter(objs)
+        while True:
+            batch = list(islice(objs, self.batch_size))
+            if not batch:
+                break
+            if self.copy:
+                self.copy_batch(model, batch)
+            else:
+                model.objects.bulk_create(batch)
+            rows += len(batch)
+        seconds = time.perf_counter() - started
+        self.rows += rows
+        self.seconds += seconds
+        self.report(model._meta.db_table, rows, seconds)
+
+    def copy_batch(self, model, batch):
+        """Загрузить пакет командой COPY в формате CSV.
+
+        Значения полей готовятся так же, как при bulk_create, поэтому
+        результат не зависит от способа загрузки.
+        """
+        fields = [
+            field
+            for field in model._meta.local_concrete_fields
+            if not (field.primary_key and batch[0].pk is None)
+        ]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for obj in batch:
+            writer.writerow(
+                r"\N" if value is None else value
+                for value in (
+                    field.get_db_prep_save(
+                        field.pre_save(obj, True), connection
+                    )
+                    for field in fields
+                )
+            )
+        buffer.seek(0)
+        columns = ", ".join(
+            connection.ops.quote_name(field.column) for field in fields
+        )
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {connection.ops.quote_name(model._meta.db_table)} "
+                f"({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer,
+            )
+
+    def report(self, name, rows, seconds):
+        rate = rows / seconds if seconds else 0
+        self.stdout.write(
+            f"{name}: {rows} строк за {seconds:.1f} с "
+            f"({rate:.0f} строк/с)."
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic users, recipes, ingredients amounts, "
+        "favorites, carts and follows with skewed popularity."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=10000, help="Number of users."
+        )
+        parser.add_argument(
+            "--recipes", type=int, default=50000, help="Number of recipes."
+        )
+        parser.add_argument(
+            "--ingredients-per-recipe",
+            type=int,
+            default=8,
+            help="Average number of ingredients in a recipe.",
+        )
+        parser.add_argument(
+            "--favorites-per-user",
+            type=int,
+            default=20,
+            help="Average number of favorite recipes per user.",
+        )
+        parser.add_argument(
+            "--carts-per-user",
+            type=int,
+            default=3,
+            help="Average number of recipes in a user's cart.",
+        )
+        parser.add_argument(
+            "--follows-per-user",
+            type=int,
+            default=10,
+            help="Average number of authors a user follows.",
+        )
+        parser.add_argument(
+            "--zipf",
+            type=float,
+            default=1.1,
+            help="Exponent of Zipf popularity of authors and recipes.",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Random seed."
+        )
+        parser.add_argument(
+            "--password",
+            default="fixture",
+            help="Password of generated users.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of rows per INSERT or COPY.",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.options = options
+        self.loader = Loader(options["batch_size"], self.stdout)
+        with transaction.atomic():
+            self.generate()
+            call_command("recount_counters", stdout=self.stdout)
+            ShoppingListItem.objects.refresh(
+                batch_size=options["batch_size"]
+            )
+            if self.loader.copy:
+                self.reset_sequences(User, Recipe)
+            invalidate_recipes()
+        self.loader.report("Всего", self.loader.rows, self.loader.seconds)
+
+    def generate(self):
+        options = self.options
+        users = self.next_ids(User, options["users"])
+        recipes = self.next_ids(Recipe, options["recipes"])
+        tag_ids = self.get_tag_ids()
+        ingredients = ZipfSampler(
+            self.get_ingredient_ids(options["ingredients_per_recipe"] * 4),
+            options["zipf"],
+            self.rng,
+        )
+        authors = ZipfSampler(users, options["zipf"], self.rng)
+        popular = ZipfSampler(recipes, options["zipf"], self.rng)
+
+        self.loader.load(
+            User, self.generate_users(users, options["password"])
+        )
+        self.loader.load(Recipe, self.generate_recipes(recipes, authors))
+        self.loader.load(
+            Recipe.tags.through,
+            (
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipes
+                for tag_id in self.rng.sample(
+                    tag_ids, self.rng.randint(1, len(tag_ids))
+                )
+            ),
+        )
+        self.loader.load(
+            Amount,
+            (
+                Amount(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=self.rng.randint(
+                        INGREDIENTS_AMOUNT_MIN, INGREDIENTS_AMOUNT_MAX // 64
+                    ),
+                )
+                for recipe_id in recipes
+                for ingredient_id in ingredients.sample_distinct(
+                    self.rng.randint(
+                        1, options["ingredients_per_recipe"] * 2 - 1
+                    )
+                )
+            ),
+        )
+        for model, per_user in (
+            (Favorite, options["favorites_per_user"]),
+            (ShoppingCart, options["carts_per_user"]),
+        ):
+            self.loader.load(
+                model,
+                (
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id, recipe_id in self.generate_pairs(
+                        users, popular, per_user
+                    )
+                ),
+            )
+        self.loader.load(
+            Follow,
+            (
+                Follow(user_id=user_id, following_id=following_id)
+                for user_id, following_id in self.generate_pairs(
+                    users, authors, options["follows_per_user"], True
+                )
+            ),
+        )
+
+    def next_ids(self, model, count):
+        """Диапазон id для новых объектов после существующих.
+
+        id задаются явно, чтобы ссылаться на объекты без повторного
+        чтения их из базы.
+        """
+        start = (model.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+        return range(start, start + count)
+
+    def reset_sequences(self, *models):
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+    def get_tag_ids(self):
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=name, color=color, slug=slug)
+                for name, color, slug in TAGS
+            )
+        return list(Tag.objects.values_list("pk", flat=True))
+
+    def get_ingredient_ids(self, minimum):
+        """id ингредиентов; недостающие до minimum создаются."""
+        count = Ingredient.objects.count()
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"Ингредиент {count + i}", measurement_unit="г")
+            for i in range(minimum - count)
+        )
+        return list(
+            Ingredient.objects.order_by("pk").values_list("pk", flat=True)
+        )
+
+    def generate_users(self, ids, password):
+        password = make_password(password)
+        now = timezone.now()
+        for user_id in ids:
+            yield User(
+                id=user_id,
+                username=f"fixture{user_id}",
+                email=f"fixture{user_id}@example.com",
+                first_name="Имя",
+                last_name="Фамилия",
+                password=password,
+                date_joined=now,
+            )
+
+    def generate_recipes(self, ids, authors):
+        """Рецепты авторов, выбранных по Zipf: у немногих авторов много
+        рецептов, у большинства - по одному-два.
+        """
+        for recipe_id, author_id in zip(ids, self.iter_sample(authors)):
+            yield Recipe(
+                id=recipe_id,
+                name=f"Рецепт {recipe_id}",
+                text=f"Описание рецепта {recipe_id}.",
+                cooking_time=self.rng.randint(
+                    COOKING_TIME_MIN, COOKING_TIME_MAX
+                ),
+                author_id=author_id,
+            )
+
+    def iter_sample(self, sampler):
+        while True:
+            yield from sampler.sample(self.options["batch_size"])
+
+    def generate_pairs(self, users, sampler, per_user, exclude_self=False):
+        """Пары (пользователь, объект) без повторов.
+
+        Число объектов у пользователя распределено экспоненциально со
+        средним per_user, сами объекты выбираются по Zipf. С exclude_self
+        пользователь не выбирается сам для себя (подписки).
+        """
+        if not per_user:
+            return
+        for user_id in users:
+            count = int(self.rng.expovariate(1 / per_user))
+            for object_id in sorted(
+                sampler.sample_distinct(
+                    count, exclude=user_id if exclude_self else None
+                )
+            ):
+                yield user_id, object_id
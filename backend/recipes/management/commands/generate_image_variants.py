@@ -0,0 +1,66 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Generate resized copies of recipe images that lack them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pending",
+            action="store_true",
+            help=(
+                "Only process recipes whose copies have been pending for "
+                "longer than --grace seconds, using the pending marker."
+            ),
+        )
+        parser.add_argument(
+            "--grace",
+            type=int,
+            default=settings.RECIPE_IMAGE_PENDING_GRACE,
+            help="Seconds to leave a pending image to the worker pools.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Repeat the sweep every N seconds instead of running once.",
+        )
+
+    def get_recipe_ids(self, pending, grace):
+        if pending:
+            return list(
+                Recipe.objects.filter(
+                    image_variants_pending_since__lt=(
+                        timezone.now() - timedelta(seconds=grace)
+                    )
+                )
+                .order_by("image_variants_pending_since")
+                .values_list("id", flat=True)
+            )
+        return [
+            recipe.id
+            for recipe in Recipe.objects.exclude(image="")
+            .only("id", "image", "image_variants")
+            .iterator()
+            if recipe.image_variants.get("source") != recipe.image.name
+        ]
+
+    def handle(self, *args, **options):
+        while True:
+            recipe_ids = self.get_recipe_ids(
+                options["pending"], options["grace"]
+            )
+            for recipe_id in recipe_ids:
+                generate_variants(recipe_id)
+            self.stdout.write(f"Обработано изображений: {len(recipe_ids)}.")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,25 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = "Rebuild materialized shopping lists from users' carts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows per INSERT.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            ShoppingListItem.objects.refresh(
+                batch_size=options["batch_size"]
+            )
+        self.stdout.write(
+            f"Строк в списках покупок: {ShoppingListItem.objects.count()}."
+        )
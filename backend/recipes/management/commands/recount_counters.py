@@ -0,0 +1,66 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe
+from users.models import Follow, User
+
+
+def count_subquery(queryset, field):
+    """Подзапрос с количеством связанных объектов для OuterRef('pk')."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+def reconcile(queryset, counter, actual):
+    """Исправить расхождения счетчика одним запросом UPDATE.
+
+    Возвращает количество исправленных строк.
+    """
+    drifted = (
+        queryset.annotate(actual=actual)
+        .exclude(**{counter: F("actual")})
+        .values("pk")
+    )
+    return queryset.model.objects.filter(pk__in=drifted).update(
+        **{counter: actual}
+    )
+
+
+class Command(BaseCommand):
+    help = "Recount denormalized favorites, recipes and followers counters."
+
+    def handle(self, *args, **options):
+        counters = (
+            (
+                Recipe.objects.all(),
+                "favorites_count",
+                count_subquery(Favorite.objects.all(), "recipe"),
+            ),
+            (
+                User.objects.all(),
+                "recipes_count",
+                count_subquery(Recipe.objects.all(), "author"),
+            ),
+            (
+                User.objects.all(),
+                "followers_count",
+                count_subquery(Follow.objects.all(), "following"),
+            ),
+        )
+        with transaction.atomic():
+            for queryset, counter, actual in counters:
+                fixed = reconcile(queryset, counter, actual)
+                self.stdout.write(
+                    f"{queryset.model.__name__}.{counter}: "
+                    f"исправлено {fixed}."
+                )
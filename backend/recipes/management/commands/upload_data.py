@@ -1,40 +1,91 @@
-import csv
+import json
+import os
+import sys
 
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
 
-from recipes.models import Ingredient, Tag
+from recipes.importer import (
+    BATCH_SIZE,
+    CATALOGUES,
+    EXTENSIONS,
+    FORMATS,
+    Importer,
+    read_rows,
+)
+
+DEFAULT_FILES = (
+    ("ingredients", "data/ingredients.csv"),
+    ("tags", "data/tags.csv"),
+)
 
 
 class Command(BaseCommand):
-    help = "Import ingredietns and tags to database."
+    help = (
+        "Import ingredients and tags from CSV, JSON or NDJSON, updating "
+        "existing rows. Without arguments imports the bundled data files."
+    )
+    stealth_options = ("stdin",)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "catalogue",
+            nargs="?",
+            choices=sorted(CATALOGUES),
+            help="Catalogue to import.",
+        )
+        parser.add_argument(
+            "path", nargs="?", help="File to import, '-' for stdin."
+        )
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="File format, detected from the extension by default.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Number of rows per INSERT or COPY.",
+        )
 
     def handle(self, *args, **options):
-        new_ingredients = []
-        with open(
-            "data/ingredients.csv", "r", encoding="utf-8"
-        ) as ingredients_file:
-            reader = csv.reader(ingredients_file)
-            existing_names = set(
-                Ingredient.objects.all().values_list("name", flat=True)
+        if options["catalogue"] is None:
+            imports = DEFAULT_FILES
+        elif options["path"] is None:
+            raise CommandError("Укажите файл или '-' для чтения из stdin.")
+        else:
+            imports = ((options["catalogue"], options["path"]),)
+        for catalogue, path in imports:
+            counts = self.import_file(catalogue, path, options)
+            self.stdout.write(
+                f"{catalogue}: добавлено {counts['inserted']}, "
+                f"обновлено {counts['updated']}, "
+                f"пропущено {counts['skipped']}."
             )
-            for row in reader:
-                name, measurement_unit = row
-                if name.strip() not in existing_names:
-                    new_ingredients.append(
-                        Ingredient(
-                            name=name.strip(),
-                            measurement_unit=measurement_unit.strip(),
-                        )
-                    )
-
-        Ingredient.objects.bulk_create(new_ingredients, ignore_conflicts=True)
-
-        with open("data/tags.csv", "r", encoding="utf-8") as tags_file:
-            reader = csv.reader(tags_file)
-            for row in reader:
-                name, color, slug = row
-                Tag.objects.get_or_create(
-                    name=name.strip(),
-                    color=color.strip(),
-                    slug=slug.strip(),
+
+    def get_format(self, path, options):
+        format = options["format"]
+        if format is None and path != "-":
+            format = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+        if format is None:
+            raise CommandError(
+                f"Не удалось определить формат {path}, укажите --format."
+            )
+        return format
+
+    def import_file(self, catalogue, path, options):
+        format = self.get_format(path, options)
+        importer = Importer(CATALOGUES[catalogue], options["batch_size"])
+        try:
+            if path == "-":
+                return importer.run(
+                    read_rows(options.get("stdin", sys.stdin), format)
                 )
+            with open(path, encoding="utf-8", newline="") as file:
+                return importer.run(read_rows(file, format))
+        except OSError as error:
+            raise CommandError(error)
+        except ValueError as error:
+            if isinstance(error, json.JSONDecodeError):
+                error = f"Некорректный JSON: {error}"
+            raise CommandError(error)
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.16 on 2026-10-18 02:16
+# flake8: noqa
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_favorites_and_recipes(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    User = apps.get_model('users', 'User')
+    favorites = (
+        Favorite.objects.filter(recipe=OuterRef('pk'))
+        .order_by()
+        .values('recipe')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    Recipe.objects.update(favorites_count=Coalesce(Subquery(favorites), 0))
+    recipes = (
+        Recipe.objects.filter(author=OuterRef('pk'))
+        .order_by()
+        .values('author')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    User.objects.update(recipes_count=Coalesce(Subquery(recipes), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_auto_20240413_2315'),
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.RunPython(
+            count_favorites_and_recipes, migrations.RunPython.noop
+        ),
+    ]
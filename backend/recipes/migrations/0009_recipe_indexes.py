@@ -0,0 +1,70 @@
+# Generated by Django 3.2.16 on 2026-10-18 02:39
+# flake8: noqa
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def delete_duplicates(model, fields):
+    """Удалить повторяющиеся строки, оставив первую, и вернуть значения
+    полей удаленных дублей.
+    """
+    duplicates = list(
+        model.objects.values(*fields)
+        .annotate(first_id=Min('id'), count=Count('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        model.objects.filter(
+            **{field: duplicate[field] for field in fields}
+        ).exclude(id=duplicate['first_id']).delete()
+    return duplicates
+
+
+def remove_duplicates(apps, schema_editor):
+    Amount = apps.get_model('recipes', 'Amount')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    delete_duplicates(Amount, ('recipe', 'ingredient'))
+    user_ids = {
+        duplicate['user']
+        for duplicate in delete_duplicates(ShoppingCart, ('user', 'recipe'))
+    }
+    if not user_ids:
+        return
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=row['recipe__shoppingcarts__user_id'],
+            ingredient_id=row['ingredient_id'],
+            total_amount=row['total_amount'],
+        )
+        for row in Amount.objects.filter(
+            recipe__shoppingcarts__user_id__in=user_ids
+        )
+        .values('recipe__shoppingcarts__user_id', 'ingredient_id')
+        .annotate(total_amount=Sum('amount'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['pub_date', 'id'], name='recipe_pub_date_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='amount',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_user_shopping_cart'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.16 on 2026-10-18 03:13
+# flake8: noqa
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants_pending_since',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Копии фото ожидают создания с'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('image_variants_pending_since__isnull', False)), fields=['image_variants_pending_since'], name='recipe_variants_pending_idx'),
+        ),
+    ]
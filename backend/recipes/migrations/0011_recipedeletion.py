@@ -0,0 +1,34 @@
+# Generated by Django 3.2.16 on 2026-10-18 03:17
+# flake8: noqa
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def create_recipe_deletion(apps, schema_editor):
+    RecipeDeletion = apps.get_model('recipes', 'RecipeDeletion')
+    RecipeDeletion.objects.create(pk=1, deleted_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_image_variants_pending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deleted_at', models.DateTimeField(verbose_name='Время удаления')),
+            ],
+            options={
+                'verbose_name': 'Удаление рецептов',
+                'verbose_name_plural': 'Удаления рецептов',
+            },
+        ),
+        migrations.RunPython(
+            create_recipe_deletion, migrations.RunPython.noop
+        ),
+    ]
@@ -1,6 +1,31 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+
 from colorfield.fields import ColorField
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVectorField,
+)
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import (
+    BooleanField,
+    Case,
+    Exists,
+    F,
+    IntegerField,
+    OuterRef,
+    Prefetch,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Greatest
+from django.utils import timezone
 
 from foodgram.const import (
     COOKING_TIME_MAX,
@@ -14,7 +39,33 @@ from foodgram.const import (
     TAGS_MAX_SLUG_LENGTH,
     TAGS_NAME_MAX_LENGTH,
 )
-from users.models import User
+from users.models import Follow, User
+from .fulltext import (
+    RECIPE_TABLE,
+    SEARCH_CONFIG,
+    SEARCH_RANK_SCALE,
+    SQLITE_TABLE,
+    sqlite_match,
+)
+
+logger = logging.getLogger(__name__)
+
+recipes_deleting = ContextVar("recipes_deleting", default=False)
+
+
+@contextmanager
+def deleting_recipes():
+    """Отметить, что идет удаление рецептов.
+
+    Избранное и корзины удаляемых рецептов удаляются каскадом, и их
+    обработчики сигналов пропускают работу, которую обработчик удаления
+    рецепта делает одним запросом на рецепт.
+    """
+    token = recipes_deleting.set(True)
+    try:
+        yield
+    finally:
+        recipes_deleting.reset(token)
 
 
 class Tag(models.Model):
@@ -61,6 +112,98 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов для рецептов."""
+
+    def with_user_flags(self, user):
+        """Аннотировать рецепты флагами избранного и корзины."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return self.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+        )
+
+    def search(self, query):
+        """Полнотекстовый поиск по названию и описанию рецептов.
+
+        Рецепты аннотируются целочисленной релевантностью rank и
+        сортируются по ней, дате публикации и id, поэтому результаты
+        можно листать курсорной пагинацией.
+        """
+        if connections[self.db].vendor == "postgresql":
+            search_query = SearchQuery(
+                query, config=SEARCH_CONFIG, search_type="websearch"
+            )
+            queryset = self.filter(search_vector=search_query).annotate(
+                rank=Cast(
+                    SearchRank(F("search_vector"), search_query)
+                    * SEARCH_RANK_SCALE,
+                    IntegerField(),
+                )
+            )
+        else:
+            match = sqlite_match(query)
+            if not match:
+                return self.none()
+            queryset = self.filter(
+                pk__in=RawSQL(
+                    f"SELECT rowid FROM {SQLITE_TABLE} "
+                    f"WHERE {SQLITE_TABLE} MATCH %s",
+                    (match,),
+                )
+            ).annotate(
+                rank=RawSQL(
+                    f"SELECT CAST(-bm25({SQLITE_TABLE}, 10.0, 1.0) "
+                    f"* {SEARCH_RANK_SCALE} AS INTEGER) "
+                    f"FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s "
+                    f"AND rowid = {RECIPE_TABLE}.id",
+                    (match,),
+                    output_field=IntegerField(),
+                )
+            )
+        return queryset.order_by("-rank", "-pub_date", "-id")
+
+    def touch(self):
+        """Отметить рецепты измененными."""
+        return self.update(updated_at=timezone.now())
+
+    def delete(self):
+        with deleting_recipes():
+            return super().delete()
+
+    def with_related(self, user):
+        """Подгрузить автора, теги и ингредиенты рецептов.
+
+        Теги и ингредиенты упорядочены по id, чтобы порядок в ответе
+        не зависел от плана запроса.
+        """
+        if user.is_authenticated:
+            is_subscribed = Exists(
+                Follow.objects.filter(user=user, following=OuterRef("pk"))
+            )
+        else:
+            is_subscribed = Value(False, output_field=BooleanField())
+        authors = User.objects.annotate(is_subscribed=is_subscribed)
+        return self.prefetch_related(
+            Prefetch("author", queryset=authors),
+            Prefetch("tags", queryset=Tag.objects.order_by("id")),
+            Prefetch(
+                "amounts",
+                queryset=Amount.objects.select_related("ingredient").order_by(
+                    "id"
+                ),
+            ),
+        )
+
+
 class Recipe(models.Model):
     """Модель рецептов."""
 
@@ -82,6 +225,15 @@ class Recipe(models.Model):
         ],
     )
     image = models.ImageField("Фото блюда", upload_to="recipes/images/")
+    image_variants = models.JSONField(
+        "Уменьшенные копии фото", default=dict, blank=True, editable=False
+    )
+    image_variants_pending_since = models.DateTimeField(
+        "Копии фото ожидают создания с",
+        null=True,
+        blank=True,
+        editable=False,
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -102,15 +254,38 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         verbose_name="Дата публикации", auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        "Дата изменения", auto_now=True, db_index=True
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+    favorites_count = models.PositiveIntegerField(
+        "Добавлений в избранное", default=0, editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(
+                fields=["pub_date", "id"], name="recipe_pub_date_id_idx"
+            ),
+            models.Index(
+                fields=["image_variants_pending_since"],
+                name="recipe_variants_pending_idx",
+                condition=models.Q(image_variants_pending_since__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def delete(self, *args, **kwargs):
+        with deleting_recipes():
+            return super().delete(*args, **kwargs)
+
 
 class Amount(models.Model):
     """Модель для количетсва ингрединета в блюде."""
@@ -140,6 +315,12 @@ class Amount(models.Model):
 
     class Meta:
         verbose_name = "Ингредиент и количество"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "ingredient"],
+                name="unique_recipe_ingredient",
+            )
+        ]
 
     def __str__(self):
         return f"{self.ingredient}: {self.amount}"
@@ -177,6 +358,214 @@ class ShoppingCart(UserRecipe):
     class Meta(UserRecipe.Meta):
         verbose_name = "Корзина"
         verbose_name_plural = "Корзины"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"], name="unique_user_shopping_cart"
+            )
+        ]
 
     def __str__(self):
         return f"Корзина пользователя {self.user}: {self.recipe}"
+
+
+class ShoppingListItemQuerySet(models.QuerySet):
+    """Набор запросов для поддержки списка покупок в актуальном состоянии."""
+
+    def apply_delta(self, user_ids, deltas):
+        """Изменить количество ингредиентов в списках покупок пользователей.
+
+        deltas - словарь {id ингредиента: изменение количества}.
+        Недостающие строки вставляются с нулевым количеством с пропуском
+        конфликтов, после чего все строки меняются одним UPDATE с
+        F-выражением, поэтому параллельные изменения корзины одного
+        пользователя не мешают друг другу. Если количество уходит ниже
+        нуля, список разошелся с корзиной: это пишется в журнал, а
+        строка удаляется.
+        """
+        deltas = {
+            ingredient_id: delta
+            for ingredient_id, delta in sorted(deltas.items())
+            if delta
+        }
+        if not user_ids or not deltas:
+            return
+        items = self.filter(user_id__in=user_ids, ingredient_id__in=deltas)
+        with transaction.atomic(using=self.db):
+            self.bulk_create(
+                (
+                    ShoppingListItem(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        total_amount=0,
+                    )
+                    for user_id in sorted(user_ids)
+                    for ingredient_id, delta in deltas.items()
+                    if delta > 0
+                ),
+                ignore_conflicts=True,
+            )
+            self.log_drift(user_ids, deltas)
+            items.update(
+                total_amount=Greatest(
+                    F("total_amount")
+                    + Case(
+                        *(
+                            When(
+                                ingredient_id=ingredient_id, then=Value(delta)
+                            )
+                            for ingredient_id, delta in deltas.items()
+                        ),
+                        default=Value(0),
+                        output_field=IntegerField(),
+                    ),
+                    Value(0),
+                )
+            )
+            items.filter(total_amount=0).delete()
+
+    def log_drift(self, user_ids, deltas):
+        """Записать в журнал строки, которые уменьшаются больше, чем на
+        их количество, или отсутствуют.
+        """
+        removed = {
+            ingredient_id: delta
+            for ingredient_id, delta in deltas.items()
+            if delta < 0
+        }
+        if not removed:
+            return
+        totals = {
+            (user_id, ingredient_id): total_amount
+            for user_id, ingredient_id, total_amount in self.filter(
+                user_id__in=user_ids, ingredient_id__in=removed
+            ).values_list("user_id", "ingredient_id", "total_amount")
+        }
+        drifted = [
+            (user_id, ingredient_id, totals.get((user_id, ingredient_id)))
+            for user_id in user_ids
+            for ingredient_id, delta in removed.items()
+            if totals.get((user_id, ingredient_id), 0) + delta < 0
+        ]
+        if drifted:
+            logger.warning(
+                "Список покупок расходится с корзиной "
+                "(пользователь, ингредиент, количество): %s. "
+                "Пересоберите списки командой rebuild_shopping_lists.",
+                drifted,
+            )
+
+    def add_recipe(self, user_ids, recipe_id, sign=1):
+        """Добавить ингредиенты рецепта в списки покупок пользователей."""
+        self.apply_delta(
+            user_ids,
+            {
+                ingredient_id: sign * amount
+                for ingredient_id, amount in Amount.objects.filter(
+                    recipe_id=recipe_id
+                ).values_list("ingredient_id", "amount")
+            },
+        )
+
+    def remove_recipe(self, user_ids, recipe_id):
+        """Убрать ингредиенты рецепта из списков покупок пользователей."""
+        self.add_recipe(user_ids, recipe_id, sign=-1)
+
+    def refresh_recipe(self, recipe_id, ingredient_ids):
+        """Пересчитать списки покупок пользователей, у которых рецепт
+        в корзине, после изменения его ингредиентов.
+        """
+        user_ids = list(
+            ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+                "user_id", flat=True
+            )
+        )
+        if user_ids:
+            self.refresh(user_ids, ingredient_ids)
+
+    def totals(self, user_ids=None, ingredient_ids=None):
+        """Посчитать список покупок с нуля по корзинам пользователей."""
+        lookups = {"recipe__shoppingcarts__isnull": False}
+        if user_ids is not None:
+            lookups["recipe__shoppingcarts__user_id__in"] = user_ids
+        if ingredient_ids is not None:
+            lookups["ingredient_id__in"] = ingredient_ids
+        return (
+            Amount.objects.filter(**lookups)
+            .values("recipe__shoppingcarts__user_id", "ingredient_id")
+            .annotate(total_amount=Sum("amount"))
+            .order_by()
+        )
+
+    def refresh(self, user_ids=None, ingredient_ids=None, batch_size=1000):
+        """Пересчитать строки списка покупок для выбранных пользователей и
+        ингредиентов (для всех, если не указаны).
+        """
+        items = self.all()
+        if user_ids is not None:
+            items = items.filter(user_id__in=user_ids)
+        if ingredient_ids is not None:
+            items = items.filter(ingredient_id__in=ingredient_ids)
+        items.delete()
+        rows = (
+            ShoppingListItem(
+                user_id=row["recipe__shoppingcarts__user_id"],
+                ingredient_id=row["ingredient_id"],
+                total_amount=row["total_amount"],
+            )
+            for row in self.totals(user_ids, ingredient_ids).iterator()
+        )
+        while batch := list(islice(rows, batch_size)):
+            self.bulk_create(batch)
+
+
+class ShoppingListItem(models.Model):
+    """Модель строки списка покупок: суммарное количество ингредиента
+    во всех рецептах корзины пользователя.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="shopping_list_items",
+        verbose_name="пользователь",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name="shopping_list_items",
+        verbose_name="ингредиент",
+    )
+    total_amount = models.PositiveIntegerField("Количество")
+
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Строка списка покупок"
+        verbose_name_plural = "Списки покупок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique_user_shopping_list_ingredient",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user}: {self.ingredient} - {self.total_amount}"
+
+
+class RecipeDeletion(models.Model):
+    """Время последнего удаления рецепта.
+
+    Удаленный рецепт не оставляет строк, по которым можно узнать время
+    изменения списка рецептов, поэтому оно хранится в единственной
+    строке этой таблицы, общей для всех процессов.
+    """
+
+    deleted_at = models.DateTimeField("Время удаления")
+
+    class Meta:
+        verbose_name = "Удаление рецептов"
+        verbose_name_plural = "Удаления рецептов"
+
+    def __str__(self):
+        return f"Рецепт удален {self.deleted_at}"
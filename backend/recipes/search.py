@@ -0,0 +1,67 @@
+from bisect import bisect_left
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+
+from .models import Ingredient
+
+
+def fold(text):
+    """Привести строку к виду для поиска без учета регистра и ё/е."""
+    return text.casefold().replace("ё", "е")
+
+
+class IngredientPrefixIndex:
+    """Индекс ингредиентов в памяти процесса для поиска по началу названия.
+
+    Хранит отсортированный массив нормализованных названий и ищет
+    диапазон совпадений двоичным поиском. Строится при первом обращении,
+    сбрасывается при изменении ингредиентов в этом процессе и
+    перестраивается не реже раза в INGREDIENT_INDEX_TTL секунд, чтобы
+    подхватить изменения из других процессов.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._keys = None
+        self._items = None
+        self._built_at = None
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = self._items = self._built_at = None
+
+    def _is_fresh(self):
+        return (
+            self._built_at is not None
+            and monotonic() - self._built_at < settings.INGREDIENT_INDEX_TTL
+        )
+
+    def _build(self):
+        rows = sorted(
+            (fold(name), id, name, measurement_unit)
+            for id, name, measurement_unit in Ingredient.objects.values_list(
+                "id", "name", "measurement_unit"
+            ).iterator()
+        )
+        self._keys = [row[0] for row in rows]
+        self._items = [
+            {"id": id, "name": name, "measurement_unit": measurement_unit}
+            for _, id, name, measurement_unit in rows
+        ]
+        self._built_at = monotonic()
+
+    def search(self, prefix):
+        """Вернуть ингредиенты, название которых начинается с prefix."""
+        with self._lock:
+            if not self._is_fresh():
+                self._build()
+            keys, items = self._keys, self._items
+        prefix = fold(prefix)
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + chr(0x10FFFF), lo=start)
+        return items[start:end]
+
+
+ingredient_index = IngredientPrefixIndex()
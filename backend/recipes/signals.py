@@ -0,0 +1,292 @@
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import User
+from . import fulltext
+from .cache import invalidate_recipes, invalidate_tags, mark_recipes_deleted
+from .images import delete_recipe_variants, schedule_variants
+from .models import (
+    Amount,
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+    recipes_deleting,
+)
+from .search import ingredient_index
+
+AUTHOR_FIELDS = frozenset(("email", "first_name", "last_name", "username"))
+
+
+@receiver(post_save, sender=Favorite)
+def increase_favorites_count(sender, instance, created, raw, **kwargs):
+    """Увеличить счетчик добавлений рецепта в избранное.
+
+    Кэши списка рецептов не сбрасываются: счетчик в них может отставать
+    не дольше RECIPE_LIST_CACHE_TIMEOUT секунд.
+    """
+    if created and not raw:
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            favorites_count=F("favorites_count") + 1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+def decrease_favorites_count(sender, instance, **kwargs):
+    """Уменьшить счетчик добавлений рецепта в избранное.
+
+    При удалении самого рецепта счетчик не меняется.
+    """
+    if recipes_deleting.get():
+        return
+    Recipe.objects.filter(pk=instance.recipe_id, favorites_count__gt=0).update(
+        favorites_count=F("favorites_count") - 1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_count(sender, instance, created, raw, **kwargs):
+    """Увеличить счетчик рецептов автора."""
+    if created and not raw:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F("recipes_count") + 1
+        )
+
+
+def needs_image_variants(recipe):
+    return bool(recipe.image) and (
+        recipe.image_variants.get("source") != recipe.image.name
+    )
+
+
+@receiver(pre_save, sender=Recipe)
+def mark_image_variants_pending(sender, instance, raw, **kwargs):
+    """Отметить в БД, что для нового фото рецепта нужны копии.
+
+    Отметка снимается задачей, создавшей копии, поэтому задачи,
+    потерянные при перезапуске процесса, подбирает
+    generate_image_variants --pending.
+    """
+    if not raw and needs_image_variants(instance):
+        instance.image_variants_pending_since = timezone.now()
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, raw, **kwargs):
+    """Запланировать создание уменьшенных копий нового фото рецепта."""
+    if not raw and needs_image_variants(instance):
+        schedule_variants(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_variants(sender, instance, **kwargs):
+    """Удалить файлы уменьшенных копий фото удаленного рецепта."""
+    delete_recipe_variants(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(sender, instance, **kwargs):
+    """Уменьшить счетчик рецептов автора."""
+    User.objects.filter(pk=instance.author_id, recipes_count__gt=0).update(
+        recipes_count=F("recipes_count") - 1
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def mark_recipe_deleted(sender, **kwargs):
+    """Запомнить время удаления рецепта для условных запросов к списку."""
+    mark_recipes_deleted()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_cache(sender, raw=False, **kwargs):
+    """Сбросить кэши общедоступных данных рецептов."""
+    if not raw:
+        invalidate_recipes()
+
+
+@receiver(post_save, sender=Amount)
+def touch_recipe_ingredients(sender, instance, raw, **kwargs):
+    """Отметить рецепт измененным при изменении его ингредиентов.
+
+    На удаление ингредиентов рецепта обработчик не подключен, чтобы не
+    отключать их удаление одним запросом: сериализатор и админка
+    после изменения ингредиентов сохраняют сам рецепт.
+    """
+    if not raw:
+        Recipe.objects.filter(pk=instance.recipe_id).touch()
+        invalidate_recipes()
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def touch_user_interactions(sender, instance, raw=False, **kwargs):
+    """Отметить изменение избранного или корзины пользователя.
+
+    Признаки избранного и корзины в ответе с рецептом зависят только от
+    пользователя, поэтому время их изменения хранится у него, а не у
+    рецепта. При удалении рецепта строки удаляются каскадом, и их
+    отмечает touch_recipe_users_interactions.
+    """
+    if not raw and not recipes_deleting.get():
+        User.objects.filter(pk=instance.user_id).update(
+            interactions_changed_at=timezone.now()
+        )
+
+
+@receiver(pre_delete, sender=Recipe)
+def touch_recipe_users_interactions(sender, instance, **kwargs):
+    """Отметить изменение избранного и корзин пользователей, у которых
+    был удаляемый рецепт, одним запросом вместо запроса на каждую
+    удаляемую каскадом строку.
+    """
+    if recipes_deleting.get():
+        User.objects.filter(
+            Q(pk__in=instance.favorites.values("user_id"))
+            | Q(pk__in=instance.shoppingcarts.values("user_id"))
+        ).update(interactions_changed_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def touch_recipe_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    """Отметить рецепты измененными при изменении их тегов."""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        Recipe.objects.filter(pk=instance.pk).touch()
+    elif action == "pre_clear":
+        instance.recipes.all().touch()
+    elif pk_set:
+        Recipe.objects.filter(pk__in=pk_set).touch()
+    invalidate_recipes()
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_recipe_to_shopping_list(sender, instance, created, raw, **kwargs):
+    """Добавить ингредиенты рецепта в список покупок."""
+    if created and not raw:
+        ShoppingListItem.objects.add_recipe(
+            [instance.user_id], instance.recipe_id
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_recipe_from_shopping_list(sender, instance, **kwargs):
+    """Убрать ингредиенты рецепта из списка покупок.
+
+    При удалении самого рецепта его убирает из списков покупок всех
+    пользователей remove_deleted_recipe_from_shopping_lists.
+    """
+    if not recipes_deleting.get():
+        ShoppingListItem.objects.remove_recipe(
+            [instance.user_id], instance.recipe_id
+        )
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_deleted_recipe_from_shopping_lists(sender, instance, **kwargs):
+    """Убрать ингредиенты удаляемого рецепта из списков покупок всех
+    пользователей, у которых он в корзине, одним изменением списков.
+
+    Вызывается до удаления, пока ингредиенты рецепта и корзины еще не
+    удалены каскадно вместе с рецептом.
+    """
+    if recipes_deleting.get():
+        ShoppingListItem.objects.remove_recipe(
+            list(instance.shoppingcarts.values_list("user_id", flat=True)),
+            instance.pk,
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def touch_ingredient_recipes(
+    sender, instance, raw=False, created=False, **kwargs
+):
+    """Отметить измененными рецепты с измененным или удаляемым
+    ингредиентом.
+    """
+    if not raw and not created:
+        Recipe.objects.filter(
+            pk__in=Amount.objects.filter(ingredient=instance).values(
+                "recipe_id"
+            )
+        ).touch()
+        invalidate_recipes()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    """Сбросить индекс поиска ингредиентов."""
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_tag_recipes(sender, instance, raw=False, created=False, **kwargs):
+    """Отметить измененными рецепты с измененным или удаляемым тегом."""
+    if not raw and not created:
+        instance.recipes.all().touch()
+        invalidate_recipes()
+
+
+@receiver(pre_save, sender=User)
+def check_author_changes(sender, instance, raw, update_fields, **kwargs):
+    """Запомнить, изменились ли данные пользователя, которые входят в
+    ответ с рецептом как данные автора.
+    """
+    instance._author_changed = (
+        not raw
+        and instance.pk is not None
+        and (
+            update_fields is None
+            or not AUTHOR_FIELDS.isdisjoint(update_fields)
+        )
+        and User.objects.filter(pk=instance.pk)
+        .exclude(
+            **{field: getattr(instance, field) for field in AUTHOR_FIELDS}
+        )
+        .exists()
+    )
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(sender, instance, **kwargs):
+    """Отметить измененными рецепты автора при изменении его данных.
+
+    Смена пароля, даты входа и других полей, которых нет в ответе с
+    рецептом, рецепты не затрагивает.
+    """
+    if getattr(instance, "_author_changed", False):
+        instance.recipes.all().touch()
+        invalidate_recipes()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_catalogue(sender, **kwargs):
+    """Сбросить кэш каталога тегов."""
+    invalidate_tags()
+
+
+@receiver(post_migrate)
+def repair_fulltext_search(sender, using, **kwargs):
+    """Восстановить индекс полнотекстового поиска после миграций."""
+    if sender.label == "recipes":
+        fulltext.repair(connections[using])
@@ -11,6 +11,8 @@ class UserAdmin(UserAdmin):
         "id",
         "username",
         "email",
+        "recipes_count",
+        "followers_count",
     )
     search_fields = ("id", "username")
     list_filter = ("email", "username")
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.16 on 2026-10-18 03:17
+# flake8: noqa
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_follow_follow_user_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='interactions_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Время изменения избранного, корзины и подписок'),
+        ),
+    ]
@@ -10,6 +10,18 @@ class User(AbstractUser):
     first_name = models.CharField("Имя", max_length=MAX_LENGTH_FOR_NAME)
     last_name = models.CharField("Фамилия", max_length=MAX_LENGTH_FOR_NAME)
     email = models.EmailField("Электронная почта", unique=True)
+    recipes_count = models.PositiveIntegerField(
+        "Количество рецептов", default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        "Количество подписчиков", default=0, editable=False
+    )
+    interactions_changed_at = models.DateTimeField(
+        "Время изменения избранного, корзины и подписок",
+        null=True,
+        blank=True,
+        editable=False,
+    )
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["first_name", "last_name", "username"]
 
@@ -44,6 +56,9 @@ class Follow(models.Model):
                 name="user_self_following",
             ),
         ]
+        indexes = [
+            models.Index(fields=["user", "id"], name="follow_user_id_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user} подписан на {self.following}"
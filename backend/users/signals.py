@@ -0,0 +1,37 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Follow, User
+
+
+@receiver(post_save, sender=Follow)
+def increase_followers_count(sender, instance, created, raw, **kwargs):
+    """Увеличить счетчик подписчиков пользователя."""
+    if created and not raw:
+        User.objects.filter(pk=instance.following_id).update(
+            followers_count=F("followers_count") + 1
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def decrease_followers_count(sender, instance, **kwargs):
+    """Уменьшить счетчик подписчиков пользователя."""
+    User.objects.filter(
+        pk=instance.following_id, followers_count__gt=0
+    ).update(followers_count=F("followers_count") - 1)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def touch_user_interactions(sender, instance, raw=False, **kwargs):
+    """Отметить изменение подписок пользователя.
+
+    Признак подписки на автора в ответе с рецептом зависит только от
+    подписчика, поэтому рецепты автора не отмечаются измененными.
+    """
+    if not raw:
+        User.objects.filter(pk=instance.user_id).update(
+            interactions_changed_at=timezone.now()
+        )